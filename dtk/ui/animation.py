@@ -20,8 +20,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from frame_clock import frame_clock
 import copy
 import gobject
+import gtk
 
 def LinerInterpolator(factor, lower, upper):
     '''
@@ -50,6 +52,8 @@ class Animation:
     '''
     The animation class used to convenient production special effects.
     
+    Animation is driven by frame_clock, value is computed with elapsed time of animation.
+    
     @undocumented: init
     @undocumented: init_all
     @undocumented: compute
@@ -94,6 +98,7 @@ class Animation:
         self.duration = duration
         self.interpolator = interpolator
         self.time = 0
+        self.start_time = None
         self.animation_id = None
         self.start_id = None
         self.other_concurent = []
@@ -162,7 +167,9 @@ class Animation:
         Start the animation object.
         '''
         self.time = 0
-        self.animation_id = gobject.timeout_add(self.delay, self.compute)
+        self.start_time = None
+        frame_clock.remove(self.animation_id)
+        self.animation_id = frame_clock.add(self.compute)
         for o in self.other_concurent:
             o.start()
         return False
@@ -172,7 +179,8 @@ class Animation:
         stop immediately the animation object
         '''
         if self.animation_id:
-            gobject.source_remove(self.animation_id)
+            frame_clock.remove(self.animation_id)
+            self.animation_id = None
         if self.start_id:
             gobject.source_remove(self.start_id)
 
@@ -183,25 +191,42 @@ class Animation:
         if self.stop_callback:
             self.stop_callback()
 
-    def compute(self):
-        if self.time >= self.duration+self.delay:
-            # Stop callback.
-            if self.stop_callback:
-                self.stop_callback()
-            return False
-
+    def compute(self, frame_time):
+        if self.start_time == None:
+            self.start_time = frame_time
+            
+        # Wait delay time before first value.
+        self.time = int((frame_time - self.start_time) * 1000) - self.delay
+        if self.time < 0:
+            return True
+        
+        self.time = min(self.time, self.duration)
+        
         values = []
         for r in self.ranges:
-            factor = float(self.time) / self.duration
+            if self.duration > 0:
+                factor = float(self.time) / self.duration
+            else:
+                factor = 1.0
             value = self.interpolator(factor, r[0], r[1])
             values.append(r[0]+value)
 
         self.set_method(*values)
-
-        for o in self.other_concurent:
-            o.compute()
-
-        self.time += self.delay
+        
+        # Redraw widgets once per frame.
+        for widget in self.widgets:
+            if isinstance(widget, copy.weakref.ref):
+                widget = widget()
+            if isinstance(widget, gtk.Widget):
+                frame_clock.queue_draw(widget)
+
+        if self.time >= self.duration:
+            self.animation_id = None
+            
+            # Stop callback.
+            if self.stop_callback:
+                self.stop_callback()
+            return False
 
         return True
 
@@ -220,7 +245,6 @@ class Animation:
         raise NotImplemented
 
 if __name__ == "__main__":
-    import gtk
     win = gtk.Window()
     win.set_position(gtk.WIN_POS_CENTER)
 
@@ -20,7 +20,335 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import OrderedDict
+from threads import post_gui
+import gobject
 import gtk
+import threading as td
+
+class ScaledPixbufCache(object):
+    '''
+    Global cache for scaled pixbuf, shared by all CachePixbuf handles.
+    
+    Scaled pixbuf is keyed by (source pixbuf, width, height, interp type, mirror flags),
+    so widget that alternates between several sizes (such as resize window back and forth)
+    don't need call gtk.gdk.Pixbuf.scale_simple again.
+    
+    Cache is limited by bytes of scaled pixbuf and source pixbuf (key hold source pixbuf, so it can't free before scaled pixbuf evicted),
+    least recently used pixbuf will be evicted first.
+    
+    @undocumented: remove_entry
+    '''
+	
+    def __init__(self, max_size=32 * 1024 * 1024):
+        '''
+        Init scaled pixbuf cache.
+        
+        @param max_size: Max bytes of scaled pixbuf and source pixbuf in cache, default is 32MB.
+        '''
+        self.max_size = max_size
+        self.cache_size = 0
+        self.pixbuf_dict = OrderedDict()
+        self.source_count_dict = {} # number of scaled pixbuf in cache for every source pixbuf
+        self.lock = td.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.evict_count = 0
+        
+    def get(self, pixbuf, scale_width, scale_height, 
+            interp_type=gtk.gdk.INTERP_BILINEAR,
+            vertical_mirror=False, 
+            horizontal_mirror=False):
+        '''
+        Get scaled pixbuf, scale pixbuf if it not in cache.
+        
+        @param pixbuf: Original pixbuf.
+        @param scale_width: Scale width of pixbuf.
+        @param scale_height: Scale height of pixbuf.
+        @param interp_type: Interp type to scale pixbuf, default is gtk.gdk.INTERP_BILINEAR.
+        @param vertical_mirror: Whether pixbuf mirror vertically.
+        @param horizontal_mirror: Whether pixbuf mirror horizontally.
+        @return: Return scaled pixbuf.
+        '''
+        # Use pixbuf object in key (not id), avoid reused id hit stale cache.
+        key = (pixbuf, scale_width, scale_height, interp_type, vertical_mirror, horizontal_mirror)
+        with self.lock:
+            if key in self.pixbuf_dict:
+                scaled_pixbuf = self.pixbuf_dict.pop(key)
+                self.pixbuf_dict[key] = scaled_pixbuf
+                self.hit_count += 1
+                
+                return scaled_pixbuf
+            else:
+                self.miss_count += 1
+        
+        # Mirror pixbuf from unmirrored one, avoid scale pixbuf again.
+        if vertical_mirror or horizontal_mirror:
+            scaled_pixbuf = self.get(pixbuf, scale_width, scale_height, interp_type)
+            
+            if vertical_mirror:
+                scaled_pixbuf = scaled_pixbuf.flip(True)
+                
+            if horizontal_mirror:
+                scaled_pixbuf = scaled_pixbuf.flip(False)
+        else:
+            scaled_pixbuf = pixbuf.scale_simple(scale_width, scale_height, interp_type)
+            
+        self.add(key, scaled_pixbuf)
+        
+        return scaled_pixbuf
+    
+    def lookup(self, pixbuf, scale_width, scale_height, 
+               interp_type=gtk.gdk.INTERP_BILINEAR,
+               vertical_mirror=False, 
+               horizontal_mirror=False):
+        '''
+        Lookup scaled pixbuf in cache, don't scale pixbuf if it not in cache.
+        
+        @param pixbuf: Original pixbuf.
+        @param scale_width: Scale width of pixbuf.
+        @param scale_height: Scale height of pixbuf.
+        @param interp_type: Interp type to scale pixbuf, default is gtk.gdk.INTERP_BILINEAR.
+        @param vertical_mirror: Whether pixbuf mirror vertically.
+        @param horizontal_mirror: Whether pixbuf mirror horizontally.
+        @return: Return scaled pixbuf, or None if pixbuf not in cache.
+        '''
+        key = (pixbuf, scale_width, scale_height, interp_type, vertical_mirror, horizontal_mirror)
+        with self.lock:
+            if key in self.pixbuf_dict:
+                scaled_pixbuf = self.pixbuf_dict.pop(key)
+                self.pixbuf_dict[key] = scaled_pixbuf
+                self.hit_count += 1
+                
+                return scaled_pixbuf
+            else:
+                return None
+        
+    def add(self, key, scaled_pixbuf):
+        '''
+        Add scaled pixbuf to cache with given key.
+        
+        @param key: Cache key, same format as key of get function.
+        @param scaled_pixbuf: Scaled pixbuf.
+        '''
+        source_pixbuf = key[0]
+        pixbuf_size = get_pixbuf_size(scaled_pixbuf)
+        
+        with self.lock:
+            if key in self.pixbuf_dict:
+                self.remove_entry(key)
+                
+            # Source pixbuf is counted once, when first scaled pixbuf of it add in cache.
+            if self.source_count_dict.has_key(source_pixbuf):
+                source_size = 0
+            else:
+                source_size = get_pixbuf_size(source_pixbuf)
+                
+            # Don't cache pixbuf bigger than whole cache.
+            if pixbuf_size + source_size > self.max_size:
+                return
+            
+            self.pixbuf_dict[key] = scaled_pixbuf
+            self.source_count_dict[source_pixbuf] = self.source_count_dict.get(source_pixbuf, 0) + 1
+            self.cache_size += pixbuf_size + source_size
+            
+            self.shrink(self.max_size)
+            
+    def remove_entry(self, key):
+        '''
+        Internal function to remove scaled pixbuf with given key, source pixbuf is uncounted when its last scaled pixbuf removed.
+        
+        Caller must hold lock.
+        '''
+        source_pixbuf = key[0]
+        self.cache_size -= get_pixbuf_size(self.pixbuf_dict.pop(key))
+        
+        self.source_count_dict[source_pixbuf] -= 1
+        if self.source_count_dict[source_pixbuf] == 0:
+            del self.source_count_dict[source_pixbuf]
+            self.cache_size -= get_pixbuf_size(source_pixbuf)
+            
+    def shrink(self, max_size):
+        '''
+        Internal function to evict least recently used pixbuf until cache size under max_size.
+        
+        Caller must hold lock.
+        
+        @param max_size: Max bytes of cache.
+        '''
+        while self.cache_size > max_size and len(self.pixbuf_dict) > 0:
+            self.remove_entry(next(iter(self.pixbuf_dict)))
+            self.evict_count += 1
+            
+    def set_max_size(self, max_size):
+        '''
+        Set max bytes of cache, evict pixbuf if cache is bigger than new size.
+        
+        @param max_size: Max bytes of cache.
+        '''
+        with self.lock:
+            self.max_size = max_size
+            self.shrink(max_size)
+    
+    def remove_pixbuf(self, pixbuf):
+        '''
+        Remove all scaled result of given original pixbuf.
+        
+        @param pixbuf: Original pixbuf.
+        '''
+        with self.lock:
+            for key in filter(lambda k: k[0] == pixbuf, self.pixbuf_dict.keys()):
+                self.remove_entry(key)
+                
+    def clear(self):
+        '''
+        Clear cache.
+        '''
+        with self.lock:
+            self.pixbuf_dict.clear()
+            self.source_count_dict.clear()
+            self.cache_size = 0
+            
+    def get_stats(self):
+        '''
+        Get statistics of cache.
+        
+        @return: Return dict with keys: number, size, max_size, hit, miss, evict.
+        '''
+        with self.lock:
+            return {"number" : len(self.pixbuf_dict),
+                    "size" : self.cache_size,
+                    "max_size" : self.max_size,
+                    "hit" : self.hit_count,
+                    "miss" : self.miss_count,
+                    "evict" : self.evict_count,
+                    }
+        
+def get_pixbuf_size(pixbuf):
+    '''
+    Get bytes of pixbuf.
+    
+    @param pixbuf: gtk.gdk.Pixbuf.
+    @return: Return bytes of pixbuf data.
+    '''
+    return pixbuf.get_rowstride() * pixbuf.get_height()
+
+scaled_pixbuf_cache = ScaledPixbufCache()
+
+class PixbufScaler(object):
+    '''
+    Scale pixbuf with high quality in background thread.
+    
+    Scale request is throttled, scale only start after request stop changing for a while,
+    and intermediate size will be coalesced, only latest request will be scaled.
+    Scaled pixbuf will be saved in global scaled_pixbuf_cache.
+    
+    @undocumented: start_scale
+    @undocumented: run
+    @undocumented: finish_scale
+    '''
+	
+    def __init__(self, delay=100):
+        '''
+        Init pixbuf scaler.
+        
+        @param delay: Milliseconds to wait before start scale, default is 100ms.
+        '''
+        self.delay = delay
+        self.timeout_id = None
+        self.pending_request = None
+        self.scale_request = None
+        self.condition = td.Condition()
+        self.thread = None
+        
+    def scale(self, pixbuf, scale_width, scale_height, 
+              vertical_mirror=False, 
+              horizontal_mirror=False,
+              finish_callback=None):
+        '''
+        Request scale pixbuf in background thread, this function must call in main thread.
+        
+        @param pixbuf: Original pixbuf.
+        @param scale_width: Scale width of pixbuf.
+        @param scale_height: Scale height of pixbuf.
+        @param vertical_mirror: Whether pixbuf mirror vertically.
+        @param horizontal_mirror: Whether pixbuf mirror horizontally.
+        @param finish_callback: Callback in main thread after scale finish, callback receive scaled pixbuf.
+        '''
+        request = (pixbuf, scale_width, scale_height, vertical_mirror, horizontal_mirror)
+        
+        # Same request is pending or scaling, don't delay it again.
+        if request == self.get_request_key(self.pending_request):
+            return
+        with self.condition:
+            if request == self.get_request_key(self.scale_request):
+                return
+            
+        self.pending_request = (request, finish_callback)
+        
+        # Restart timer, only scale after request stop changing.
+        if self.timeout_id != None:
+            gobject.source_remove(self.timeout_id)
+        self.timeout_id = gobject.timeout_add(self.delay, self.start_scale)
+        
+    def get_request_key(self, request):
+        '''
+        Internal function to get key of scale request.
+        '''
+        if request == None:
+            return None
+        else:
+            return request[0]
+        
+    def start_scale(self):
+        '''
+        Internal function to hand pending request to scale thread.
+        '''
+        self.timeout_id = None
+        
+        with self.condition:
+            # Overwrite request that scale thread haven't start, coalesce intermediate size.
+            self.scale_request = self.pending_request
+            self.pending_request = None
+            self.condition.notify()
+        
+        if self.thread == None:
+            self.thread = td.Thread(target=self.run)
+            self.thread.setDaemon(True)
+            self.thread.start()
+            
+        return False
+    
+    def run(self):
+        '''
+        Internal function to scale pixbuf in background thread.
+        '''
+        while True:
+            with self.condition:
+                while self.scale_request == None:
+                    self.condition.wait()
+                    
+                ((pixbuf, scale_width, scale_height, vertical_mirror, horizontal_mirror), 
+                 finish_callback) = self.scale_request
+                
+            scaled_pixbuf = scaled_pixbuf_cache.get(
+                pixbuf, scale_width, scale_height, gtk.gdk.INTERP_BILINEAR, 
+                vertical_mirror, horizontal_mirror)
+            
+            with self.condition:
+                # Clean request if no new request arrive when scaling.
+                if self.get_request_key(self.scale_request) == (pixbuf, scale_width, scale_height, vertical_mirror, horizontal_mirror):
+                    self.scale_request = None
+                
+            if finish_callback:
+                self.finish_scale(finish_callback, scaled_pixbuf)
+                
+    @post_gui
+    def finish_scale(self, finish_callback, scaled_pixbuf):
+        '''
+        Internal function to call finish callback in main thread.
+        '''
+        finish_callback(scaled_pixbuf)
 
 class CachePixbuf(object):
     '''
@@ -28,7 +356,8 @@ class CachePixbuf(object):
     
     gtk.gdk.pixbuf.scale_simple is function will make application very slow, 
     
-    We use CachePixbuf increase the call times of gtk.gdk.pixbuf.scale_simple. 
+    CachePixbuf is handle of global scaled_pixbuf_cache, 
+    so switch between different size or mirror flags don't need scale pixbuf again.
     '''
 	
     def __init__(self):
@@ -52,32 +381,23 @@ class CachePixbuf(object):
         @param vertical_mirror: Whether pixbuf mirror vertically.
         @param horizontal_mirror: Whether pixbuf mirror horizontally.
         '''
-        if self.pixbuf != pixbuf or self.scale_width != scale_width or self.scale_height != scale_height:
+        if (self.cache_pixbuf == None
+            or self.pixbuf != pixbuf 
+            or self.scale_width != scale_width 
+            or self.scale_height != scale_height
+            or self.vertical_mirror != vertical_mirror
+            or self.horizontal_mirror != horizontal_mirror):
             # Record init value.
             self.pixbuf = pixbuf # pixbuf always is same as create from file
             self.scale_width = scale_width
             self.scale_height = scale_height
-            
-            # Scale size.
-            self.cache_pixbuf = pixbuf.scale_simple(scale_width, scale_height, gtk.gdk.INTERP_BILINEAR)
-            
-            # If vertical_mirror default is True, vertical mirror *original* pixbuf first.
-            if self.vertical_mirror:
-                self.cache_pixbuf = self.cache_pixbuf.flip(True)
-                
-            # If horizontal_mirror default is True, horizontal mirror *original* pixbuf first.
-            if self.horizontal_mirror:
-                self.cache_pixbuf = self.cache_pixbuf.flip(False)
-                
-        # If vertical_mirror changed, vertical mirror *self* first
-        if self.vertical_mirror != vertical_mirror:
             self.vertical_mirror = vertical_mirror
-            self.cache_pixbuf = self.cache_pixbuf.flip(True)
-            
-        # If horizontal_mirror changed, horizontal mirror *self* first
-        if self.horizontal_mirror != horizontal_mirror:
             self.horizontal_mirror = horizontal_mirror
-            self.cache_pixbuf = self.cache_pixbuf.flip(False)
+            
+            # Fetch scaled pixbuf from global cache.
+            self.cache_pixbuf = scaled_pixbuf_cache.get(
+                pixbuf, scale_width, scale_height, gtk.gdk.INTERP_BILINEAR,
+                vertical_mirror, horizontal_mirror)
             
     def get_cache(self):
         '''
@@ -86,4 +406,3 @@ class CachePixbuf(object):
         @return: Return cache pixbuf. 
         '''
         return self.cache_pixbuf
-        
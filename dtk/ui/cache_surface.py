@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+# 
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import OrderedDict
+from utils import cairo_state
+import cairo
+import gtk
+
+class CacheSurface(object):
+    '''
+    Cache surface use to cache render result of view item.
+    
+    Render item with pango layout is slow, 
+    view can paint cache surface of item instead re-render it when scroll.
+    
+    Cache surface is keyed by item and render key, 
+    render key should contain all status that change render result, 
+    such as cell size, select status and theme ticker.
+    
+    Surfaces are evicted with LRU order when memory usage bigger than max size.
+    '''
+	
+    def __init__(self, max_size=16 * 1024 * 1024):
+        '''
+        Init cache surface.
+        
+        @param max_size: Max memory size of cache surfaces, in byte, default is 16MB.
+        '''
+        self.max_size = max_size
+        self.cache_size = 0
+        self.surface_dict = OrderedDict()
+        self.item_keys_dict = {}
+        self.hit_count = 0
+        self.miss_count = 0
+        
+    def render(self, cr, item, render_key, rect, render_callback):
+        '''
+        Paint cache surface of item at given rectangle, 
+        build cache surface with render_callback if not found in cache.
+        
+        @param cr: Cairo context.
+        @param item: View item.
+        @param render_key: Render key, must be hashable.
+        @param rect: Render rectangle.
+        @param render_callback: Render callback, argument is (cr, rect), render rectangle start at (0, 0).
+        '''
+        if rect.width <= 0 or rect.height <= 0:
+            return
+        
+        cache_key = (item, render_key)
+        if cache_key in self.surface_dict:
+            surface = self.surface_dict.pop(cache_key)
+            self.hit_count += 1
+        else:
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, rect.height)
+            surface_cr = gtk.gdk.CairoContext(cairo.Context(surface))
+            surface_cr.rectangle(0, 0, rect.width, rect.height)
+            surface_cr.clip()
+            render_callback(surface_cr, gtk.gdk.Rectangle(0, 0, rect.width, rect.height))
+            self.miss_count += 1
+            
+            self.cache_size += surface.get_stride() * rect.height
+            if item in self.item_keys_dict:
+                self.item_keys_dict[item].add(render_key)
+            else:
+                self.item_keys_dict[item] = set([render_key])
+            
+        self.surface_dict[cache_key] = surface
+        self.shrink()
+        
+        with cairo_state(cr):
+            cr.set_source_surface(surface, rect.x, rect.y)
+            cr.rectangle(rect.x, rect.y, rect.width, rect.height)
+            cr.fill()
+            
+    def shrink(self):
+        '''
+        Remove least recently used surfaces until memory usage not bigger than max size.
+        '''
+        while self.cache_size > self.max_size and len(self.surface_dict) > 1:
+            ((item, render_key), surface) = self.surface_dict.popitem(last=False)
+            self.remove_key(item, render_key, surface)
+            
+    def remove_key(self, item, render_key, surface):
+        '''
+        Internal function to update memory usage and key index after surface removed.
+        '''
+        self.cache_size -= surface.get_stride() * surface.get_height()
+        
+        render_keys = self.item_keys_dict[item]
+        render_keys.discard(render_key)
+        if len(render_keys) == 0:
+            del self.item_keys_dict[item]
+        
+    def invalidate(self, item):
+        '''
+        Remove all cache surfaces of given item.
+        
+        @param item: View item.
+        '''
+        if item in self.item_keys_dict:
+            for render_key in list(self.item_keys_dict[item]):
+                self.remove_key(item, render_key, self.surface_dict.pop((item, render_key)))
+                
+    def clear(self):
+        '''
+        Remove all cache surfaces.
+        '''
+        self.surface_dict.clear()
+        self.item_keys_dict.clear()
+        self.cache_size = 0
+        
+    def get_stats(self):
+        '''
+        Get cache statistics.
+        
+        @return: Return (surface_number, cache_size, hit_count, miss_count).
+        '''
+        return (len(self.surface_dict), self.cache_size, self.hit_count, self.miss_count)
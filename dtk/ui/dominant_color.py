@@ -23,43 +23,114 @@
 from PIL import Image
 from constant import SHADE_SIZE
 from draw import draw_pixbuf, draw_vlinear, draw_hlinear
-from utils import propagate_expose, color_hex_to_cairo, find_similar_color
+from utils import propagate_expose, color_hex_to_cairo, find_similar_color, create_directory
 import gtk
-import scipy
-import scipy.cluster
-import scipy.misc
+import hashlib
+import numpy
+import os
+import threading as td
 import urllib
 
 __all__ = ["get_dominant_color"]
 
-def get_dominant_color(image_path):
+DOMINANT_COLOR_CACHE_DIR = os.path.expanduser("~/.cache/deepin-ui/dominant_color")
+DOMINANT_COLOR_THUMBNAIL_SIZE = 150
+DOMINANT_COLOR_QUANTIZE_BITS = 3
+
+dominant_color_dict = {}
+dominant_color_lock = td.Lock()
+
+def get_dominant_color_key(image_path):
     '''
-    Parse image and return dominant color in image.
+    Internal function to get cache key of dominant color.
+    
+    Key is md5 of (path, mtime, size), same as thumbnail, so cache hit don't need read image file.
+    
+    @param image_path: Image path.
+    @return: Return hexadecimal md5 of (path, mtime, size).
+    '''
+    file_stat = os.stat(image_path)
+    key = "%s:%s:%s" % (os.path.abspath(image_path), int(file_stat.st_mtime), file_stat.st_size)
+    if isinstance(key, unicode):
+        key = key.encode("utf-8")
+        
+    return hashlib.md5(key).hexdigest()
+
+def parse_dominant_color(image_path):
+    '''
+    Parse image and return dominant color in image, result won't cache.
+
+    Image is decoded at reduced size and shrink to thumbnail, 
+    then pixels are quantized to coarse color bins, 
+    dominant color is average color of the most frequent bin.
 
     @param image_path: Image path to parse.
     @return: Return dominant color, format as hexadecimal number. 
     '''
-    # print 'reading image'
     im = Image.open(image_path)
-    im = im.resize((150, 150))      # optional, to reduce time
-    ar = scipy.misc.fromimage(im)
-    shape = ar.shape
-    ar = ar.reshape(scipy.product(shape[:2]), shape[2])
     
-    # print 'finding clusters'
-    NUM_CLUSTERS = 5
-    codes, dist = scipy.cluster.vq.kmeans(ar, NUM_CLUSTERS)
-    # print 'cluster centres:\n', codes
+    # Let decoder (such as JPEG) decode image at reduced size.
+    im.draft("RGB", (DOMINANT_COLOR_THUMBNAIL_SIZE, DOMINANT_COLOR_THUMBNAIL_SIZE))
+    im = im.convert("RGB")
+    im.thumbnail((DOMINANT_COLOR_THUMBNAIL_SIZE, DOMINANT_COLOR_THUMBNAIL_SIZE))
+    
+    pixels = numpy.asarray(im, dtype=numpy.uint8).reshape(-1, 3)
     
-    vecs, dist = scipy.cluster.vq.vq(ar, codes)         # assign codes
-    counts, bins = scipy.histogram(vecs, len(codes))    # count occurrences
+    # Count pixels in coarse color bins.
+    shift = 8 - DOMINANT_COLOR_QUANTIZE_BITS
+    quantize_pixels = (pixels >> shift).astype(numpy.int32)
+    bins = ((quantize_pixels[:, 0] << (DOMINANT_COLOR_QUANTIZE_BITS * 2))
+            | (quantize_pixels[:, 1] << DOMINANT_COLOR_QUANTIZE_BITS)
+            | quantize_pixels[:, 2])
+    counts = numpy.bincount(bins)
     
-    index_max = scipy.argmax(counts)                    # find most frequent
-    peak = codes[index_max]
-    colour = ''.join(chr(c) for c in peak).encode('hex')
-    # print 'most frequent is %s (#%s)' % (peak, colour)
+    # Average color of most frequent bin.
+    peak = pixels[bins == numpy.argmax(counts)].mean(axis=0)
     
-    return "#%s" % (colour[0:6])
+    return "#%02x%02x%02x" % tuple(int(round(c)) for c in peak)
+
+def get_dominant_color(image_path):
+    '''
+    Parse image and return dominant color in image.
+    
+    Result is cached in memory and disk with path, mtime and size of image,
+    so parse same image again won't read image.
+
+    @param image_path: Image path to parse.
+    @return: Return dominant color, format as hexadecimal number. 
+    '''
+    cache_key = get_dominant_color_key(image_path)
+    
+    # Read cache in memory.
+    with dominant_color_lock:
+        if dominant_color_dict.has_key(cache_key):
+            return dominant_color_dict[cache_key]
+        
+    # Read cache on disk.
+    cache_file = os.path.join(DOMINANT_COLOR_CACHE_DIR, cache_key)
+    dominant_color = None
+    if os.path.exists(cache_file):
+        with open(cache_file, "r") as f:
+            dominant_color = f.read().strip()
+            
+        if len(dominant_color) != 7 or not dominant_color.startswith("#"):
+            dominant_color = None
+            
+    # Parse image if cache not exist.
+    if dominant_color == None:
+        dominant_color = parse_dominant_color(image_path)
+        
+        try:
+            create_directory(DOMINANT_COLOR_CACHE_DIR)
+            with open(cache_file, "w") as f:
+                f.write(dominant_color)
+        except Exception, e:
+            print "get_dominant_color: write cache failed: %s" % (e)
+            
+    with dominant_color_lock:
+        dominant_color_dict[cache_key] = dominant_color
+        
+    return dominant_color
 
 class ColorTestWidget(gtk.DrawingArea):
     '''
@@ -30,7 +30,7 @@ import pango
 import pangocairo
 from utils import (cairo_state, cairo_disable_antialias, color_hex_to_cairo, 
                    add_color_stop_rgba, propagate_expose, 
-                   alpha_color_hex_to_cairo, layout_set_markup)
+                   alpha_color_hex_to_cairo, get_text_layout)
 
 def draw_radial_ring(cr, x, y, outer_radius, inner_radius, color_infos):
     '''
@@ -365,24 +365,17 @@ def render_text(cr, markup, x, y, w, h, text_size=DEFAULT_FONT_SIZE, text_color=
     # Create pangocairo context.
     context = pangocairo.CairoContext(cr)
     
-    # Set layout.
-    layout = context.create_layout()
-    layout.set_font_description(pango.FontDescription("%s %s" % (text_font, text_size)))
-    layout_set_markup(layout, markup)
-    layout.set_alignment(alignment)
+    # Get cached layout, and update it with target context.
     if wrap_width == None:
-        layout.set_single_paragraph_mode(True)
-        layout.set_width(w * pango.SCALE)
-        layout.set_ellipsize(pango.ELLIPSIZE_END)
+        layout = get_text_layout(markup, text_size, text_font, alignment, ellipsize_width=w)
     else:
-        layout.set_width(wrap_width * pango.SCALE)
-        layout.set_wrap(pango.WRAP_WORD)
+        layout = get_text_layout(markup, text_size, text_font, alignment, wrap_width=wrap_width)
+    context.update_layout(layout)
     (text_width, text_height) = layout.get_pixel_size()
     
     # Draw text.
     cr.move_to(x, y + (h - text_height) / 2)
     cr.set_source_rgb(*color_hex_to_cairo(text_color))
-    context.update_layout(layout)
     context.show_layout(layout)
         
 def draw_line(cr, sx, sy, ex, ey, line_width=1, antialias_status=cairo.ANTIALIAS_NONE):
@@ -21,14 +21,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from constant import DEFAULT_FONT_SIZE, ALIGN_START, ALIGN_MIDDLE, WIDGET_POS_TOP_LEFT
-from draw import draw_vlinear, draw_text
+from draw import draw_vlinear, draw_hlinear, draw_text
 from keymap import get_keyevent_name
-from line import HSeparator
 from scrolled_window import ScrolledWindow
 from theme import ui_theme
+import bisect
 import gobject
 import gtk
-from utils import (is_in_rect, get_content_size, propagate_expose, 
+from utils import (get_content_size, 
                    get_widget_root_coordinate, get_screen_size, 
                    alpha_color_hex_to_cairo, 
                    cairo_disable_antialias, color_hex_to_cairo)
@@ -39,7 +39,6 @@ droplist_grab_window = gtk.Window(gtk.WINDOW_POPUP)
 droplist_grab_window.move(0, 0)
 droplist_grab_window.set_default_size(0, 0)
 droplist_grab_window.show()
-droplist_active_item = None
 droplist_grab_window_press_flag = False
 
 root_droplists = []
@@ -177,7 +176,6 @@ def droplist_grab_window_button_press(widget, event):
     @param widget: Droplist widget.
     @param event: Button press event.
     '''
-    global droplist_active_item
     global droplist_grab_window_press_flag
 
     droplist_grab_window_press_flag = True
@@ -190,8 +188,8 @@ def droplist_grab_window_button_press(widget, event):
             event_widget.event(event)
         elif isinstance(event_widget, Droplist):
             droplist_item = event_widget.get_droplist_item_at_coordinate(event.get_root_coords())
-            if droplist_item:
-                droplist_item.item_box.event(event)
+            if droplist_item and droplist_item.item:
+                droplist_item.wrap_droplist_clicked_action()
         else:
             event_widget.event(event)
             droplist_grab_window_focus_out()
@@ -203,7 +201,6 @@ def droplist_grab_window_motion_notify(widget, event):
     @param widget: Droplist widget.
     @param event: Motion notify signal.
     '''
-    global droplist_active_item
     global droplist_grab_window_press_flag
     
     if event and event.window:
@@ -226,26 +223,8 @@ def droplist_grab_window_motion_notify(widget, event):
             
             if not droplist_grab_window_press_flag:
                 droplist_item = event_widget.get_droplist_item_at_coordinate(event.get_root_coords())
-                if droplist_item and isinstance(droplist_item.item_box, gtk.Button):
-                    if droplist_active_item:
-                        droplist_active_item.item_box.set_state(gtk.STATE_NORMAL)
-                    
-                    droplist_item.item_box.set_state(gtk.STATE_PRELIGHT)
-                    droplist_active_item = droplist_item
-                    
-                    enter_notify_event = gtk.gdk.Event(gtk.gdk.ENTER_NOTIFY)
-                    enter_notify_event.window = event.window
-                    enter_notify_event.time = event.time
-                    enter_notify_event.send_event = True
-                    enter_notify_event.x_root = event.x_root
-                    enter_notify_event.y_root = event.y_root
-                    enter_notify_event.x = event.x
-                    enter_notify_event.y = event.y
-                    enter_notify_event.state = event.state
-                    
-                    droplist_item.item_box.event(enter_notify_event)
-                    
-                    droplist_item.item_box.queue_draw()
+                if droplist_item and droplist_item.item and droplist_item.index != event_widget.item_select_index:
+                    event_widget.active_item(droplist_item.index)
         else:
             for droplist in root_droplists:
                 motion_notify_event = gtk.gdk.Event(gtk.gdk.MOTION_NOTIFY)
@@ -291,12 +270,19 @@ class Droplist(gtk.Window):
     '''
     Droplist.
     
+    Droplist don't create widget for item, it draw items itself, 
+    and only draw items in visible area, so droplist with thousands of items can popup quickly.
+    
     @undocumented: expose_item_align
     @undocumented: droplist_key_press
     @undocumented: droplist_key_release
     @undocumented: expose_droplist_frame
     @undocumented: init_droplist
     @undocumented: adjust_droplist_position
+    @undocumented: get_item_index_at_offset
+    @undocumented: scroll_to_item
+    @undocumented: search_item
+    @undocumented: get_search_key
     '''
     
     __gsignals__ = {
@@ -353,6 +339,11 @@ class Droplist(gtk.Window):
         self.item_padding_y = item_padding_y
         self.max_width = max_width
         self.item_select_index = 0
+        self.search_index = None
+        self.search_keys = None
+        self.search_text = u""
+        self.search_time = 0
+        self.search_timeout = 1000 # milliseconds
         
         # Init droplist window.
         self.set_opacity(opacity)
@@ -365,6 +356,7 @@ class Droplist(gtk.Window):
         self.droplist_frame.set_padding(1, 1, 1, 1)
         
         # Add droplist item.
+        # Item box is just placeholder, items are drawn in expose_item_align.
         self.item_box = gtk.VBox()
         self.item_align = gtk.Alignment()
         self.item_align.set_padding(padding_y, padding_y, padding_x, padding_x)
@@ -375,6 +367,13 @@ class Droplist(gtk.Window):
         self.item_scrolled_window.add_child(self.item_align)
         self.droplist_items = []
         
+        # Offset of item is prefix sum of item heights, 
+        # last value is height of all items.
+        self.item_offsets = [0]
+        
+        # Index of items that can select, separator is not include.
+        self.item_indexs = []
+        
         if items:
             for (index, item) in enumerate(items):
                 droplist_item = DroplistItem(
@@ -383,7 +382,14 @@ class Droplist(gtk.Window):
                     padding_x, padding_y,
                     item_padding_left, item_padding_right, item_padding_y, self.max_width)
                 self.droplist_items.append(droplist_item)
-                self.item_box.pack_start(droplist_item.item_box, False, False)
+                self.item_offsets.append(self.item_offsets[-1] + droplist_item.item_box_height)
+                
+                if item:
+                    self.item_indexs.append(index)
+                    
+        self.item_box.set_size_request(
+            self.get_droplist_width() - padding_x * 2,
+            self.item_offsets[-1])
                 
         self.connect_after("show", self.adjust_droplist_position)        
         self.droplist_frame.connect("expose-event", self.expose_droplist_frame)
@@ -408,13 +414,11 @@ class Droplist(gtk.Window):
         '''
         Get droplist width.
         '''
-        item_content_width = max(map(lambda item: get_content_size(item.item[0], self.font_size)[0], 
-                                     filter(lambda item: isinstance(item.item_box, gtk.Button), self.droplist_items)))
-        if self.max_width != None:
-            return self.padding_x * 2 + min(self.max_width,
-                                            self.item_padding_left + self.item_padding_right + int(item_content_width))
+        item_widths = map(lambda index: self.droplist_items[index].item_box_width, self.item_indexs)
+        if len(item_widths) > 0:
+            return self.padding_x * 2 + max(item_widths)
         else:
-            return self.padding_x * 2 + self.item_padding_left + self.item_padding_right + int(item_content_width)
+            return self.padding_x * 2 + self.item_padding_left + self.item_padding_right
         
     def expose_item_align(self, widget, event):
         '''
@@ -433,15 +437,43 @@ class Droplist(gtk.Window):
         cr.rectangle(x, y, w, h)    
         cr.fill()
         
+        # Draw items in expose area.
+        if len(self.droplist_items) > 0:
+            item_rect = self.item_box.allocation
+            start_index = self.get_item_index_at_offset(event.area.y - item_rect.y)
+            end_index = self.get_item_index_at_offset(event.area.y + event.area.height - item_rect.y)
+            
+            for index in range(start_index, end_index + 1):
+                self.droplist_items[index].render(
+                    cr, 
+                    gtk.gdk.Rectangle(
+                        item_rect.x,
+                        item_rect.y + self.item_offsets[index],
+                        item_rect.width,
+                        self.droplist_items[index].item_box_height),
+                    index == self.item_select_index)
+        
+        return True
+        
+    def get_item_index_at_offset(self, offset_y):
+        '''
+        Internal function to get index of item at given offset, offset is clamp in item area.
+        
+        @param offset_y: Offset y relative to top of first item.
+        @return: Return index of item.
+        '''
+        index = bisect.bisect_right(self.item_offsets, offset_y) - 1
+        
+        return max(0, min(index, len(self.droplist_items) - 1))
+        
     def get_first_index(self):
         '''
         Get index of first item.
         
         @return: Return index of first item, or return None if haven't item in droplist.
         '''
-        item_indexs = filter(lambda (index, item): isinstance(item.item_box, gtk.Button), enumerate(self.droplist_items))        
-        if len(item_indexs) > 0:
-            return item_indexs[0][0]
+        if len(self.item_indexs) > 0:
+            return self.item_indexs[0]
         else:
             return None
         
@@ -451,9 +483,8 @@ class Droplist(gtk.Window):
         
         @return: Return index of last item, or return None if haven't item in droplist.
         '''
-        item_indexs = filter(lambda (index, item): isinstance(item.item_box, gtk.Button), enumerate(self.droplist_items))        
-        if len(item_indexs) > 0:
-            return item_indexs[-1][0]
+        if len(self.item_indexs) > 0:
+            return self.item_indexs[-1]
         else:
             return None
         
@@ -463,17 +494,12 @@ class Droplist(gtk.Window):
         
         @return: Return index of previous item, or return None if haven't item in droplist.
         '''
-        item_indexs = filter(lambda (index, item): isinstance(item.item_box, gtk.Button), enumerate(self.droplist_items))
-        if len(item_indexs) > 0:
-            index_list = map(lambda (index, item): index, item_indexs)
-            if self.item_select_index in index_list:
-                current_index = index_list.index(self.item_select_index)
-                if current_index > 0:
-                    return index_list[current_index - 1]
-                else:
-                    return self.item_select_index
+        position = bisect.bisect_left(self.item_indexs, self.item_select_index)
+        if position < len(self.item_indexs) and self.item_indexs[position] == self.item_select_index:
+            if position > 0:
+                return self.item_indexs[position - 1]
             else:
-                return None
+                return self.item_select_index
         else:
             return None
         
@@ -483,17 +509,12 @@ class Droplist(gtk.Window):
         
         @return: Return index of next item, or return None if haven't item in droplist.
         '''
-        item_indexs = filter(lambda (index, item): isinstance(item.item_box, gtk.Button), enumerate(self.droplist_items))
-        if len(item_indexs) > 0:
-            index_list = map(lambda (index, item): index, item_indexs)
-            if self.item_select_index in index_list:
-                current_index = index_list.index(self.item_select_index)
-                if current_index < len(index_list) - 1:
-                    return index_list[current_index + 1]
-                else:
-                    return self.item_select_index
+        position = bisect.bisect_left(self.item_indexs, self.item_select_index)
+        if position < len(self.item_indexs) and self.item_indexs[position] == self.item_select_index:
+            if position < len(self.item_indexs) - 1:
+                return self.item_indexs[position + 1]
             else:
-                return None
+                return self.item_select_index
         else:
             return None
         
@@ -507,9 +528,10 @@ class Droplist(gtk.Window):
         '''
         if item_index == None:
             item_index = self.item_select_index
-        item_offset_y = sum(map(lambda item: item.item_box_height, self.droplist_items)[0:item_index])
-        item_rect = self.droplist_items[item_index].item_box.get_allocation()
-        return (0, item_offset_y, item_rect.width, item_rect.height)
+        return (0, 
+                self.item_offsets[item_index], 
+                self.item_box.allocation.width, 
+                self.droplist_items[item_index].item_box_height)
         
     def active_item(self, item_index=None):
         '''
@@ -517,17 +539,23 @@ class Droplist(gtk.Window):
         
         @param item_index: If item_index is None, use select index.
         '''
-        global droplist_active_item
-        
-        if item_index == None:
-            item_index = self.item_select_index
+        if item_index != None:
+            self.item_select_index = item_index
             
-        if droplist_active_item:
-            droplist_active_item.item_box.set_state(gtk.STATE_NORMAL)
-                
-        item = self.droplist_items[item_index]
-        item.item_box.set_state(gtk.STATE_PRELIGHT)
-        droplist_active_item = item
+        self.item_align.queue_draw()
+        
+    def scroll_to_item(self, item_index=None):
+        '''
+        Internal function to scroll droplist to make item in visible area.
+        
+        @param item_index: If item_index is None, use select index.
+        '''
+        (item_x, item_y, item_width, item_height) = self.get_select_item_rect(item_index)
+        vadjust = self.item_scrolled_window.get_vadjustment()
+        if item_y < vadjust.get_value():
+            vadjust.set_value(item_y)
+        elif self.padding_y + item_y + item_height > vadjust.get_value() + vadjust.get_page_size():
+            vadjust.set_value(self.padding_y * 2 + item_y + item_height - vadjust.get_page_size())
         
     def select_first_item(self):
         '''
@@ -536,8 +564,7 @@ class Droplist(gtk.Window):
         if len(self.droplist_items) > 0:
             first_index = self.get_first_index()
             if first_index != None:
-                self.item_select_index = first_index
-                self.active_item()
+                self.active_item(first_index)
         
                 # Scroll to top.
                 vadjust = self.item_scrolled_window.get_vadjustment()
@@ -550,8 +577,7 @@ class Droplist(gtk.Window):
         if len(self.droplist_items) > 0:
             last_index = self.get_last_index()
             if last_index != None:
-                self.item_select_index = last_index
-                self.active_item()
+                self.active_item(last_index)
     
                 # Scroll to bottom.
                 vadjust = self.item_scrolled_window.get_vadjustment()
@@ -564,20 +590,12 @@ class Droplist(gtk.Window):
         if len(self.droplist_items) > 0:
             prev_index = self.get_prev_index()
             if prev_index != None:
-                global droplist_active_item
-                
-                if droplist_active_item:
-                    if self.item_select_index > 0:
-                        self.item_select_index = prev_index
-                        self.active_item()
+                self.active_item(prev_index)
                         
-                        # Make item in visible area.
-                        (item_x, item_y, item_width, item_height) = self.get_select_item_rect()
-                        vadjust = self.item_scrolled_window.get_vadjustment()
-                        if item_y < vadjust.get_value():
-                            vadjust.set_value(item_y)
-                else:
-                    self.select_first_item()
+                # Make item in visible area.
+                self.scroll_to_item()
+            else:
+                self.select_first_item()
     
     def select_next_item(self):
         '''
@@ -586,20 +604,12 @@ class Droplist(gtk.Window):
         if len(self.droplist_items) > 0:
             next_index = self.get_next_index()
             if next_index != None:
-                global droplist_active_item
-                
-                if droplist_active_item:
-                    if self.item_select_index < len(self.droplist_items) - 1:
-                        self.item_select_index = next_index
-                        self.active_item()
+                self.active_item(next_index)
                         
-                        # Make item in visible area.
-                        (item_x, item_y, item_width, item_height) = self.get_select_item_rect()
-                        vadjust = self.item_scrolled_window.get_vadjustment()
-                        if self.padding_y + item_y + item_height > vadjust.get_value() + vadjust.get_page_size():
-                            vadjust.set_value(self.padding_y * 2 + item_y + item_height - vadjust.get_page_size())
-                else:
-                    self.select_first_item()
+                # Make item in visible area.
+                self.scroll_to_item()
+            else:
+                self.select_first_item()
     
     def scroll_page_to_select_item(self):
         '''
@@ -614,37 +624,32 @@ class Droplist(gtk.Window):
         '''
         Scroll page up.
         '''
-        if len(self.droplist_items) > 0:
+        if len(self.item_indexs) > 0:
             # Scroll page up.
             vadjust = self.item_scrolled_window.get_vadjustment()
             vadjust.set_value(max(vadjust.get_lower(), vadjust.get_value() - vadjust.get_page_size()))
             
-            # Select nearest item.
-            item_infos = map(lambda (index, item): (index, self.get_select_item_rect(index)), enumerate(self.droplist_items))
-            for (index, (item_x, item_y, item_width, item_height)) in item_infos:
-                if item_y + self.padding_y > vadjust.get_value():
-                    self.item_select_index = index
-                    self.active_item()
-                    break
+            # Select first item that top edge in visible area.
+            offset_y = vadjust.get_value() - self.padding_y
+            index = bisect.bisect_right(self.item_offsets, offset_y)
+            position = min(bisect.bisect_left(self.item_indexs, index), len(self.item_indexs) - 1)
+            self.active_item(self.item_indexs[position])
     
     def scroll_page_down(self):
         '''
         Scroll page down.
         '''
-        if len(self.droplist_items) > 0:
-            # Scroll page up.
+        if len(self.item_indexs) > 0:
+            # Scroll page down.
             vadjust = self.item_scrolled_window.get_vadjustment()
             vadjust.set_value(min(vadjust.get_upper() - vadjust.get_page_size(),
                                   vadjust.get_value() + vadjust.get_page_size()))
             
-            # Select nearest item.
-            item_infos = map(lambda (index, item): (index, self.get_select_item_rect(index)), enumerate(self.droplist_items))
-            item_infos.reverse()
-            for (index, (item_x, item_y, item_width, item_height)) in item_infos:
-                if item_y + item_height + self.padding_y < vadjust.get_value() + vadjust.get_page_size():
-                    self.item_select_index = index
-                    self.active_item()
-                    break
+            # Select last item that bottom edge in visible area.
+            offset_y = vadjust.get_value() + vadjust.get_page_size() - self.padding_y
+            index = bisect.bisect_left(self.item_offsets, offset_y) - 2
+            position = max(bisect.bisect_right(self.item_indexs, index) - 1, 0)
+            self.active_item(self.item_indexs[position])
     
     def press_select_item(self):
         '''
@@ -653,6 +658,67 @@ class Droplist(gtk.Window):
         if len(self.droplist_items) > 0:
             if 0 <= self.item_select_index < len(self.droplist_items):
                 self.droplist_items[self.item_select_index].wrap_droplist_clicked_action()
+                
+    def get_search_key(self, item_content):
+        '''
+        Internal function to get search key of item content.
+        
+        @param item_content: Item content.
+        @return: Return lowercase unicode string.
+        '''
+        if isinstance(item_content, str):
+            item_content = unicode(item_content, "utf-8", "ignore")
+            
+        return item_content.lower()
+                
+    def search_item(self, keyval, event_time):
+        '''
+        Internal function to select item that match text typed by user.
+        
+        @param keyval: Keyval of key press event.
+        @param event_time: Time of key press event.
+        @return: Return True if key is used to search item.
+        '''
+        char = gtk.gdk.keyval_to_unicode(keyval)
+        if char == 0 or not (unichr(char).isalnum() or unichr(char) == u" "):
+            return False
+        
+        # Build search index when first search.
+        if self.search_index == None:
+            self.search_index = sorted(map(lambda index: (self.get_search_key(self.items[index][0]), index), self.item_indexs))
+            self.search_keys = map(lambda (key, index): key, self.search_index)
+            
+        # Reset search text if user stop typing for a while.
+        if event_time - self.search_time > self.search_timeout:
+            self.search_text = u""
+        self.search_time = event_time
+        
+        # Search next item when user press same character repeatedly.
+        search_text = self.search_text + unichr(char).lower()
+        if len(search_text) > 1 and search_text == search_text[0] * len(search_text):
+            search_text = search_text[0]
+            start_index = self.item_select_index + 1
+        else:
+            start_index = self.item_select_index
+        self.search_text = search_text
+        
+        match_indexs = []
+        position = bisect.bisect_left(self.search_keys, search_text)
+        while position < len(self.search_keys) and self.search_keys[position].startswith(search_text):
+            match_indexs.append(self.search_index[position][1])
+            position += 1
+        
+        if len(match_indexs) > 0:
+            # Select first match item after select item, or wrap to first match item.
+            next_indexs = filter(lambda index: index >= start_index, match_indexs)
+            if len(next_indexs) > 0:
+                self.active_item(min(next_indexs))
+            else:
+                self.active_item(min(match_indexs))
+                
+            self.scroll_to_item()
+            
+        return True
     
     def droplist_key_press(self, widget, event):
         '''
@@ -664,6 +730,8 @@ class Droplist(gtk.Window):
         key_name = get_keyevent_name(event)
         if self.keymap.has_key(key_name):
             self.keymap[key_name]()
+        elif not event.state & (gtk.gdk.CONTROL_MASK | gtk.gdk.MOD1_MASK):
+            self.search_item(event.keyval, event.time)
 
         return True     
     
@@ -704,23 +772,15 @@ class Droplist(gtk.Window):
         
         @return: Return match item with given coordinate, return None if haven't any item match coordinate.
         '''
-        match_droplist_item = None
-        
-        item_heights = map(lambda item: item.item_box_height, self.droplist_items)
-        item_offsets = map(lambda (index, height): sum(item_heights[0:index]), enumerate(item_heights))
-        
         vadjust = self.item_scrolled_window.get_vadjustment()
         (scrolled_window_x, scrolled_window_y) = get_widget_root_coordinate(self.item_scrolled_window, WIDGET_POS_TOP_LEFT)
-        for (index, droplist_item) in enumerate(self.droplist_items):
-            item_rect = droplist_item.item_box.get_allocation()
-            if is_in_rect((x, y), (scrolled_window_x, 
-                                   scrolled_window_y + item_offsets[index] - (vadjust.get_value() - vadjust.get_lower()),
-                                   item_rect.width, 
-                                   item_rect.height)):
-                match_droplist_item = droplist_item
-                break
-            
-        return match_droplist_item
+        offset_x = x - scrolled_window_x - self.padding_x
+        offset_y = y - scrolled_window_y - self.padding_y + (vadjust.get_value() - vadjust.get_lower())
+        
+        if 0 <= offset_x < self.item_box.allocation.width and 0 <= offset_y < self.item_offsets[-1]:
+            return self.droplist_items[self.get_item_index_at_offset(offset_y)]
+        else:
+            return None
     
     def init_droplist(self, widget):
         '''
@@ -764,11 +824,7 @@ class Droplist(gtk.Window):
         # Adjust coordinate.
         (screen_width, screen_height) = get_screen_size(self)
         
-        droplist_width = 0
-        for droplist_item in self.droplist_items:
-            if droplist_width == 0 and isinstance(droplist_item.item_box, gtk.Button):
-                droplist_width = droplist_item.item_box_width
-        droplist_width += self.padding_x * 2    
+        droplist_width = self.get_droplist_width()
         droplist_height = self.allocation.height
         
         if self.x_align == ALIGN_START:
@@ -809,11 +865,10 @@ class DroplistItem(object):
     '''
     DroplistItem for L{ I{Droplist} <Droplist>}.
     
-    @undocumented: create_separator_item
-    @undocumented: create_droplist_item
-    @undocumented: realize_item_box
+    DroplistItem don't create widget, it's drawn by Droplist.
+    
     @undocumented: wrap_droplist_clicked_action
-    @undocumented: expose_droplist_item
+    @undocumented: render
     '''
     
     def __init__(self, 
@@ -855,61 +910,17 @@ class DroplistItem(object):
         self.max_width = max_width
         self.arrow_padding_x = 5
 
-        # Create.
+        # Init size.
         if self.item:
-            self.create_droplist_item()
-        else:
-            self.create_separator_item()
-        
-    def create_separator_item(self):
-        '''
-        Internal function, create separator item.
-        '''
-        self.item_box = HSeparator(
-            ui_theme.get_shadow_color("h_separator").get_color_info(),
-            self.item_padding_left, 
-            self.item_padding_y)
-        self.item_box_height = self.item_padding_y * 2 + 1
-        
-    def create_droplist_item(self):
-        '''
-        Internal function, create droplist item.
-        '''
-        # Get item information.
-        (item_content, item_value) = self.item[0:2]
-        
-        # Create button.
-        self.item_box = gtk.Button()
-        
-        # Expose button.
-        self.item_box.connect(
-            "expose-event", 
-            lambda w, e: self.expose_droplist_item(
-                w, e, item_content))
-        
-        # Wrap droplist aciton.
-        self.item_box.connect("button-press-event", lambda w, e: self.wrap_droplist_clicked_action())        
-        
-        self.item_box.connect("realize", lambda w: self.realize_item_box(w, item_content))
-        
-    def realize_item_box(self, widget, item_content):
-        '''
-        Internal function, realize item box.
-        
-        @param widget: DropItem widget.
-        @param item_content: Item content.
-        '''
-        # Set button size.
-        (width, height) = get_content_size(item_content, self.font_size)
-        self.item_box_height = self.item_padding_y * 2 + int(height)
-        self.item_box_width = self.item_padding_left + self.item_padding_right + int(width)
-
-        if self.max_width != None:
-            self.item_box_width = min(self.item_box_width, self.max_width)        
-        else:
-            self.item_box_width = self.item_box_width        
+            (width, height) = get_content_size(self.item[0], self.font_size)
+            self.item_box_height = self.item_padding_y * 2 + int(height)
+            self.item_box_width = self.item_padding_left + self.item_padding_right + int(width)
             
-        self.item_box.set_size_request(self.item_box_width, self.item_box_height)        
+            if self.max_width != None:
+                self.item_box_width = min(self.item_box_width, self.max_width)        
+        else:
+            self.item_box_height = self.item_padding_y * 2 + 1
+            self.item_box_width = 0
         
     def wrap_droplist_clicked_action(self):
         '''
@@ -921,39 +932,39 @@ class DroplistItem(object):
         # Hide droplist.
         droplist_grab_window_focus_out()
             
-    def expose_droplist_item(self, widget, event, item_content):
+    def render(self, cr, rect, is_select):
         '''
-        Internal function to handle `expose-event` signal of item.
+        Internal function to render item.
 
-        @param widget: DropItem widget.
-        @param event: Expose event.
-        @param item_content: Item content.
+        @param cr: Cairo context.
+        @param rect: Render rectangle of item.
+        @param is_select: Whether item is selected.
         '''
-        # Init.
-        cr = widget.window.cairo_create()
-        rect = widget.allocation
-        font_color = ui_theme.get_color("menu_font").get_color()
-        
-        # Draw select effect.
-        if self.subdroplist_active or widget.state in [gtk.STATE_PRELIGHT, gtk.STATE_ACTIVE]:
-            # Draw background.
-            draw_vlinear(cr, rect.x, rect.y, rect.width, rect.height, 
-                         ui_theme.get_shadow_color("menu_item_select").get_color_info())
-            
-            # Set font color.
-            font_color = ui_theme.get_color("menu_select_font").get_color()
+        if self.item:
+            font_color = ui_theme.get_color("menu_font").get_color()
             
-        # Draw item content.
-        draw_text(cr, item_content, 
-                    rect.x + self.item_padding_left,
-                    rect.y,
-                    rect.width,
-                    rect.height,
-                    self.font_size, font_color,
-                    )
-        
-        # Propagate expose to children.
-        propagate_expose(widget, event)
-    
-        return True
-
+            # Draw select effect.
+            if self.subdroplist_active or is_select:
+                # Draw background.
+                draw_vlinear(cr, rect.x, rect.y, rect.width, rect.height, 
+                             ui_theme.get_shadow_color("menu_item_select").get_color_info())
+                
+                # Set font color.
+                font_color = ui_theme.get_color("menu_select_font").get_color()
+                
+            # Draw item content.
+            draw_text(cr, self.item[0], 
+                        rect.x + self.item_padding_left,
+                        rect.y,
+                        rect.width,
+                        rect.height,
+                        self.font_size, font_color,
+                        )
+        else:
+            # Draw separator.
+            draw_hlinear(cr, 
+                         rect.x + self.item_padding_left, 
+                         rect.y + self.item_padding_y, 
+                         rect.width - self.item_padding_left * 2, 
+                         1, 
+                         ui_theme.get_shadow_color("h_separator").get_color_info())
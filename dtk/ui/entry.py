@@ -35,7 +35,8 @@ import pango
 import pangocairo
 from utils import (propagate_expose, cairo_state, color_hex_to_cairo, 
                    get_content_size, is_double_click, is_right_button, 
-                   is_left_button, alpha_color_hex_to_cairo, cairo_disable_antialias)
+                   is_left_button, alpha_color_hex_to_cairo, cairo_disable_antialias,
+                   get_text_layout)
 
 class Entry(gtk.EventBox):
     '''
@@ -816,12 +817,7 @@ class Entry(gtk.EventBox):
         text_width = self.get_content_width(self.content)
         rect = self.get_allocation()
         if self.offset_x + rect.width - self.padding_x * 2 < text_width:
-            cr = widget.window.cairo_create()
-            context = pangocairo.CairoContext(cr)
-            layout = context.create_layout()
-            layout.set_font_description(pango.FontDescription("%s %s" % (DEFAULT_FONT, self.font_size)))
-            layout.set_text(self.content)
-            (text_width, text_height) = layout.get_pixel_size()
+            layout = get_text_layout(self.content, self.font_size, use_markup=False)
             (x_index, y_index) = layout.xy_to_index((self.offset_x + rect.width - self.padding_x * 2) * pango.SCALE, 0)
             
             self.offset_x += len(self.get_utf8_string(self.content[x_index::], 0))
@@ -831,12 +827,7 @@ class Entry(gtk.EventBox):
         Internal function to move offset_x to left.
         '''
         if self.offset_x > 0:
-            cr = widget.window.cairo_create()
-            context = pangocairo.CairoContext(cr)
-            layout = context.create_layout()
-            layout.set_font_description(pango.FontDescription("%s %s" % (DEFAULT_FONT, self.font_size)))
-            layout.set_text(self.content)
-            (text_width, text_height) = layout.get_pixel_size()
+            layout = get_text_layout(self.content, self.font_size, use_markup=False)
             (x_index, y_index) = layout.xy_to_index((self.offset_x + self.padding_x) * pango.SCALE, 0)
             
             self.offset_x -= len(self.get_utf8_string(self.content[0:x_index], -1))
@@ -845,11 +836,7 @@ class Entry(gtk.EventBox):
         '''
         Internal function to get index at event.
         '''
-        cr = widget.window.cairo_create()
-        context = pangocairo.CairoContext(cr)
-        layout = context.create_layout()
-        layout.set_font_description(pango.FontDescription("%s %s" % (DEFAULT_FONT, self.font_size)))
-        layout.set_text(self.content)
+        layout = get_text_layout(self.content, self.font_size, use_markup=False)
         (text_width, text_height) = layout.get_pixel_size()
         if int(event.x) + self.offset_x - self.padding_x > text_width:
             return len(self.content)
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+# 
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from utils import cairo_state
+import cairo
+import gtk
+import math
+
+# Surface is reused by all views, because views draw in main thread one by one.
+fade_surface_dict = {}
+fade_pattern_dict = {}
+
+def get_fade_surface(slot, width, height):
+    '''
+    Get offscreen surface to draw content under fade area.
+    
+    Surface is cached with slot, and just re-create when size changed.
+    
+    @param slot: Slot name of surface, view need different slot for top and bottom surface.
+    @param width: Surface width.
+    @param height: Surface height.
+    @return: Return (surface, surface_cr), surface is cleaned, and surface_cr is new context of surface.
+    '''
+    surface = fade_surface_dict.get(slot, None)
+    if surface == None or surface.get_width() != width or surface.get_height() != height:
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        fade_surface_dict[slot] = surface
+        surface_cr = gtk.gdk.CairoContext(cairo.Context(surface))
+    else:
+        surface_cr = gtk.gdk.CairoContext(cairo.Context(surface))
+        
+        # Clean content of last frame.
+        with cairo_state(surface_cr):
+            surface_cr.set_operator(cairo.OPERATOR_CLEAR)
+            surface_cr.paint()
+            
+    return (surface, surface_cr)
+
+def get_fade_pattern(height, fade_in):
+    '''
+    Get alpha mask pattern of fade area.
+    
+    Alpha of pattern follow sine curve, same as paint surface line by line with alpha sin(i * pi / 2 / height).
+    
+    @param height: Height of fade area.
+    @param fade_in: Alpha increase from top to bottom if fade_in is True, otherwise decrease.
+    @return: Return linear gradient pattern start at (0, 0) and end at (0, height).
+    '''
+    pattern_key = (height, fade_in)
+    if not fade_pattern_dict.has_key(pattern_key):
+        pattern = cairo.LinearGradient(0, 0, 0, height)
+        stop_number = max(min(height, 16), 1)
+        for index in range(0, stop_number + 1):
+            offset = float(index) / stop_number
+            alpha = math.sin(offset * math.pi / 2)
+            if not fade_in:
+                alpha = 1.0 - alpha
+            pattern.add_color_stop_rgba(offset, 0, 0, 0, alpha)
+            
+        fade_pattern_dict[pattern_key] = pattern
+        
+    return fade_pattern_dict[pattern_key]
+
+def paint_fade_surface(cr, surface, x, y, fade_in):
+    '''
+    Paint surface with fade alpha mask, just need one mask operation.
+    
+    @param cr: Cairo context.
+    @param surface: Surface to paint, it's return value of get_fade_surface.
+    @param x: X coordinate to paint surface.
+    @param y: Y coordinate to paint surface.
+    @param fade_in: Alpha increase from top to bottom if fade_in is True, otherwise decrease.
+    '''
+    with cairo_state(cr):
+        cr.translate(x, y)
+        cr.rectangle(0, 0, surface.get_width(), surface.get_height())
+        cr.clip()
+        cr.set_source_surface(surface, 0, 0)
+        cr.mask(get_fade_pattern(surface.get_height(), fade_in))
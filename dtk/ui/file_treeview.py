@@ -22,18 +22,20 @@
 
 from new_treeview import TreeItem
 import collections
-from gio_utils import (get_file_icon_pixbuf, is_directory, get_dir_child_files, 
-                       get_gfile_modification_time, get_gfile_size,
-                       get_gfile_type,get_file_type_dict,
-                       get_gfile_name, get_gfile_content_type, sort_file_by_name)
+from gio_utils import (get_file_info_icon_pixbuf, get_file_info_icon_pixbufs, get_dir_child_infos, 
+                       lookup_dir_child_num, get_cached_dir_child_num,
+                       get_file_info_modification_time, get_file_info_content_type,
+                       get_file_type_dict, get_dir_child_info_batches,
+                       sort_file_by_name, FILE_INFO_ATTRIBUTES)
 from draw import draw_pixbuf, draw_text, draw_vlinear
-from threads import post_gui
+from thread_pool import MissionThreadPool, MissionThread
+from threads import post_gui, AnonymityThread
 from theme import ui_theme
 import pango
 import gobject
 import gio
 import threading as td
-from utils import cairo_disable_antialias, get_content_size, format_file_size
+from utils import cairo_disable_antialias, get_content_size, format_file_size, remove_timeout_id
 import traceback
 import sys
 
@@ -46,6 +48,26 @@ COLUMN_OFFSET = 32
 MODIFICATION_TIME_PADDING_LEFT = 12
 CONTENT_TYPE_PADDING_LEFT = 12
 SIZE_PADDING_LEFT = 12
+LOADING_BATCH_SIZE = 200
+MONITOR_UPDATE_DELAY = 300 # milliseconds
+MONITOR_EVENTS = [gio.FILE_MONITOR_EVENT_CREATED,
+                  gio.FILE_MONITOR_EVENT_DELETED,
+                  gio.FILE_MONITOR_EVENT_CHANGES_DONE_HINT,
+                  gio.FILE_MONITOR_EVENT_ATTRIBUTE_CHANGED]
+
+child_num_pool = None
+
+def get_child_num_pool():
+    '''
+    Get thread pool that count children of directory, pool is created when first use.
+    '''
+    global child_num_pool
+    
+    if child_num_pool == None:
+        child_num_pool = MissionThreadPool(2)
+        child_num_pool.start()
+        
+    return child_num_pool
 
 def sort_by_key(items, sort_reverse, sort_key):
     if len(items) == 1 and (isinstance(items[0], EmptyItem) or isinstance(items[0], LoadingItem)):
@@ -54,16 +76,20 @@ def sort_by_key(items, sort_reverse, sort_key):
         # Init.
         item_oreder_dict = collections.OrderedDict(get_file_type_dict())
         
-        # Split item with different file type.
+        # Split item with different file type, loading item keep at end when children is loading.
+        loading_items = []
         for item in items:
-            item_oreder_dict[item.type].append(item)
+            if isinstance(item, EmptyItem) or isinstance(item, LoadingItem):
+                loading_items.append(item)
+            else:
+                item_oreder_dict[item.type].append(item)
             
         # Get sorted item list.
         item_list = []
         for (file_type, type_items) in item_oreder_dict.items():
             item_list += sorted(type_items, key=sort_key, reverse=sort_reverse)
             
-        return item_list    
+        return item_list + loading_items
 
 def sort_by_name(items, sort_reverse):
     return sort_by_key(items, sort_reverse, lambda i: i.name)
@@ -103,28 +129,65 @@ class LoadingThread(td.Thread):
         self.dir_item = dir_item
         
     def run(self):
+        self.items = []
         try:
             self.dir_item.load_status = self.dir_item.LOADING_START
-            self.items = get_dir_items(self.dir_item.gfile.get_path(), self.dir_item.column_index + 1)
-            if self.items == []:
-                self.items = [EmptyItem(self.dir_item.column_index + 1)]
             
-            for item in self.items:
-                item.parent_item = self.dir_item
-                
-            self.dir_item.load_status = self.dir_item.LOADING_FINSIH
+            # Render children batch by batch, don't wait whole directory enumerated.
+            dir_gfile = self.dir_item.gfile
+            for file_infos in get_dir_child_info_batches(dir_gfile.get_path(), LOADING_BATCH_SIZE, FILE_INFO_ATTRIBUTES):
+                # Load icons of batch first, items just get icon from cache.
+                get_file_info_icon_pixbufs(file_infos, ICON_SIZE)
                 
-            self.render_items()
+                items = map(lambda file_info: create_item(dir_gfile.get_child(file_info.get_name()), 
+                                                          self.dir_item.column_index + 1,
+                                                          file_info),
+                            file_infos)
+                self.items += items
+                self.render_items(items)
         except Exception, e:
             print "class LoadingThread got error: %s" % (e)
             traceback.print_exc(file=sys.stdout)
+            
+        # Sort in loading thread with current sort method of TreeView, GUI thread just re-order items.
+        self.finish_render_items(self.dir_item.sort_items(self.items))
+        
+    @post_gui    
+    def render_items(self, items):
+        self.dir_item.add_loading_child_items(items)
         
     @post_gui    
-    def render_items(self):
-        self.dir_item.delete_chlid_item()
-        self.dir_item.child_items = self.items    
-        self.dir_item.add_child_item()
+    def finish_render_items(self, items):
+        self.dir_item.finish_loading_child_items(items)
 	
+class ChildNumMission(MissionThread):
+    '''
+    Mission to count children of directory.
+    '''
+    
+    def __init__(self, dir_item):
+        '''
+        Initialize ChildNumMission class.
+        
+        @param dir_item: DirItem that need child number.
+        '''
+        MissionThread.__init__(self)
+        self.dir_item = dir_item
+        
+    def get_mission_key(self):
+        return self.dir_item
+        
+    def start_mission(self):
+        try:
+            child_num = get_cached_dir_child_num(self.dir_item.gfile, self.dir_item.modification_timestamp)
+        except Exception, e:
+            print "class ChildNumMission got error: %s" % (e)
+            traceback.print_exc(file=sys.stdout)
+            
+            child_num = 0
+            
+        self.dir_item.set_child_num(child_num)
+        
 class DirItem(TreeItem):
     '''
     Directory item.
@@ -134,29 +197,69 @@ class DirItem(TreeItem):
     LOADING_START = 1
     LOADING_FINSIH = 2
     
-    def __init__(self, gfile, column_index=0):
+    def __init__(self, gfile, column_index=0, file_info=None):
         '''
         Initialize DirItem class.
+        
+        @param gfile: gio.File of directory.
+        @param column_index: Column index.
+        @param file_info: gio.FileInfo that query with FILE_INFO_ATTRIBUTES, query it if file_info is None.
         '''
         # Init.
         TreeItem.__init__(self)
+        if file_info == None:
+            file_info = gfile.query_info(FILE_INFO_ATTRIBUTES)
         self.gfile = gfile
-        self.type = get_gfile_type(self.gfile)
-        self.name = get_gfile_name(self.gfile)
-        self.modification_time = get_gfile_modification_time(self.gfile)
-        self.content_type = get_gfile_content_type(self.gfile)
-        self.size = get_gfile_size(self.gfile)
-        self.size_name = "%s 项" % (self.size)
+        self.type = file_info.get_file_type()
+        self.name = file_info.get_name()
+        self.modification_timestamp = file_info.get_modification_time()
+        self.modification_time = get_file_info_modification_time(file_info)
+        self.content_type = get_file_info_content_type(file_info)
         self.directory_path = gfile.get_path()
-        self.pixbuf = get_file_icon_pixbuf(self.directory_path, ICON_SIZE)
+        self.pixbuf = get_file_info_icon_pixbuf(file_info, ICON_SIZE)
         self.column_index = column_index
         self.is_expand = False
         self.load_status = self.LOADING_INIT
         self.name_width = get_name_width(self.column_index, self.name)
         self.modification_time_width = get_modification_time_width(self.modification_time)
         self.content_type_width = get_type_width(self.content_type)
+        
+        # Child number is counted when item is rendered first time.
+        self.child_num_requested = False
+        self.update_size(lookup_dir_child_num(self.directory_path, self.modification_timestamp))
+        
+        # Monitor directory when it's expanded.
+        self.file_monitor = None
+        self.monitor_timestamp = None
+        self.monitor_event_names = set()
+        self.monitor_update_id = None
+        self.monitor_update_running = False
+        
+    def update_size(self, child_num):
+        '''
+        Update size with child number, size is None if child number is unknown.
+        '''
+        self.size = child_num
+        if self.size == None:
+            self.size_name = ""
+        else:
+            self.size_name = "%s 项" % (self.size)
         self.size_width = get_size_width(self.size_name)
         
+    @post_gui
+    def set_child_num(self, child_num):
+        '''
+        Set child number after ChildNumMission finish, and redraw item.
+        '''
+        self.update_size(child_num)
+        
+        # Size column maybe need wider for new size name.
+        if self.update_widths_callback:
+            self.update_widths_callback([self])
+        
+        if self.redraw_request_callback:
+            self.redraw_request_callback(self)
+        
     def render_name(self, cr, rect):
         '''
         Render icon and name of DirItem.
@@ -252,6 +355,11 @@ class DirItem(TreeItem):
         '''
         Render size of DirItem.
         '''
+        # Count children when item is visible first time.
+        if self.size == None and not self.child_num_requested:
+            self.child_num_requested = True
+            get_child_num_pool().add_mission(ChildNumMission(self))
+        
         # Draw select background.
         if self.is_select:
             draw_vlinear(cr, rect.x ,rect.y, rect.width, rect.height,
@@ -278,17 +386,27 @@ class DirItem(TreeItem):
     def expand(self):
         self.is_expand = True
         
+        # Load children again if directory changed when it's collapsed.
+        if self.load_status == self.LOADING_FINSIH and self.is_modified():
+            self.load_status = self.LOADING_INIT
+        
         if self.load_status == self.LOADING_INIT:
             self.add_loading_item()
-        elif self.load_status == self.LOADING_FINSIH:
+        else:
+            # TreeView maybe sorted when directory is collapsed.
+            self.child_items = self.sort_items(self.child_items)
             self.add_child_item()
             
+        self.start_monitor()
+            
         if self.redraw_request_callback:
             self.redraw_request_callback(self)
     
     def unexpand(self):
         self.is_expand = False
         
+        self.stop_monitor()
+        
         self.delete_chlid_item()
     
         if self.redraw_request_callback:
@@ -303,9 +421,294 @@ class DirItem(TreeItem):
         
         LoadingThread(self).start()
     
+    def add_loading_child_items(self, items):
+        '''
+        Add children that loading thread enumerated, children insert before loading item.
+        '''
+        for item in items:
+            item.parent_item = self
+            
+        loading_item = self.child_items[-1]
+        self.child_items[-1:-1] = items
+        
+        if self.is_expand:
+            self.add_items_callback(items, loading_item.row_index)
+            
+    def finish_loading_child_items(self, items):
+        '''
+        Remove loading item and re-order children after loading thread finish.
+        
+        @param items: All children that sorted.
+        '''
+        self.load_status = self.LOADING_FINSIH
+        
+        self.update_child_items(items)
+        
+    def update_child_items(self, items):
+        '''
+        Update children, and update them in place if DirItem is expanded.
+        
+        @param items: All children that sorted.
+        '''
+        expand_items = self.get_expand_items()
+        
+        if items == []:
+            empty_item = EmptyItem(self.column_index + 1)
+            empty_item.parent_item = self
+            self.child_items = [empty_item]
+        else:
+            self.child_items = items
+            
+        # Re-order children in place, expanded children keep their descendants.
+        if self.is_expand:
+            self.replace_items_callback(
+                self.get_expand_items(),
+                self.row_index + 1,
+                self.row_index + 1 + len(expand_items))
+            
+    def get_sort_info(self):
+        '''
+        Get current sort method of TreeView, sort by name if TreeView haven't sorted.
+        
+        @return: Return (sort method, sort ascending).
+        '''
+        sort_info = None
+        if self.get_sort_method_callback:
+            sort_info = self.get_sort_method_callback()
+            
+        if sort_info == None:
+            return (sort_by_name, False)
+        else:
+            return sort_info
+        
+    def sort_items(self, items):
+        '''
+        Sort children with current sort method of TreeView.
+        
+        @param items: Children to sort.
+        @return: Return sorted children.
+        '''
+        (sort_method, sort_ascending) = self.get_sort_info()
+        return sort_method(items, sort_ascending)
+        
+    def set_sorted_child_items(self, child_items):
+        '''
+        Save sort order of children after TreeView sort column, then new child can insert with sort order.
+        
+        @param child_items: Visible children in sorted order.
+        '''
+        # Just save order when all children is visible.
+        if len(child_items) == len(self.child_items) and set(child_items) == set(self.child_items):
+            self.child_items = child_items
+        
+    def get_expand_items(self):
+        '''
+        Get visible descendants of DirItem, in tree order.
+        '''
+        items = []
+        if self.is_expand:
+            for child_item in self.child_items:
+                items.append(child_item)
+                if isinstance(child_item, DirItem):
+                    items += child_item.get_expand_items()
+                    
+        return items
+    
     def add_child_item(self):
         self.add_items_callback(self.child_items, self.row_index + 1)
         
+    def get_monitor_timestamp(self):
+        '''
+        Get modification time of directory to check whether directory changed.
+        '''
+        file_info = self.gfile.query_info("time::modified,time::modified-usec")
+        return (file_info.get_attribute_uint64("time::modified"), 
+                file_info.get_attribute_uint32("time::modified-usec"))
+    
+    def is_modified(self):
+        '''
+        Whether directory changed after monitor stop.
+        '''
+        try:
+            return self.get_monitor_timestamp() != self.monitor_timestamp
+        except gio.Error:
+            return True
+        
+    def start_monitor(self):
+        '''
+        Start monitor directory, changes of children are applied in batch.
+        '''
+        if self.file_monitor == None:
+            try:
+                self.file_monitor = self.gfile.monitor_directory()
+                self.file_monitor.connect("changed", self.file_monitor_changed)
+            except gio.Error, e:
+                print "DirItem.start_monitor: monitor %s failed: %s" % (self.directory_path, e)
+                
+    def stop_monitor(self):
+        '''
+        Stop monitor directory and expanded child directories.
+        '''
+        if self.file_monitor != None:
+            self.file_monitor.cancel()
+            self.file_monitor = None
+            
+            remove_timeout_id(self.monitor_update_id)
+            self.monitor_update_id = None
+            self.monitor_event_names = set()
+            
+            # Record modification time, to check whether directory changed when it's expanded again.
+            try:
+                self.monitor_timestamp = self.get_monitor_timestamp()
+            except gio.Error:
+                self.monitor_timestamp = None
+            
+            for child_item in self.child_items:
+                if isinstance(child_item, DirItem):
+                    child_item.stop_monitor()
+        
+    def file_monitor_changed(self, file_monitor, gfile, other_gfile, event_type):
+        '''
+        Collect changed children, update them together after MONITOR_UPDATE_DELAY.
+        '''
+        if event_type in MONITOR_EVENTS and gfile.get_path() != self.directory_path:
+            self.monitor_event_names.add(gfile.get_basename())
+            
+            if self.monitor_update_id == None:
+                self.monitor_update_id = gobject.timeout_add(MONITOR_UPDATE_DELAY, self.update_monitor_items)
+                
+    def update_monitor_items(self):
+        '''
+        Query changed children in thread.
+        '''
+        # Wait until loading or last update finish.
+        if self.load_status != self.LOADING_FINSIH or self.monitor_update_running:
+            return True
+        
+        names = self.monitor_event_names
+        column_index = self.column_index + 1
+        self.monitor_event_names = set()
+        self.monitor_update_id = None
+        self.monitor_update_running = True
+        
+        def query_items():
+            update_items = {}
+            for name in names:
+                try:
+                    update_items[name] = create_item(self.gfile.get_child(name), column_index)
+                # Child is deleted.
+                except gio.Error:
+                    update_items[name] = None
+                    
+            self.apply_monitor_items(update_items)
+        
+        AnonymityThread(query_items).start()
+        
+        return False
+    
+    @post_gui
+    def apply_monitor_items(self, update_items):
+        '''
+        Apply changed children, new child is inserted with sort order, deleted child is removed, changed directory is just redrawn.
+        
+        @param update_items: Dict of changed children, key is name, value is new item, value is None if child is deleted.
+        '''
+        self.monitor_update_running = False
+        
+        # Drop result if monitor stop or children load again, is_modified will check change when expand again.
+        if self.file_monitor == None or self.load_status != self.LOADING_FINSIH:
+            return
+        
+        child_dict = {}
+        for child_item in self.child_items:
+            if isinstance(child_item, DirItem) or isinstance(child_item, FileItem):
+                child_dict[child_item.name] = child_item
+                
+        delete_items = []
+        insert_items = []
+        for (name, item) in update_items.items():
+            old_item = child_dict.get(name)
+            
+            # Keep old DirItem, then expand status of directory won't lost.
+            if isinstance(old_item, DirItem) and isinstance(item, DirItem):
+                old_item.update_modification_time(item)
+            else:
+                if old_item != None:
+                    delete_items.append(old_item)
+                if item != None:
+                    item.parent_item = self
+                    insert_items.append(item)
+                    
+        # Remove deleted children and their expanded descendants.
+        if delete_items != []:
+            delete_rows = []
+            for item in delete_items:
+                delete_rows.append(item)
+                if isinstance(item, DirItem):
+                    item.stop_monitor()
+                    delete_rows += item.get_expand_items()
+                    
+            delete_item_set = set(delete_items)
+            self.child_items = filter(lambda i: not i in delete_item_set, self.child_items)
+            self.delete_items_callback(delete_rows)
+            
+        # Remove empty item before insert first child.
+        if insert_items != [] and len(self.child_items) == 1 and isinstance(self.child_items[0], EmptyItem):
+            self.delete_items_callback(self.child_items)
+            self.child_items = []
+            
+        # Insert new children at sort position.
+        for item in insert_items:
+            index = self.get_insert_index(item)
+            if index < len(self.child_items):
+                row = self.child_items[index].row_index
+            else:
+                row = self.row_index + 1 + len(self.get_expand_items())
+                
+            self.child_items.insert(index, item)
+            self.add_items_callback([item], row)
+            
+        # Show empty item when all children deleted.
+        if self.child_items == []:
+            empty_item = EmptyItem(self.column_index + 1)
+            empty_item.parent_item = self
+            self.child_items = [empty_item]
+            self.add_items_callback(self.child_items, self.row_index + 1)
+            
+    def get_insert_index(self, item):
+        '''
+        Internal function to find index of new child in sorted children with binary search.
+        
+        Sort method just sort list, so compare new child with middle child by sort them two.
+        '''
+        (sort_method, sort_ascending) = self.get_sort_info()
+        low = 0
+        high = len(self.child_items)
+        while low < high:
+            middle = (low + high) / 2
+            if sort_method([self.child_items[middle], item], sort_ascending)[0] == item:
+                high = middle
+            else:
+                low = middle + 1
+                
+        return low
+        
+    def update_modification_time(self, dir_item):
+        '''
+        Update modification time with new DirItem of same directory, child number is counted again.
+        '''
+        self.modification_timestamp = dir_item.modification_timestamp
+        self.modification_time = dir_item.modification_time
+        self.modification_time_width = dir_item.modification_time_width
+        self.child_num_requested = False
+        self.update_size(dir_item.size)
+        
+        if self.update_widths_callback:
+            self.update_widths_callback([self])
+        
+        if self.redraw_request_callback:
+            self.redraw_request_callback(self)
+        
     def delete_chlid_item(self):
         for child_item in self.child_items:
             if isinstance(child_item, DirItem) and child_item.is_expand:
@@ -358,20 +761,27 @@ class FileItem(TreeItem):
     File item.
     '''
 	
-    def __init__(self, gfile, column_index=0):
+    def __init__(self, gfile, column_index=0, file_info=None):
         '''
         Initialize FileItem class.
+        
+        @param gfile: gio.File of file.
+        @param column_index: Column index.
+        @param file_info: gio.FileInfo that query with FILE_INFO_ATTRIBUTES, query it if file_info is None.
         '''
         TreeItem.__init__(self)
+        if file_info == None:
+            file_info = gfile.query_info(FILE_INFO_ATTRIBUTES)
         self.gfile = gfile
-        self.type = get_gfile_type(self.gfile)
-        self.name = get_gfile_name(self.gfile)
-        self.modification_time = get_gfile_modification_time(self.gfile)
-        self.content_type = get_gfile_content_type(self.gfile)
-        self.size = get_gfile_size(self.gfile)
+        self.type = file_info.get_file_type()
+        self.name = file_info.get_name()
+        self.modification_time = get_file_info_modification_time(file_info)
+        self.mime_type = file_info.get_content_type()
+        self.content_type = get_file_info_content_type(file_info)
+        self.size = file_info.get_size()
         self.size_name = format_file_size(self.size)
         self.file_path = gfile.get_path()
-        self.pixbuf = get_file_icon_pixbuf(self.file_path, ICON_SIZE)
+        self.pixbuf = get_file_info_icon_pixbuf(file_info, ICON_SIZE)
         self.column_index = column_index
         self.name_width = get_name_width(self.column_index, self.name)
         self.modification_time_width = get_modification_time_width(self.modification_time)
@@ -522,7 +932,7 @@ class FileItem(TreeItem):
             self.redraw_request_callback(self)
             
     def double_click(self):
-        app_info = gio.app_info_get_default_for_type(self.gfile.query_info("standard::content-type").get_content_type(), False)
+        app_info = gio.app_info_get_default_for_type(self.mime_type, False)
         if app_info:
             app_info.launch([self.gfile], None)
         else:
@@ -643,11 +1053,22 @@ def get_dir_items(dir_path, column_index=0):
     '''
     Get children items with given directory path.
     '''
-    items = []
-    for gfile in get_dir_child_files(dir_path, sort_file_by_name):
-        if is_directory(gfile):
-            items.append(DirItem(gfile, column_index))
-        else:
-            items.append(FileItem(gfile, column_index))
-            
-    return items
+    dir_gfile = gio.File(dir_path)
+    return map(lambda file_info: create_item(dir_gfile.get_child(file_info.get_name()), column_index, file_info), 
+               get_dir_child_infos(dir_path, sort_file_by_name, attributes=FILE_INFO_ATTRIBUTES))
+
+def create_item(gfile, column_index=0, file_info=None):
+    '''
+    Create DirItem or FileItem with given gfile.
+    
+    @param gfile: gio.File.
+    @param column_index: Column index.
+    @param file_info: gio.FileInfo that query with FILE_INFO_ATTRIBUTES, query it if file_info is None.
+    '''
+    if file_info == None:
+        file_info = gfile.query_info(FILE_INFO_ATTRIBUTES)
+        
+    if file_info.get_file_type() == gio.FILE_TYPE_DIRECTORY:
+        return DirItem(gfile, column_index, file_info)
+    else:
+        return FileItem(gfile, column_index, file_info)
@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+# 
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import OrderedDict
+import gobject
+import sys
+import time
+import traceback
+
+class FrameClock(object):
+    '''
+    Frame clock to drive all animations with one timer.
+    
+    Frame clock tick once per frame and call all active animation callbacks in same tick,
+    animation callback should compute state with frame time instead of count frames, 
+    so animation won't drift when frame clock skip frames that already behind.
+    
+    Redraw request in tick is coalesced, widget only redraw once per frame.
+    
+    @undocumented: tick
+    @undocumented: schedule
+    '''
+	
+    def __init__(self, framerate=60):
+        '''
+        Initialize FrameClock class.
+        
+        @param framerate: Frames per second, default is 60.
+        '''
+        self.frame_interval = 1.0 / framerate
+        self.callback_dict = OrderedDict()
+        self.callback_id = 0
+        self.timeout_id = None
+        self.next_frame_time = None
+        self.in_tick = False
+        self.draw_widgets = set()
+        
+        # Instrumentation.
+        self.tick_count = 0
+        self.dropped_frame_count = 0
+        self.tick_time = 0
+        self.max_tick_time = 0
+        
+    def add(self, callback):
+        '''
+        Add animation callback, callback will call in every frame.
+        
+        @param callback: Callback receive frame time (in seconds), return False to stop callback.
+        @return: Return callback id, use it to remove callback.
+        '''
+        self.callback_id += 1
+        self.callback_dict[self.callback_id] = callback
+        
+        if self.timeout_id == None and not self.in_tick:
+            self.next_frame_time = time.time() + self.frame_interval
+            self.schedule()
+        
+        return self.callback_id
+    
+    def remove(self, callback_id):
+        '''
+        Remove animation callback.
+        
+        @param callback_id: Callback id return by add function, do nothing if callback id is None or not exist.
+        '''
+        if callback_id != None and self.callback_dict.has_key(callback_id):
+            del self.callback_dict[callback_id]
+            
+    def is_running(self, callback_id):
+        '''
+        Whether animation callback is running.
+        
+        @param callback_id: Callback id return by add function.
+        @return: Return True if callback still in frame clock.
+        '''
+        return callback_id != None and self.callback_dict.has_key(callback_id)
+            
+    def queue_draw(self, widget):
+        '''
+        Request redraw widget, redraw is coalesced to end of current frame if frame clock is running.
+        
+        @param widget: gtk.Widget to redraw.
+        '''
+        if self.in_tick or self.timeout_id != None:
+            self.draw_widgets.add(widget)
+        else:
+            widget.queue_draw()
+            
+    def schedule(self):
+        '''
+        Internal function to schedule next tick.
+        '''
+        delay = max(0, int((self.next_frame_time - time.time()) * 1000))
+        self.timeout_id = gobject.timeout_add(delay, self.tick)
+        
+    def tick(self):
+        '''
+        Internal function to call animation callbacks of current frame.
+        '''
+        self.timeout_id = None
+        self.in_tick = True
+        frame_time = time.time()
+        
+        # Count frames that missed.
+        late_frames = int((frame_time - self.next_frame_time) / self.frame_interval)
+        if late_frames > 0:
+            self.dropped_frame_count += late_frames
+        
+        for (callback_id, callback) in self.callback_dict.items():
+            # Callback maybe removed by other callback in same tick.
+            if self.callback_dict.has_key(callback_id):
+                try:
+                    keep_running = callback(frame_time)
+                except Exception, e:
+                    print "FrameClock.tick: callback got error: %s" % (e)
+                    traceback.print_exc(file=sys.stdout)
+                    
+                    keep_running = False
+                    
+                if not keep_running:
+                    self.remove(callback_id)
+                    
+        # Redraw widgets once per frame.
+        draw_widgets = self.draw_widgets
+        self.draw_widgets = set()
+        for widget in draw_widgets:
+            widget.queue_draw()
+            
+        self.in_tick = False
+        
+        # Record tick cost.
+        tick_time = time.time() - frame_time
+        self.tick_count += 1
+        self.tick_time += tick_time
+        self.max_tick_time = max(self.max_tick_time, tick_time)
+                    
+        # Schedule next frame, skip frames if tick already behind.
+        if len(self.callback_dict) > 0:
+            self.next_frame_time += self.frame_interval
+            current_time = time.time()
+            if self.next_frame_time < current_time:
+                self.next_frame_time = current_time + self.frame_interval
+            self.schedule()
+            
+        return False
+    
+    def get_stats(self):
+        '''
+        Get statistics of frame clock.
+        
+        @return: Return dict with keys: animation_number, tick_count, dropped_frames, average_tick_time, max_tick_time. Time is in seconds.
+        '''
+        if self.tick_count > 0:
+            average_tick_time = self.tick_time / self.tick_count
+        else:
+            average_tick_time = 0
+            
+        return {"animation_number" : len(self.callback_dict),
+                "tick_count" : self.tick_count,
+                "dropped_frames" : self.dropped_frame_count,
+                "average_tick_time" : average_tick_time,
+                "max_tick_time" : self.max_tick_time,
+                }
+    
+    def reset_stats(self):
+        '''
+        Reset statistics of frame clock.
+        '''
+        self.tick_count = 0
+        self.dropped_frame_count = 0
+        self.tick_time = 0
+        self.max_tick_time = 0
+        
+frame_clock = FrameClock()
@@ -25,10 +25,22 @@ import gtk
 import os
 import collections
 import sys
+import threading as td
 import traceback
 import time
 
+# Icon pixbuf is shared by files with same icon, key is (key type, icon name or content type, icon size).
 file_icon_pixbuf_dict = {}
+file_icon_pixbuf_lock = td.Lock()
+file_icon_theme_id = None
+file_icon_cache_id = 0
+
+# Child number of directory, key is directory path, value is (modification time, child number).
+dir_child_num_dict = {}
+dir_child_num_lock = td.Lock()
+
+# Attributes that file item need, query them together with one call.
+FILE_INFO_ATTRIBUTES = "standard::type,standard::name,standard::content-type,standard::size,standard::icon,time::modified"
 
 def get_file_type_dict():
     return ([(gio.FILE_TYPE_DIRECTORY, []),
@@ -47,24 +59,102 @@ def get_file_icon_pixbuf(filepath, icon_size):
     @param filepath: File path.
     @return: Return icon pixbuf with given filepath.
     '''
-    gfile = gio.File(filepath)
-    mime_type = gfile.query_info("standard::content-type").get_content_type()
-    if file_icon_pixbuf_dict.has_key(mime_type):
-        return file_icon_pixbuf_dict[mime_type] 
-    else:
+    return get_file_info_icon_pixbuf(
+        gio.File(filepath).query_info("standard::content-type,standard::icon"), 
+        icon_size)
+
+def get_file_info_icon_pixbuf(file_info, icon_size):
+    '''
+    Get icon pixbuf with given FileInfo.
+    
+    @param file_info: gio.FileInfo that contain attribute standard::content-type and standard::icon.
+    @param icon_size: Icon size.
+    @return: Return icon pixbuf with given FileInfo.
+    '''
+    global file_icon_theme_id
+    
+    gicon = file_info.get_icon()
+    icon_key = get_file_info_icon_key(file_info, icon_size)
+    
+    # Just hold lock when access cache, icon theme maybe emit "changed" signal in lookup, 
+    # and signal handler need lock to clean cache.
+    with file_icon_pixbuf_lock:
+        if file_icon_pixbuf_dict.has_key(icon_key):
+            return file_icon_pixbuf_dict[icon_key]
+        
+        cache_id = file_icon_cache_id
+        
         icon_theme = gtk.icon_theme_get_default()
-        icon_info = icon_theme.lookup_by_gicon(
-            gfile.query_info("standard::icon").get_icon(),
-            icon_size, 
-            gtk.ICON_LOOKUP_USE_BUILTIN)
-        if icon_info:
-            return icon_info.load_icon()
-        # Return unknown icon when icon_info is None.
-        else:
-            return icon_theme.load_icon("unknown", icon_size, gtk.ICON_LOOKUP_USE_BUILTIN)
+        
+        # Clean cache when icon theme changed.
+        if file_icon_theme_id == None:
+            file_icon_theme_id = icon_theme.connect("changed", lambda theme: clear_file_icon_pixbuf_cache())
+    
+    icon_info = None
+    if gicon != None:
+        icon_info = icon_theme.lookup_by_gicon(gicon, icon_size, gtk.ICON_LOOKUP_USE_BUILTIN)
+    if icon_info:
+        pixbuf = icon_info.load_icon()
+    # Return unknown icon when icon_info is None.
+    else:
+        pixbuf = icon_theme.load_icon("unknown", icon_size, gtk.ICON_LOOKUP_USE_BUILTIN)
+        
+    with file_icon_pixbuf_lock:
+        # Don't cache pixbuf of old icon theme if cache cleaned when loading.
+        if cache_id == file_icon_cache_id:
+            file_icon_pixbuf_dict[icon_key] = pixbuf
+            
+    return pixbuf
+    
+def get_file_info_icon_key(file_info, icon_size):
+    '''
+    Internal function to get cache key of file icon.
+    
+    Key with icon first, special directory (such as Desktop) has different icon with same content type.
+    '''
+    gicon = file_info.get_icon()
+    icon_name = None
+    if gicon != None:
+        icon_name = gicon.to_string()
+        
+    if icon_name == None:
+        return ("content-type", file_info.get_content_type(), icon_size)
+    else:
+        return ("icon", icon_name, icon_size)
+    
+def get_file_info_icon_pixbufs(file_infos, icon_size):
+    '''
+    Get icon pixbufs with given FileInfos, same icon is just loaded once.
+    
+    It's useful to prefetch icons for a batch of directory children.
+    
+    @param file_infos: List of gio.FileInfo that contain attribute standard::content-type and standard::icon.
+    @param icon_size: Icon size.
+    @return: Return list of icon pixbuf, order is same as file_infos.
+    '''
+    icon_pixbuf_dict = {}
+    pixbufs = []
+    for file_info in file_infos:
+        icon_key = get_file_info_icon_key(file_info, icon_size)
+        if not icon_pixbuf_dict.has_key(icon_key):
+            icon_pixbuf_dict[icon_key] = get_file_info_icon_pixbuf(file_info, icon_size)
+            
+        pixbufs.append(icon_pixbuf_dict[icon_key])
+        
+    return pixbufs
+
+def clear_file_icon_pixbuf_cache():
+    '''
+    Clear cache of file icon pixbuf.
+    '''
+    global file_icon_cache_id
+    
+    with file_icon_pixbuf_lock:
+        file_icon_pixbuf_dict.clear()
+        file_icon_cache_id += 1
     
 def get_dir_child_num(gfile):
-    gfile_enumerator = gfile.enumerate_children("standard::*")
+    gfile_enumerator = gfile.enumerate_children("standard::name")
     
     # Return empty list if enumerator is None.
     if gfile_enumerator == None:
@@ -77,13 +167,83 @@ def get_dir_child_num(gfile):
             else:
                 child_num += 1
                 
+        gfile_enumerator.close()
+                
         return child_num            
+    
+def lookup_dir_child_num(dir_path, modification_time):
+    '''
+    Lookup cached child number of directory.
+    
+    @param dir_path: Directory path.
+    @param modification_time: Modification time of directory, cache is invalid if modification time changed.
+    @return: Return child number, or return None if child number not in cache.
+    '''
+    with dir_child_num_lock:
+        if dir_child_num_dict.has_key(dir_path):
+            (cache_modification_time, child_num) = dir_child_num_dict[dir_path]
+            if cache_modification_time == modification_time:
+                return child_num
+            
+    return None
+    
+def get_cached_dir_child_num(gfile, modification_time):
+    '''
+    Get child number of directory, result is cached with directory path and modification time.
+    
+    This function is safe to call in other threads.
+    
+    @param gfile: gio.File of directory.
+    @param modification_time: Modification time of directory.
+    @return: Return child number of directory.
+    '''
+    dir_path = gfile.get_path()
+    child_num = lookup_dir_child_num(dir_path, modification_time)
+    if child_num == None:
+        child_num = get_dir_child_num(gfile)
+        
+        with dir_child_num_lock:
+            dir_child_num_dict[dir_path] = (modification_time, child_num)
+            
+    return child_num
+        
+def get_dir_child_info_batches(dir_path, batch_size=100, attributes="standard::*"):
+    '''
+    Get children FileInfos with given directory path in batches.
+    
+    Enumerator return FileInfos with next_files, 
+    so caller can handle first batch before whole directory is enumerated.
+    
+    @param dir_path: Directory path.
+    @param batch_size: Number of FileInfos in every batch, default is 100.
+    @param attributes: Attributes that query for children, default is "standard::*".
+    @return: Return a generator of gio.FileInfo list, nothing generated if dir_path is not directory.
+    '''
+    gfile = gio.File(dir_path)
+    
+    try:
+        gfile_enumerator = gfile.enumerate_children(attributes)
+    # Nothing to generate if file not exists or not directory.
+    except gio.Error:
+        return
+    
+    if gfile_enumerator != None:
+        try:
+            while True:
+                file_infos = gfile_enumerator.next_files(batch_size)
+                if len(file_infos) == 0:
+                    break
+                else:
+                    yield file_infos
+        finally:
+            gfile_enumerator.close()
         
-def get_dir_child_infos(dir_path, sort=None, reverse=False):
+def get_dir_child_infos(dir_path, sort=None, reverse=False, attributes="standard::*"):
     '''
     Get children FileInfos with given directory path.
     
     @param dir_path: Directory path.
+    @param attributes: Attributes that query for children, default is "standard::*".
     @return: Return a list of gio.Fileinfo.
     '''
     # Get gio file.
@@ -96,7 +256,7 @@ def get_dir_child_infos(dir_path, sort=None, reverse=False):
         gfile_info = gfile.query_info("standard::type")
         if gfile_info.get_file_type() == gio.FILE_TYPE_DIRECTORY:
             try:
-                gfile_enumerator = gfile.enumerate_children("standard::*")
+                gfile_enumerator = gfile.enumerate_children(attributes)
                 
                 # Return empty list if enumerator is None.
                 if gfile_enumerator == None:
@@ -176,10 +336,22 @@ def get_gfile_content_type(gfile):
     '''
     Get type of gfile.
     '''
-    return gio.content_type_get_description(gfile.query_info("standard::content-type").get_content_type())
+    return get_file_info_content_type(gfile.query_info("standard::content-type"))
 
 def get_gfile_modification_time(gfile):
-    return time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(gfile.query_info("time::modified").get_modification_time()))
+    return get_file_info_modification_time(gfile.query_info("time::modified"))
+
+def get_file_info_modification_time(file_info):
+    '''
+    Get modification time string of FileInfo.
+    '''
+    return time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(file_info.get_modification_time()))
+
+def get_file_info_content_type(file_info):
+    '''
+    Get content type description of FileInfo.
+    '''
+    return gio.content_type_get_description(file_info.get_content_type())
 
 def get_gfile_size(gfile):
     if gfile.query_info("standard::type").get_file_type() == gio.FILE_TYPE_DIRECTORY:
@@ -20,15 +20,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from cache_surface import CacheSurface
 from draw import draw_pixbuf, draw_vlinear
+from fade_mask import get_fade_surface, paint_fade_surface
 from keymap import get_keyevent_name
 from skin_config import skin_config
 from theme import ui_theme
-import cairo
 import gc
 import gobject
 import gtk
-import math
 from utils import (get_match_parent, cairo_state, get_event_coords, 
                    is_in_rect, is_left_button, is_double_click, 
                    is_single_click, get_window_shadow_size)
@@ -51,6 +51,7 @@ class IconView(gtk.DrawingArea):
     @undocumented: redraw_item
     @undocumented: get_offset_coordinate
     @undocumented: get_render_item_indexes
+    @undocumented: render_item
     '''
 	
     __gsignals__ = {
@@ -87,6 +88,7 @@ class IconView(gtk.DrawingArea):
         self.highlight_item = None
         self.double_click_item = None
         self.single_click_item = None
+        self.render_cache = None
         
         # Signal.
         self.connect("realize", self.realize_icon_view)
@@ -125,6 +127,35 @@ class IconView(gtk.DrawingArea):
             "Page_Down" : self.scroll_page_down,
             }
         
+    def enable_render_cache(self, max_size=16 * 1024 * 1024):
+        '''
+        Enable render cache.
+        
+        After enable render cache, render result of item is cached in surface, 
+        cache surface of item is remove when item emit `redraw-request` signal.
+        
+        @param max_size: Max memory size of render cache, in byte, default is 16MB.
+        '''
+        self.render_cache = CacheSurface(max_size)
+        
+    def disable_render_cache(self):
+        '''
+        Disable render cache.
+        '''
+        self.render_cache = None
+        
+    def render_item(self, cr, item, rect):
+        '''
+        Internal function to render item, use render cache if it enable.
+        '''
+        if self.render_cache == None:
+            item.render(cr, rect)
+        else:
+            self.render_cache.render(
+                cr, item, 
+                (rect.width, rect.height, ui_theme.get_ticker()),
+                rect, item.render)
+        
     def realize_icon_view(self, widget):
         '''
         Realize icon view.
@@ -387,6 +418,9 @@ class IconView(gtk.DrawingArea):
                 self.items.remove(item)
                 match_item = True
                 
+            if self.render_cache != None:
+                self.render_cache.invalidate(item)
+                
         if match_item:        
             self.queue_draw()
             
@@ -395,6 +429,9 @@ class IconView(gtk.DrawingArea):
         Clear all items.
         '''
         self.items = []            
+        
+        if self.render_cache != None:
+            self.render_cache.clear()
         self.queue_draw()
             
     def draw_mask(self, cr, x, y, w, h):
@@ -451,8 +488,7 @@ class IconView(gtk.DrawingArea):
             
             # Init top surface.
             if vadjust.get_value() != vadjust.get_lower():
-                top_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-                top_surface_cr = gtk.gdk.CairoContext(cairo.Context(top_surface))
+                (top_surface, top_surface_cr) = get_fade_surface("top", rect.width, self.mask_bound_height)
                 
                 clip_y = vadjust.get_value() + self.mask_bound_height
             else:
@@ -462,8 +498,7 @@ class IconView(gtk.DrawingArea):
                 
             # Init bottom surface.
             if vadjust.get_value() + vadjust.get_page_size() != vadjust.get_upper():
-                bottom_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-                bottom_surface_cr = gtk.gdk.CairoContext(cairo.Context(bottom_surface))
+                (bottom_surface, bottom_surface_cr) = get_fade_surface("bottom", rect.width, self.mask_bound_height)
                 
                 clip_height = vadjust.get_page_size() - self.mask_bound_height - (clip_y - vadjust.get_value())
             else:
@@ -488,8 +523,9 @@ class IconView(gtk.DrawingArea):
                             top_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                             top_surface_cr.clip()
                             
-                            item.render(
+                            self.render_item(
                                 top_surface_cr,
+                                item,
                                 gtk.gdk.Rectangle(render_x, 
                                                   render_y - int(vadjust.get_value()), 
                                                   render_width, 
@@ -501,8 +537,9 @@ class IconView(gtk.DrawingArea):
                             bottom_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                             bottom_surface_cr.clip()
                             
-                            item.render(
+                            self.render_item(
                                 bottom_surface_cr,
+                                item,
                                 gtk.gdk.Rectangle(render_x, 
                                                   render_y - int(vadjust.get_value()) - int(vadjust.get_page_size() - self.mask_bound_height), 
                                                   render_width, 
@@ -519,31 +556,15 @@ class IconView(gtk.DrawingArea):
                         cr.rectangle(render_x, render_y, item_width, item_height)
                         cr.clip()
                         
-                        item.render(cr, gtk.gdk.Rectangle(render_x, render_y, item_width, item_height))
+                        self.render_item(cr, item, gtk.gdk.Rectangle(render_x, render_y, item_width, item_height))
                         
             # Draw alpha mask on top surface.
             if top_surface:
-                i = 0
-                while (i <= self.mask_bound_height):
-                    with cairo_state(cr):
-                        cr.rectangle(rect.x, vadjust.get_value() + i, rect.width, 1)
-                        cr.clip()
-                        cr.set_source_surface(top_surface, 0, vadjust.get_value())
-                        cr.paint_with_alpha(math.sin(i * math.pi / 2 / self.mask_bound_height))
-                        
-                    i += 1    
+                paint_fade_surface(cr, top_surface, 0, vadjust.get_value(), True)
                 
             # Draw alpha mask on bottom surface.
             if bottom_surface:
-                i = 0
-                while (i <= self.mask_bound_height):
-                    with cairo_state(cr):
-                        cr.rectangle(rect.x, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height + i, rect.width, 1)
-                        cr.clip()
-                        cr.set_source_surface(bottom_surface, 0, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height)
-                        cr.paint_with_alpha(1.0 - (math.sin(i * math.pi / 2 / self.mask_bound_height)))
-                        
-                    i += 1    
+                paint_fade_surface(cr, bottom_surface, 0, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height, False)
                 
     def get_render_item_info(self):
         '''
@@ -571,6 +592,21 @@ class IconView(gtk.DrawingArea):
         
         return (item_width, item_height, columns, start_index, end_index)
                         
+    def get_visible_items(self):
+        '''
+        Get items in viewport.
+        
+        It's useful to give visibility hint to L{ MissionThreadPool <thread_pool.MissionThreadPool>}, 
+        see L{ MissionThreadPool.follow_visible_items <thread_pool.MissionThreadPool.follow_visible_items>}.
+        
+        @return: Return list of items in viewport.
+        '''
+        if len(self.items) == 0 or get_match_parent(self, ["ScrolledWindow"]) == None:
+            return []
+        else:
+            (item_width, item_height, columns, start_index, end_index) = self.get_render_item_info()
+            return self.items[start_index:end_index]
+                        
     def clear_focus_item(self):
         '''
         Clear item's focus status.
@@ -771,6 +807,9 @@ class IconView(gtk.DrawingArea):
         '''
         Internal function to redraw item.
         '''
+        if self.render_cache != None:
+            self.render_cache.invalidate(list_item)
+            
         self.redraw_request_list.append(list_item)
         
     def get_offset_coordinate(self, widget):
@@ -20,14 +20,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
                  
-from constant import DEFAULT_FONT_SIZE, ALIGN_START, DEFAULT_FONT
+from constant import DEFAULT_FONT_SIZE, ALIGN_START
 from draw import draw_text, draw_hlinear
 from keymap import get_keyevent_name
 from theme import ui_theme
-from utils import propagate_expose, get_content_size, is_double_click, is_left_button
+from utils import (propagate_expose, get_content_size, is_double_click, is_left_button,
+                   get_text_layout)
 import gtk
 import pango 
-import pangocairo
 
 class Label(gtk.EventBox):
     '''
@@ -219,11 +219,7 @@ class Label(gtk.EventBox):
         @param widget: Label widget.
         @param event: gtk.gdk.Event.
         '''
-        cr = widget.window.cairo_create()
-        context = pangocairo.CairoContext(cr)
-        layout = context.create_layout()
-        layout.set_font_description(pango.FontDescription("%s %s" % (DEFAULT_FONT, self.text_size)))
-        layout.set_text(self.text)
+        layout = get_text_layout(self.text, self.text_size, use_markup=False)
         (text_width, text_height) = layout.get_pixel_size()
         if int(event.x) > text_width:
             return len(self.text)
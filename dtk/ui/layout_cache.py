@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+# 
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import OrderedDict
+import threading as td
+
+class LayoutCache(object):
+    '''
+    LRU cache for text layout and text size.
+    
+    Create pango layout and measure text is slow, 
+    cache result with key (text, font, size, wrap width, ellipsize width) to avoid measure same string again.
+    
+    Cache is protected by lock, so it can use in loading thread, 
+    but value itself (such as pango layout) should only use in thread that create it.
+    '''
+	
+    def __init__(self, max_number):
+        '''
+        Initialize LayoutCache class.
+        
+        @param max_number: Max number of cache values, least recently used value is remove when cache full.
+        '''
+        self.max_number = max_number
+        self.cache_dict = OrderedDict()
+        self.lock = td.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+        
+    def get(self, key, create_callback):
+        '''
+        Get value with given key, create value with create_callback if not found in cache.
+        
+        @param key: Cache key, must be hashable.
+        @param create_callback: Callback to create value, it haven't argument.
+        @return: Return cache value.
+        '''
+        with self.lock:
+            if key in self.cache_dict:
+                value = self.cache_dict.pop(key)
+                self.cache_dict[key] = value
+                self.hit_count += 1
+                
+                return value
+            else:
+                self.miss_count += 1
+                
+        # Create value out of lock, it's slow.
+        value = create_callback()
+        
+        with self.lock:
+            self.cache_dict[key] = value
+            while len(self.cache_dict) > self.max_number:
+                self.cache_dict.popitem(last=False)
+                
+        return value        
+    
+    def clear(self):
+        '''
+        Clear cache.
+        '''
+        with self.lock:
+            self.cache_dict.clear()
+            
+    def get_stats(self):
+        '''
+        Get cache statistics.
+        
+        @return: Return (value_number, hit_count, miss_count).
+        '''
+        return (len(self.cache_dict), self.hit_count, self.miss_count)
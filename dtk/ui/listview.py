@@ -21,14 +21,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from cache_pixbuf import CachePixbuf
+from cache_surface import CacheSurface
+from collections import OrderedDict
 from constant import DEFAULT_FONT_SIZE, ALIGN_END, ALIGN_START
 from contextlib import contextmanager 
 from draw import draw_pixbuf, draw_vlinear, draw_text
+from fade_mask import get_fade_surface, paint_fade_surface
 from keymap import get_keyevent_name, has_ctrl_mask, has_shift_mask
 from skin_config import skin_config
 from theme import ui_theme
-import math
-import cairo
 import copy
 import gobject
 import gtk
@@ -66,6 +67,7 @@ class ListView(gtk.DrawingArea):
     @undocumented: leave_list_view
     @undocumented: key_press_list_view
     @undocumented: key_release_list_view
+    @undocumented: render_cell
 
     '''
     
@@ -142,6 +144,8 @@ class ListView(gtk.DrawingArea):
         self.mask_bound_height = mask_bound_height
         self.auto_scroll_id = None
         self.auto_scroll_delay = 70 # milliseconds
+        self.data_source = None
+        self.render_cache = None
         
         # Signal.
         self.connect("realize", self.realize_list_view)
@@ -189,28 +193,50 @@ class ListView(gtk.DrawingArea):
         '''
         self.expand_column = column
         
+    def enable_render_cache(self, max_size=16 * 1024 * 1024):
+        '''
+        Enable render cache.
+        
+        After enable render cache, render result of cell is cached in surface, 
+        listview paint cache surface when scroll instead of call render function of item again.
+        
+        Cache surface of item is remove when item emit `redraw-request` signal, 
+        so item must emit `redraw-request` signal after its content changed.
+        
+        @param max_size: Max memory size of render cache, in byte, default is 16MB.
+        '''
+        self.render_cache = CacheSurface(max_size)
+        
+    def disable_render_cache(self):
+        '''
+        Disable render cache.
+        '''
+        self.render_cache = None
+        
+    def render_cell(self, cr, item, column, render, rect, in_select, in_highlight):
+        '''
+        Internal function to render cell, use render cache if it enable.
+        '''
+        if self.render_cache == None:
+            render(cr, rect, in_select, in_highlight)
+        else:
+            self.render_cache.render(
+                cr, item, 
+                (column, rect.width, rect.height, in_select, in_highlight, ui_theme.get_ticker()),
+                rect,
+                lambda surface_cr, surface_rect: render(surface_cr, surface_rect, in_select, in_highlight))
+        
     def update_redraw_request_list(self):
         '''
         Internal fucntion to update redraw request list.
         '''
         # Redraw when request list is not empty.
         if len(self.redraw_request_list) > 0:
-            # Get offset.
-            (offset_x, offset_y, viewport) = self.get_offset_coordinate(self)
-            
-            # Get viewport index.
-            start_y = offset_y - self.title_offset_y
-            end_y = offset_y + viewport.allocation.height - self.title_offset_y
-            start_index = max(start_y / self.item_height, 0)
-            if (end_y - end_y / self.item_height * self.item_height) == 0:
-                end_index = min(end_y / self.item_height + 1, len(self.items))
-            else:
-                end_index = min(end_y / self.item_height + 2, len(self.items))        
+            (start_index, end_index) = self.get_render_item_info()
             
             # Redraw whole viewport area once found any request item in viewport.
-            viewport_range = range(start_index, end_index)    
             for item in self.redraw_request_list:
-                if item.get_index() in viewport_range:
+                if start_index <= item.get_index() < end_index:
                     self.queue_draw()
                     break
         
@@ -219,6 +245,40 @@ class ListView(gtk.DrawingArea):
 
         return True
         
+    def get_render_item_info(self):
+        '''
+        Get index range of items in viewport.
+        
+        @return: Return (start_index, end_index), items in viewport is self.items[start_index:end_index].
+        '''
+        # Get offset.
+        (offset_x, offset_y, viewport) = self.get_offset_coordinate(self)
+        if viewport == None:
+            return (0, 0)
+        
+        # Get viewport index.
+        start_y = offset_y - self.title_offset_y
+        end_y = offset_y + viewport.allocation.height - self.title_offset_y
+        start_index = max(start_y / self.item_height, 0)
+        if (end_y - end_y / self.item_height * self.item_height) == 0:
+            end_index = min(end_y / self.item_height + 1, len(self.items))
+        else:
+            end_index = min(end_y / self.item_height + 2, len(self.items))        
+            
+        return (start_index, end_index)
+    
+    def get_visible_items(self):
+        '''
+        Get items in viewport.
+        
+        It's useful to give visibility hint to L{ MissionThreadPool <thread_pool.MissionThreadPool>}, 
+        see L{ MissionThreadPool.follow_visible_items <thread_pool.MissionThreadPool.follow_visible_items>}.
+        
+        @return: Return list of items in viewport.
+        '''
+        (start_index, end_index) = self.get_render_item_info()
+        return self.items[start_index:end_index]
+        
     def add_titles(self, titles, title_height=24):
         '''
         Add titles.
@@ -268,6 +328,10 @@ class ListView(gtk.DrawingArea):
         @param insert_pos: The position to insert, default is None will insert new item at end of list.
         @param sort_list: Whether sort list after insert, default is False.
         '''
+        if self.data_source != None:
+            print "add_items: use update_data_source to add items in virtual mode."
+            return
+        
         # Add new items.
         with self.keep_select_status():    
             if insert_pos == None:
@@ -275,18 +339,39 @@ class ListView(gtk.DrawingArea):
             else:
                 self.items = self.items[0:insert_pos] + items + self.items[insert_pos::]
 
+        # Binding redraw request signal.
+        for item in items:
+            item.connect("redraw_request", self.redraw_item)
+            
         # Re-calcuate.
+        self.update_cell_sizes(map(lambda item: item.get_column_sizes(), items))
+                    
+        # Sort list if sort_list enable.
+        if sort_list and self.sorts != [] and self.title_sort_column != None:
+            if self.title_sorts == None:
+                reverse_order = False
+            else:
+                reverse_order = self.title_sorts[0]
+                
+            with self.keep_select_status():    
+                self.sort_by_column(self.title_sort_column, reverse_order)
+                
+        # Update vertical adjustment.
+        self.update_vadjustment()        
+        
+    def update_cell_sizes(self, column_sizes_list):
+        '''
+        Internal function to update cell sizes with given column sizes.
+        
+        @param column_sizes_list: A list of column sizes, every element is return value of item's get_column_sizes.
+        '''
         (title_widths, title_heights) = self.get_title_sizes()
         sort_pixbuf = ui_theme.get_pixbuf("listview/sort_descending.png").get_pixbuf()
         sort_icon_width = sort_pixbuf.get_width() + self.SORT_PADDING_X * 2
         sort_icon_height = sort_pixbuf.get_height()
         
         cell_min_sizes = []
-        for item in items:
-            # Binding redraw request signal.
-            item.connect("redraw_request", self.redraw_item)
-            
-            sizes = item.get_column_sizes()
+        for sizes in column_sizes_list:
             if cell_min_sizes == []:
                 cell_min_sizes = sizes
             else:
@@ -307,25 +392,78 @@ class ListView(gtk.DrawingArea):
         self.cell_widths = mix_list_max(self.cell_widths, copy.deepcopy(cell_min_widths))
             
         self.item_height = max(self.item_height, max(copy.deepcopy(cell_min_heights)))    
-                    
-        # Sort list if sort_list enable.
-        if sort_list and self.sorts != [] and self.title_sort_column != None:
-            if self.title_sorts == None:
-                reverse_order = False
-            else:
-                reverse_order = self.title_sorts[0]
-                
-            with self.keep_select_status():    
-                self.items = sorted(self.items, 
-                                    key=self.sorts[self.title_sort_column][0],
-                                    cmp=self.sorts[self.title_sort_column][1],
-                                    reverse=reverse_order)
-                
+        
+    def sort_by_column(self, column, reverse):
+        '''
+        Internal function to sort items with sort function of given column.
+        
+        @param column: Column index.
+        @param reverse: Whether sort reverse.
+        '''
+        (sort_key, sort_cmp) = self.sorts[column]
+        if self.data_source != None:
+            self.data_source.sort(sort_key, sort_cmp, reverse, column)
+        else:
+            self.items = sorted(self.items, 
+                                key=sort_key,
+                                cmp=sort_cmp,
+                                reverse=reverse)
+            
+    def set_data_source(self, data_source):
+        '''
+        Set data source of listview.
+        
+        After set data source, listview switch to virtual mode, 
+        only items in visible area are fetched from data source, 
+        and select status is keep by row id of data source.
+        
+        Listview won't add, reorder or drag items in virtual mode, 
+        change data source and call L{ I{update_data_source} <update_data_source>} instead.
+        
+        @param data_source: L{ I{ListDataSource} <ListDataSource>} instance, set None to switch back to normal mode.
+        '''
+        # Init select status.
+        self.start_select_row = None
+        self.select_rows = []
+        self.hover_row = None
+        self.highlight_item = None
+        
+        if data_source == None:
+            self.data_source = None
+            self.items = []
+        else:
+            self.data_source = data_source
+            self.data_source.bind_redraw_callback(self.redraw_item)
+            self.items = self.data_source
+            
+            # Calcuate cell size with sampled or declared column sizes.
+            column_sizes_list = self.data_source.get_column_sizes()
+            if column_sizes_list != []:
+                self.update_cell_sizes(column_sizes_list)
+            
         # Update vertical adjustment.
-        self.update_vadjustment()        
+        self.update_vadjustment()
+        
+        # Redraw.
+        self.queue_draw()
+        
+    def update_data_source(self):
+        '''
+        Update listview after data of data source changed.
+        '''
+        if self.data_source != None:
+            with self.keep_select_status():
+                self.data_source.reset()
+                
+                # Keep sort order.
+                if self.title_sort_column != None and len(self.sorts) >= self.title_sort_column + 1:
+                    self.sort_by_column(self.title_sort_column, self.title_sorts[self.title_sort_column])
+                    
+            # Update vertical adjustment.
+            self.update_vadjustment()
             
-        # Update item index.
-        self.update_item_index()
+            # Redraw.
+            self.queue_draw()
         
     def sort_items(self, compare_method, sort_reverse=False):
         '''
@@ -336,13 +474,13 @@ class ListView(gtk.DrawingArea):
         '''
         # Sort items.
         with self.keep_select_status():
-            self.items = sorted(self.items,
-                                cmp=compare_method,
-                                reverse=sort_reverse)
+            if self.data_source != None:
+                self.data_source.sort(None, compare_method, sort_reverse)
+            else:
+                self.items = sorted(self.items,
+                                    cmp=compare_method,
+                                    reverse=sort_reverse)
             
-        # Update item index.
-        self.update_item_index()    
-        
         # Redraw.
         self.queue_draw()
         
@@ -352,14 +490,20 @@ class ListView(gtk.DrawingArea):
         
         @param list_item: List item need to redraw.
         '''
+        if self.render_cache != None:
+            self.render_cache.invalidate(list_item)
+            
         self.redraw_request_list.append(list_item)
         
     def update_item_index(self):
         '''
         Update index of items.
         '''
-        for (index, item) in enumerate(self.items):
-            item.set_index(index)
+        if self.data_source != None:
+            self.data_source.update_item_index()
+        else:
+            for (index, item) in enumerate(self.items):
+                item.set_index(index)
             
     def reorder_item(self, item, index):
         '''
@@ -370,6 +514,10 @@ class ListView(gtk.DrawingArea):
 
         If index < 0, move to begin position of list view, if index > max_index, move to end position of list view. 
         '''
+        if self.data_source != None:
+            print "reorder_item: can't reorder item in virtual mode."
+            return
+        
         if index < 0:
             index = 0
         else:
@@ -379,8 +527,6 @@ class ListView(gtk.DrawingArea):
             self.items.remove(item)
             self.items.insert(index, item)
             
-        self.update_item_index()
-            
         self.queue_draw()    
             
     def set_title_height(self, title_height):
@@ -651,8 +797,7 @@ class ListView(gtk.DrawingArea):
             
             # Init top surface.
             if vadjust.get_value() != vadjust.get_lower():
-                top_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-                top_surface_cr = gtk.gdk.CairoContext(cairo.Context(top_surface))
+                (top_surface, top_surface_cr) = get_fade_surface("top", rect.width, self.mask_bound_height)
                 
                 clip_y = vadjust.get_value() + self.mask_bound_height
             else:
@@ -662,8 +807,7 @@ class ListView(gtk.DrawingArea):
                 
             # Init bottom surface.
             if vadjust.get_value() + vadjust.get_page_size() != vadjust.get_upper():
-                bottom_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-                bottom_surface_cr = gtk.gdk.CairoContext(cairo.Context(bottom_surface))
+                (bottom_surface, bottom_surface_cr) = get_fade_surface("bottom", rect.width, self.mask_bound_height)
                 
                 clip_height = vadjust.get_page_size() - self.mask_bound_height - (clip_y - vadjust.get_value())
             else:
@@ -715,6 +859,7 @@ class ListView(gtk.DrawingArea):
                     end_index = min(end_y / self.item_height + 2, len(self.items))        
                     
                 # Draw list item.
+                select_rows = set(self.select_rows)
                 for (row, item) in enumerate(self.items[start_index:end_index]):
                     renders = item.get_renders()
                     for (column, render) in enumerate(renders):
@@ -731,13 +876,16 @@ class ListView(gtk.DrawingArea):
                                 top_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                                 top_surface_cr.clip()
                                 
-                                render(
+                                self.render_cell(
                                     top_surface_cr,
+                                    item,
+                                    column,
+                                    render,
                                     gtk.gdk.Rectangle(render_x, 
                                                       render_y - int(vadjust.get_value()), 
                                                       render_width, 
                                                       render_height),
-                                    (start_index + row) in self.select_rows,
+                                    (start_index + row) in select_rows,
                                     item == self.highlight_item
                                     )
                         
@@ -747,13 +895,16 @@ class ListView(gtk.DrawingArea):
                                 bottom_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                                 bottom_surface_cr.clip()
                                 
-                                render(
+                                self.render_cell(
                                     bottom_surface_cr,
+                                    item,
+                                    column,
+                                    render,
                                     gtk.gdk.Rectangle(render_x, 
                                                       render_y - int(vadjust.get_value()) - int(vadjust.get_page_size() - self.mask_bound_height), 
                                                       render_width, 
                                                       render_height),
-                                    (start_index + row) in self.select_rows,
+                                    (start_index + row) in select_rows,
                                     item == self.highlight_item
                                     )
                                 
@@ -763,41 +914,18 @@ class ListView(gtk.DrawingArea):
                             cr.clip()
                             
                             # Render cell.
-                            render(cr, gtk.gdk.Rectangle(render_x, render_y, render_width, render_height),
-                                   (start_index + row) in self.select_rows,
-                                   item == self.highlight_item)
+                            self.render_cell(cr, item, column, render,
+                                             gtk.gdk.Rectangle(render_x, render_y, render_width, render_height),
+                                             (start_index + row) in select_rows,
+                                             item == self.highlight_item)
             
             # Draw alpha mask on top surface.
             if top_surface:
-                i = 0
-                while (i <= self.mask_bound_height):
-                    with cairo_state(cr):
-                        cr.rectangle(rect.x, vadjust.get_value() + self.title_offset_y + i, rect.width, 1)
-                        cr.clip()
-                        cr.set_source_surface(
-                            top_surface, 
-                            0, 
-                            vadjust.get_value() + self.title_offset_y
-                            )
-                        cr.paint_with_alpha(math.sin(i * math.pi / 2 / self.mask_bound_height))
-                        
-                    i += 1    
+                paint_fade_surface(cr, top_surface, 0, vadjust.get_value() + self.title_offset_y, True)
                 
             # Draw alpha mask on bottom surface.
             if bottom_surface:
-                i = 0
-                while (i <= self.mask_bound_height):
-                    with cairo_state(cr):
-                        cr.rectangle(rect.x, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height + i, rect.width, 1)
-                        cr.clip()
-                        cr.set_source_surface(
-                            bottom_surface, 
-                            0, 
-                            vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height
-                            )
-                        cr.paint_with_alpha(1.0 - (math.sin(i * math.pi / 2 / self.mask_bound_height)))
-                        
-                    i += 1    
+                paint_fade_surface(cr, bottom_surface, 0, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height, False)
                     
     def draw_items_row(self, cr, offset_x, viewport, render_offset_y=0):
         # Draw hover row.
@@ -813,8 +941,16 @@ class ListView(gtk.DrawingArea):
                 viewport.allocation.width, 
                 self.item_height)
         
-        # Draw select rows.
-        for select_row in self.select_rows:
+        # Draw select rows, only rows in clip area need draw.
+        (clip_x1, clip_y1, clip_x2, clip_y2) = cr.clip_extents()
+        start_row = max(int((clip_y1 + render_offset_y - self.title_offset_y) / self.item_height), 0)
+        end_row = int((clip_y2 + render_offset_y - self.title_offset_y) / self.item_height) + 1
+        if end_row - start_row < len(self.select_rows):
+            select_row_set = set(self.select_rows)
+            visible_select_rows = filter(lambda row: row in select_row_set, range(start_row, end_row))
+        else:
+            visible_select_rows = self.select_rows
+        for select_row in visible_select_rows:
             if select_row != highlight_row:
                 self.draw_item_select(
                     cr, 
@@ -1083,7 +1219,7 @@ class ListView(gtk.DrawingArea):
                         self.select_rows.append(click_row)
                     self.select_rows = sorted(self.select_rows)
                 else:
-                    if self.enable_drag_drop and click_row in self.select_rows:
+                    if self.enable_drag_drop and self.data_source == None and click_row in self.select_rows:
                         self.start_drag = True
                         
                         if self.start_select_row:
@@ -1178,13 +1314,7 @@ class ListView(gtk.DrawingArea):
                                 if len(self.sorts) >= column + 1:
                                     with self.keep_select_status():
                                         # Re-sort.
-                                        self.items = sorted(self.items, 
-                                                            key=self.sorts[column][0],
-                                                            cmp=self.sorts[column][1],
-                                                            reverse=self.title_sorts[column])
-                                    
-                                    # Update item index.
-                                    self.update_item_index()    
+                                        self.sort_by_column(column, self.title_sorts[column])
                                 break
                 elif len(self.items) > 0:
                     self.release_item(event)
@@ -1204,14 +1334,17 @@ class ListView(gtk.DrawingArea):
         '''
         Handy function that change listview and keep select status not change.
         '''
+        if self.data_source != None:
+            with self.keep_select_rows():
+                yield
+            return
+        
         # Save select items.
         start_select_item = None
         if self.start_select_row != None:
             start_select_item = self.items[self.start_select_row]
         
-        select_items = []
-        for row in self.select_rows:
-            select_items.append(self.items[row])
+        select_items = map(lambda row: self.items[row], self.select_rows)
             
         try:  
             yield  
@@ -1220,30 +1353,55 @@ class ListView(gtk.DrawingArea):
             traceback.print_exc(file=sys.stdout)
             
         else:  
-            # Restore select status.
-            if start_select_item != None or select_items != []:
-                # Init start select row.
-                if start_select_item != None:
-                    self.start_select_row = None
+            # Update item index first, then restore select status with index of item,
+            # don't need scan all items to match select item.
+            self.update_item_index()
+            
+            # Restore start select row.
+            if start_select_item != None:
+                self.start_select_row = self.get_item_row(start_select_item)
                 
-                # Init select rows.
-                if select_items != []:
-                    self.select_rows = []
+            # Restore select rows.
+            if select_items != []:
+                self.select_rows = sorted(filter(lambda row: row != None, map(self.get_item_row, select_items)))
                 
-                for (index, item) in enumerate(self.items):
-                    # Try restore select row.
-                    if item in select_items:
-                        self.select_rows.append(index)
-                        select_items.remove(item)
-                    
-                    # Try restore start select row.
-                    if item == start_select_item:
-                        self.start_select_row = index
-                        start_select_item = None
-                    
-                    # Stop loop when finish restore row status.
-                    if select_items == [] and start_select_item == None:
-                        break
+    def get_item_row(self, item):
+        '''
+        Get row of given item.
+        
+        @param item: List item.
+        @return: Return row of item, return None if item not in listview.
+        '''
+        row = item.get_index()
+        if row != None and 0 <= row <= last_index(self.items) and self.items[row] == item:
+            return row
+        else:
+            return None
+        
+    @contextmanager
+    def keep_select_rows(self):
+        '''
+        Internal function to keep select status with row id of data source.
+        '''
+        # Save select row ids.
+        start_select_row_id = None
+        if self.start_select_row != None:
+            start_select_row_id = self.data_source.get_row_id(self.start_select_row)
+            
+        select_row_ids = map(self.data_source.get_row_id, self.select_rows)    
+        
+        try:  
+            yield  
+        except Exception, e:  
+            print 'function keep_select_rows got error %s' % e  
+            traceback.print_exc(file=sys.stdout)
+            
+        else:  
+            # Restore select status.
+            if start_select_row_id != None or select_row_ids != []:
+                row_indexes = self.data_source.get_row_indexes(select_row_ids + [start_select_row_id])
+                self.start_select_row = row_indexes.get(start_select_row_id, None)
+                self.select_rows = sorted([row_indexes[row_id] for row_id in select_row_ids if row_id in row_indexes])
         
     def release_item(self, event):
         '''
@@ -1299,7 +1457,7 @@ class ListView(gtk.DrawingArea):
                         len(self.items))
         
         # Filt items around drag item.
-        filter_items = self.before_drag_items + [self.drag_item] + self.after_drag_items
+        filter_items = set(self.before_drag_items + [self.drag_item] + self.after_drag_items)
         
         before_items = []
         for item in self.items[0:hover_row]:
@@ -1812,15 +1970,26 @@ class ListView(gtk.DrawingArea):
         # Init select row.
         self.start_select_row = None
         self.select_rows = []
-        cache_remove_items = []
         
-        # Remove select items.
-        for remove_item in remove_items:
-            cache_remove_items.append(remove_item)
-            self.items.remove(remove_item)
+        if self.data_source != None:
+            # Owner of data source should remove rows in handler of `delete-select-items` signal.
+            self.emit("delete-select-items", remove_items)
             
-        # Emit remove items signal.     
-        self.emit("delete-select-items", cache_remove_items)    
+            self.data_source.reset()
+            if self.title_sort_column != None and len(self.sorts) >= self.title_sort_column + 1:
+                self.sort_by_column(self.title_sort_column, self.title_sorts[self.title_sort_column])
+        else:
+            # Remove select items.
+            cache_remove_items = list(remove_items)
+            remove_item_set = set(cache_remove_items)
+            self.items = filter(lambda item: item not in remove_item_set, self.items)
+            
+            if self.render_cache != None:
+                for remove_item in cache_remove_items:
+                    self.render_cache.invalidate(remove_item)
+                
+            # Emit remove items signal.     
+            self.emit("delete-select-items", cache_remove_items)    
             
         # Update item index.
         self.update_item_index()    
@@ -1857,6 +2026,10 @@ class ListView(gtk.DrawingArea):
         self.start_select_row = None
         self.select_rows = []
         self.items = []
+        self.data_source = None
+        
+        if self.render_cache != None:
+            self.render_cache.clear()
         
         # Update vertical adjustment.
         self.update_vadjustment()
@@ -2053,6 +2226,226 @@ class ListItem(gobject.GObject):
                 self.render_artist,
                 self.render_length]
     
+class ListDataSource(object):
+    '''
+    Data source for L{ I{ListView} <ListView>} virtual mode.
+    
+    Data source only know row count and how to fetch row, 
+    item of row is create when it's need by listview, 
+    and keep in a small LRU cache, so listview can show million rows with few memory.
+    
+    Row id is index of row in data source, it won't change after sort,
+    listview use row id to keep select status.
+    '''
+    def __init__(self, 
+                 row_count, 
+                 fetch_row, 
+                 column_sizes=None, 
+                 sort_rows=None,
+                 sample_size=100,
+                 cache_size=512,
+                 ):
+        '''
+        Initialize ListDataSource class.
+        
+        @param row_count: Callback to get row count, or row count value.
+        @param fetch_row: Callback to build item with given row id, item must implement ListView interface, see L{ I{ListItem} <ListItem>}.
+        @param column_sizes: Declared column sizes, format as return value of ListItem.get_column_sizes, default is None will sample rows to calcuate column sizes.
+        @param sort_rows: Callback to sort rows, argument is (column, reverse) and return row ids after sort, default is None will sort with key function of listview, that need fetch every row, so give sort_rows if data source is large.
+        @param sample_size: Sample row number to calcuate column sizes, default is 100.
+        @param cache_size: Max number of item cache, default is 512.
+        '''
+        self.row_count = row_count
+        self.fetch_row = fetch_row
+        self.column_sizes = column_sizes
+        self.sort_rows = sort_rows
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self.redraw_callback = None
+        self.row_ids = None     # None mean row id is same as row index
+        self.item_cache = OrderedDict()
+        
+    @staticmethod
+    def from_columns(columns, fetch_item, **kwargs):
+        '''
+        Build data source with columnar store.
+        
+        Columnar store is list of column value sequence (list, array or numpy array), 
+        sort by column will compare column value directly, don't need build any item.
+        
+        @param columns: A list of column value sequence, all sequence have same length.
+        @param fetch_item: Callback to build item with column values of row.
+        @return: Return ListDataSource instance.
+        '''
+        def sort_rows(column, reverse):
+            column_values = columns[column]
+            return sorted(xrange(len(column_values)), key=column_values.__getitem__, reverse=reverse)
+        
+        return ListDataSource(
+            lambda : len(columns[0]),
+            lambda row_id: fetch_item(*[column_values[row_id] for column_values in columns]),
+            sort_rows=sort_rows,
+            **kwargs)
+        
+    def bind_redraw_callback(self, callback):
+        '''
+        Internal function to bind callback of `redraw-request` signal for fetched item.
+        
+        @param callback: Callback of `redraw-request` signal.
+        '''
+        self.redraw_callback = callback
+        self.item_cache.clear()
+        
+    def get_row_count(self):
+        '''
+        Get row count.
+        
+        @return: Return row count of data source.
+        '''
+        if callable(self.row_count):
+            return self.row_count()
+        else:
+            return self.row_count
+        
+    def get_row_id(self, index):
+        '''
+        Get row id with given row index.
+        
+        @param index: Row index in listview.
+        @return: Return row id.
+        '''
+        if self.row_ids == None:
+            return index
+        else:
+            return self.row_ids[index]
+        
+    def get_row_indexes(self, row_ids):
+        '''
+        Get row indexes with given row ids.
+        
+        @param row_ids: A list of row id.
+        @return: Return dict that map row id to row index, row id that not exists won't in dict.
+        '''
+        if self.row_ids == None:
+            row_count = self.get_row_count()
+            return dict([(row_id, row_id) for row_id in row_ids if row_id != None and 0 <= row_id < row_count])
+        else:
+            match_row_ids = set(row_ids)
+            row_indexes = {}
+            for (index, row_id) in enumerate(self.row_ids):
+                if row_id in match_row_ids:
+                    row_indexes[row_id] = index
+                    
+                    # Stop loop when found all rows.
+                    if len(row_indexes) == len(match_row_ids):
+                        break
+                    
+            return row_indexes
+        
+    def get_item(self, index):
+        '''
+        Get item with given row index, item will build and cache if it not in cache.
+        
+        @param index: Row index in listview.
+        @return: Return item of row.
+        '''
+        row_id = self.get_row_id(index)
+        if row_id in self.item_cache:
+            item = self.item_cache.pop(row_id)
+        else:
+            item = self.fetch_row(row_id)
+            if self.redraw_callback:
+                item.connect("redraw_request", self.redraw_callback)
+                
+            # Remove least recently used item.
+            if len(self.item_cache) >= self.cache_size:
+                self.item_cache.popitem(last=False)
+                
+        item.set_index(index)
+        self.item_cache[row_id] = item
+        
+        return item
+    
+    def get_column_sizes(self):
+        '''
+        Get column sizes to calcuate cell size of listview.
+        
+        @return: Return a list of column sizes, return declared column sizes if it's not None, otherwise return column sizes of sample rows. 
+        '''
+        if self.column_sizes != None:
+            return [self.column_sizes]
+        else:
+            row_count = self.get_row_count()
+            step = max(row_count / max(self.sample_size, 1), 1)
+            return [self.fetch_row(self.get_row_id(index)).get_column_sizes() for index in xrange(0, row_count, step)]
+            
+    def sort(self, sort_key, sort_cmp, reverse, column=None):
+        '''
+        Sort rows.
+        
+        Without sort_rows, every row is fetched to get sort key (cached item is reused), 
+        it's slow for large data source, give sort_rows to sort without build items.
+        
+        @param sort_key: Key function of item.
+        @param sort_cmp: Compare function.
+        @param reverse: Whether sort reverse.
+        @param column: Sort column, use callback sort_rows when column is not None and sort_rows is not None.
+        '''
+        if column != None and self.sort_rows:
+            self.row_ids = list(self.sort_rows(column, reverse))
+        else:
+            fetch_item = lambda row_id: self.item_cache[row_id] if self.item_cache.has_key(row_id) else self.fetch_row(row_id)
+            if sort_key == None:
+                fetch_key = fetch_item
+            else:
+                fetch_key = lambda row_id: sort_key(fetch_item(row_id))
+                
+            self.row_ids = sorted(xrange(self.get_row_count()), key=fetch_key, cmp=sort_cmp, reverse=reverse)
+        
+        # Cache item is keyed by row id, just update index after sort.
+        self.update_item_index()
+        
+    def reset(self):
+        '''
+        Reset row order and item cache, call this function after data changed.
+        '''
+        self.row_ids = None
+        self.item_cache.clear()
+        
+    def update_item_index(self):
+        '''
+        Update index of cache items, item of row that not exists is removed from cache.
+        
+        Cache item is keyed by row id, so it's still valid after row index changed.
+        '''
+        row_indexes = self.get_row_indexes(self.item_cache.keys())
+        for row_id in self.item_cache.keys():
+            if row_indexes.has_key(row_id):
+                self.item_cache[row_id].set_index(row_indexes[row_id])
+            else:
+                del self.item_cache[row_id]
+        
+    def __len__(self):
+        return self.get_row_count()
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.get_item(i) for i in xrange(*index.indices(len(self)))]
+        else:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("ListDataSource index out of range")
+            
+            return self.get_item(index)
+        
+    def __getslice__(self, start, end):
+        return self.__getitem__(slice(start, end))
+        
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self.get_item(index)
+    
 def render_text(cr, rect, content, in_select, in_highlight, align=ALIGN_START, font_size=DEFAULT_FONT_SIZE):
     '''
     Helper render text function for ListItem, you should implement your own.
@@ -25,12 +25,13 @@ import traceback
 from contextlib import contextmanager 
 import gtk
 import gobject
-import cairo
 from threads import post_gui
 from draw import draw_vlinear, draw_pixbuf, draw_text
+from fade_mask import get_fade_surface, paint_fade_surface
 from theme import ui_theme
 from keymap import has_ctrl_mask, has_shift_mask, get_keyevent_name
 from cache_pixbuf import CachePixbuf
+from cache_surface import CacheSurface
 from utils import (cairo_state, get_window_shadow_size, get_event_coords,
                    container_remove_all, get_same_level_widgets,
                    is_left_button, is_double_click, is_single_click, remove_timeout_id)
@@ -38,7 +39,6 @@ from skin_config import skin_config
 from scrolled_window import ScrolledWindow
 import copy
 import pango
-import math
 import threading as td
 
 class SortThread(td.Thread):
@@ -50,7 +50,115 @@ class SortThread(td.Thread):
         self.render_action = render_action
         
     def run(self):
-        self.render_action(*self.sort_action())
+        result = self.sort_action()
+        
+        # Result is None if sort action is cancelled.
+        if result != None:
+            self.render_action(*result)
+
+class HeightIndex(object):
+    '''
+    Cumulative height index of tree rows, it's a Fenwick tree (binary indexed tree).
+    
+    Prefix height of row and row at y coordinate are both O(log n), 
+    rows after given row can rebuild in linear time without touch rows before it.
+    '''
+	
+    def __init__(self):
+        '''
+        Initialize HeightIndex class.
+        '''
+        self.heights = []
+        self.tree = [0]
+        
+    def __len__(self):
+        return len(self.heights)
+        
+    def truncate(self, row):
+        '''
+        Remove rows start from given row.
+        
+        Node i of Fenwick tree only contain rows not bigger than i, so just cut node list.
+        
+        @param row: Start row to remove.
+        '''
+        del self.heights[row:]
+        del self.tree[row + 1:]
+        
+    def extend(self, heights):
+        '''
+        Append row heights, Fenwick tree is built in linear time.
+        
+        New node start with its own height, then every node add itself to parent node in node order, 
+        old nodes that parent is new node are just nodes of prefix_sum(old length), so O(k + log n) to append k rows.
+        
+        @param heights: List of row height.
+        '''
+        start_node = len(self.heights)
+        self.heights += heights
+        self.tree += heights
+        node_count = len(self.heights)
+        
+        # Add old nodes to new parent nodes.
+        node = start_node
+        while node > 0:
+            parent_node = node + (node & -node)
+            if parent_node <= node_count:
+                self.tree[parent_node] += self.tree[node]
+            node -= node & -node
+            
+        # Add new nodes to parent nodes, child nodes always finish before parent node.
+        for node in xrange(start_node + 1, node_count + 1):
+            parent_node = node + (node & -node)
+            if parent_node <= node_count:
+                self.tree[parent_node] += self.tree[node]
+        
+    def prefix_sum(self, row):
+        '''
+        Get height count of rows before given row.
+        
+        @param row: Row index.
+        @return: Return height count of rows[0:row].
+        '''
+        height_count = 0
+        node = min(row, len(self.heights))
+        while node > 0:
+            height_count += self.tree[node]
+            node -= node & -node
+            
+        return height_count
+    
+    def total(self):
+        '''
+        Get height count of all rows.
+        '''
+        return self.prefix_sum(len(self.heights))
+    
+    def find_row(self, y):
+        '''
+        Find row at y coordinate.
+        
+        @param y: Y coordinate.
+        @return: Return row that prefix_sum(row) <= y < prefix_sum(row + 1), return None if y out of rows.
+        '''
+        if y < 0:
+            return None
+        
+        node = 0
+        step = 1
+        while step * 2 <= len(self.heights):
+            step *= 2
+            
+        while step > 0:
+            if node + step <= len(self.heights) and self.tree[node + step] <= y:
+                node += step
+                y -= self.tree[node]
+            step /= 2
+            
+        if node < len(self.heights):
+            return node
+        else:
+            return None
 
 class TitleBox(gtk.Button):
 	
@@ -168,6 +276,10 @@ class TreeView(gtk.VBox):
         self.drag_reference_row = None
         self.column_widths = []
         self.sort_action_id = 0
+        self.sort_info = None
+        self.items_change_id = 0
+        self.height_index = HeightIndex()
+        self.render_cache = None
         
         # Init redraw.
         self.redraw_request_list = []
@@ -239,73 +351,91 @@ class TreeView(gtk.VBox):
                     # Scroll viewport make sure preview row in visible area.
                     (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                     vadjust = self.scrolled_window.get_vadjustment()
-                    new_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:new_row])) 
+                    new_row_height_count = self.height_index.prefix_sum(new_row) 
                     if offset_y > new_row_height_count:
                         vadjust.set_value(max(vadjust.get_lower(), 
                                               new_row_height_count - self.visible_items[new_row].get_height()))
                         
         
     def sort_column(self, sort_column_index):
-       # Update sort action id.
-       self.sort_action_id += 1
-       
-       # Save current action id to return.
-       sort_action_id = self.sort_action_id
-       
-       # Split items with different column index.
-       level_items = []
-       column_index = None
-       for item in self.visible_items:
-           if item.column_index != column_index:
-               level_items.append((item.column_index, item.parent_item, [item]))
-               column_index = item.column_index
-           else:
-               if len(level_items) == 0:
-                   level_items.append((item.column_index, item.parent_item, [item]))
-               else:
-                   level_items[-1][2].append(item)
-       
-       # Connect all toplevel items to sort.
-       toplevel_items = []
-       child_items = []
-       for item in level_items:
-           (column_index, parent_item, items) = item
-           if column_index == 0:
-               toplevel_items += items
-           else:
-               child_items.append(item)
-       level_items = [(0, None, toplevel_items)] + child_items        
-       
-       # Sort items with different column index to make sure parent item sort before child item.
-       level_items = sorted(level_items, key=lambda (column_index, parent_item, items): column_index)            
-       
-       # Sort all items.
-       result_items = []
-       for (column_index, parent_item, items) in level_items:
-           # Do sort action.
-           sort_items = self.sort_methods[sort_column_index](
-               items, 
-               self.title_box.get_children()[sort_column_index].sort_ascending
-               )
-           
-           # If column index is 0, insert at last position.
-           if column_index == 0:
-               result_items += sort_items
-           # Insert after parent item if column index is not 0 (child items).
-           else:
-               split_index = result_items.index(parent_item) + 1
-               result_items = result_items[0:split_index] + sort_items + result_items[split_index::]
-           
-       return (result_items, sort_action_id)
+        '''
+        Sort items with given column, sort in SortThread.
+        
+        Every sibling group is sorted independently, and sorted items are assembled in tree order with linear time.
+        Sort stop early if newer sort action start.
+        
+        @param sort_column_index: Column index.
+        @return: Return (sorted items, sorted children dict, (sort method, sort ascending), sort action id, items change id), or return None if sort action is cancelled.
+        '''
+        # Update sort action id.
+        self.sort_action_id += 1
+        
+        # Save current action id and items change id to return.
+        sort_action_id = self.sort_action_id
+        items_change_id = self.items_change_id
+        
+        # Split items with parent item, item is toplevel item if it's parent not visible.
+        visible_items = list(self.visible_items)
+        visible_item_set = set(visible_items)
+        toplevel_items = []
+        child_items_dict = {}
+        for item in visible_items:
+            if item.parent_item == None or not item.parent_item in visible_item_set:
+                toplevel_items.append(item)
+            elif child_items_dict.has_key(item.parent_item):
+                child_items_dict[item.parent_item].append(item)
+            else:
+                child_items_dict[item.parent_item] = [item]
+                
+        # Sort every sibling group, stop when newer sort action start.
+        sort_method = self.sort_methods[sort_column_index]
+        sort_ascending = self.title_box.get_children()[sort_column_index].sort_ascending
+        toplevel_items = sort_method(toplevel_items, sort_ascending)
+        for (parent_item, items) in child_items_dict.items():
+            if sort_action_id != self.sort_action_id:
+                return None
+            
+            child_items_dict[parent_item] = sort_method(items, sort_ascending)
+            
+        # Assemble items in tree order, child items follow their parent item.
+        result_items = []
+        item_iters = [iter(toplevel_items)]
+        while len(item_iters) > 0:
+            item = next(item_iters[-1], None)
+            if item == None:
+                item_iters.pop()
+            else:
+                result_items.append(item)
+                if child_items_dict.has_key(item):
+                    item_iters.append(iter(child_items_dict[item]))
+                    
+        return (result_items, child_items_dict, (sort_method, sort_ascending), sort_action_id, items_change_id)
     
     @post_gui
-    def render_sort_column(self, items, sort_action_id):
-        if sort_action_id == self.sort_action_id:
+    def render_sort_column(self, items, child_items_dict, sort_info, sort_action_id, items_change_id):
+        # Drop sort result if newer sort action start or items changed after sort snapshot.
+        if sort_action_id == self.sort_action_id and items_change_id == self.items_change_id:
+            self.sort_info = sort_info
+            
+            # Tell parent item sort order of visible children, then new child can insert with sort order.
+            for (parent_item, child_items) in child_items_dict.items():
+                parent_item.set_sorted_child_items(child_items)
+                
             self.add_items(items, None, True)
         else:
             print "render_sort_column: drop old sort result!"
         
+    def get_sort_method(self):
+        '''
+        Get sort method of last sort, item use it to sort new children.
+        
+        @return: Return (sort method, sort ascending), return None if items haven't sorted by column.
+        '''
+        return self.sort_info
+        
     def set_column_titles(self, titles, sort_methods):
+        self.sort_info = None
+        
         if titles != None and sort_methods != None:
             self.titles = titles
             self.sort_methods = sort_methods
@@ -380,7 +510,7 @@ class TreeView(gtk.VBox):
             if select_row == 0:
                 vadjust.set_value(vadjust.get_lower())
             else:
-                item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:select_row]))
+                item_height_count = self.height_index.prefix_sum(select_row)
                 if offset_y > item_height_count:
                     vadjust.set_value(max(item_height_count - self.visible_items[select_row].get_height(), vadjust.get_lower()))
         else:
@@ -388,7 +518,7 @@ class TreeView(gtk.VBox):
                 # Record offset before scroll.
                 vadjust = self.scrolled_window.get_vadjustment()
                 
-                item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:self.start_select_row]))
+                item_height_count = self.height_index.prefix_sum(self.start_select_row)
                 scroll_offset_y = item_height_count - vadjust.get_value()
                 
                 # Get select row.
@@ -404,7 +534,7 @@ class TreeView(gtk.VBox):
                 if select_row == 0:
                     vadjust.set_value(vadjust.get_lower())
                 else:
-                    item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:select_row]))
+                    item_height_count = self.height_index.prefix_sum(select_row)
                     if offset_y > item_height_count:
                         vadjust.set_value(max(item_height_count - scroll_offset_y, 
                                               vadjust.get_lower()))
@@ -429,14 +559,14 @@ class TreeView(gtk.VBox):
             # Scroll viewport make sure preview row in visible area.
             max_y = vadjust.get_upper() - vadjust.get_page_size()
             (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
-            item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(self.start_select_row + 1)]))
+            item_height_count = self.height_index.prefix_sum(self.start_select_row + 1)
             if offset_y + vadjust.get_page_size() < item_height_count:
                 vadjust.set_value(min(max_y, item_height_count))
         else:
             if self.start_select_row != None:
                 # Record offset before scroll.
                 vadjust = self.scrolled_window.get_vadjustment()
-                item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(self.start_select_row + 1)]))
+                item_height_count = self.height_index.prefix_sum(self.start_select_row + 1)
                 scroll_offset_y = item_height_count - vadjust.get_value()
                 
                 # Get select row.
@@ -450,7 +580,7 @@ class TreeView(gtk.VBox):
                 # Scroll viewport make sure preview row in visible area.
                 max_y = vadjust.get_upper() - vadjust.get_page_size()
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
-                item_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(self.start_select_row + 1)]))
+                item_height_count = self.height_index.prefix_sum(self.start_select_row + 1)
                 if offset_y + vadjust.get_page_size() < item_height_count:
                     vadjust.set_value(min(max_y, item_height_count - scroll_offset_y))
             else:
@@ -475,7 +605,7 @@ class TreeView(gtk.VBox):
                 # Scroll viewport make sure preview row in visible area.
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                 vadjust = self.scrolled_window.get_vadjustment()
-                prev_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:prev_row])) 
+                prev_row_height_count = self.height_index.prefix_sum(prev_row) 
                 if offset_y > prev_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(),
                                           prev_row_height_count - self.visible_items[prev_row].get_height()))
@@ -490,7 +620,7 @@ class TreeView(gtk.VBox):
                 # Scroll viewport make sure preview row in visible area.
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                 vadjust = self.scrolled_window.get_vadjustment()
-                prev_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:prev_row])) 
+                prev_row_height_count = self.height_index.prefix_sum(prev_row) 
                 if offset_y > prev_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(), 
                                           prev_row_height_count - self.visible_items[prev_row].get_height()))
@@ -514,7 +644,7 @@ class TreeView(gtk.VBox):
                 # Scroll viewport make sure next row in visible area.
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                 vadjust = self.scrolled_window.get_vadjustment()
-                next_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:next_row]))
+                next_row_height_count = self.height_index.prefix_sum(next_row)
                 if offset_y + vadjust.get_page_size() < next_row_height_count + self.visible_items[next_row].get_height() or offset_y > next_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(),
                                           next_row_height_count + self.visible_items[next_row].get_height() - vadjust.get_page_size()))
@@ -526,7 +656,7 @@ class TreeView(gtk.VBox):
                 # Scroll viewport make sure next row in visible area.
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self)
                 vadjust = self.scrolled_window.get_vadjustment()
-                next_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(next_row + 1)]))
+                next_row_height_count = self.height_index.prefix_sum(next_row + 1)
                 if offset_y + vadjust.get_page_size() < next_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(),
                                           next_row_height_count - vadjust.get_page_size()))
@@ -546,7 +676,7 @@ class TreeView(gtk.VBox):
                     
                     (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                     vadjust = self.scrolled_window.get_vadjustment()
-                    prev_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:prev_row])) 
+                    prev_row_height_count = self.height_index.prefix_sum(prev_row) 
                     if offset_y > prev_row_height_count:
                         vadjust.set_value(max(vadjust.get_lower(), 
                                               prev_row_height_count - self.visible_items[prev_row].get_height()))
@@ -556,7 +686,7 @@ class TreeView(gtk.VBox):
                 
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                 vadjust = self.scrolled_window.get_vadjustment()
-                prev_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:prev_row])) 
+                prev_row_height_count = self.height_index.prefix_sum(prev_row) 
                 if offset_y > prev_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(), 
                                           prev_row_height_count - self.visible_items[prev_row].get_height()))
@@ -578,7 +708,7 @@ class TreeView(gtk.VBox):
                     
                     (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                     vadjust = self.scrolled_window.get_vadjustment()
-                    next_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(next_row + 1)])) 
+                    next_row_height_count = self.height_index.prefix_sum(next_row + 1) 
                     if offset_y + vadjust.get_page_size() < next_row_height_count:
                         vadjust.set_value(max(vadjust.get_lower(),
                                               next_row_height_count + self.visible_items[next_row].get_height() - vadjust.get_page_size()))
@@ -588,7 +718,7 @@ class TreeView(gtk.VBox):
                 
                 (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
                 vadjust = self.scrolled_window.get_vadjustment()
-                next_row_height_count = sum(map(lambda i: i.get_height(), self.visible_items[:(next_row + 1)])) 
+                next_row_height_count = self.height_index.prefix_sum(next_row + 1) 
                 if offset_y + vadjust.get_page_size() < next_row_height_count:
                     vadjust.set_value(max(vadjust.get_lower(),
                                           next_row_height_count - vadjust.get_page_size()))
@@ -647,16 +777,33 @@ class TreeView(gtk.VBox):
         
         self.delete_items(delete_items)
         
-    def update_item_index(self):
+    def update_item_index(self, start_row=0):
         '''
-        Update index of items.
+        Update index and height index of items.
+        
+        @param start_row: Update items start from this row, items before it must not changed, default is 0.
         '''
-        for (index, item) in enumerate(self.visible_items):
+        heights = []
+        for index in xrange(start_row, len(self.visible_items)):
+            item = self.visible_items[index]
             item.row_index = index
+            heights.append(item.get_height())
             
-    def update_item_widths(self):
-        self.column_widths = []
-        for item in self.visible_items:
+        self.height_index.truncate(start_row)
+        self.height_index.extend(heights)
+            
+    def update_item_widths(self, items=None):
+        '''
+        Update column widths.
+        
+        @param items: Just merge column widths of given items if items is not None, 
+        it's enough when items is added, default is None to update with all items.
+        '''
+        if items == None:
+            self.column_widths = []
+            items = self.visible_items
+            
+        for item in items:
             for (index, column_width) in enumerate(item.get_column_widths()):
                 if index < len(self.column_widths):
                     self.column_widths[index] = max(self.column_widths[index], column_width)
@@ -673,7 +820,40 @@ class TreeView(gtk.VBox):
                 else:
                     title_boxs[index].set_size_request(column_width, title_height)
             
+    def enable_render_cache(self, max_size=16 * 1024 * 1024):
+        '''
+        Enable render cache.
+        
+        After enable render cache, render result of cell is cached in surface, 
+        cache surface of item is remove when item call redraw_request_callback.
+        
+        @param max_size: Max memory size of render cache, in byte, default is 16MB.
+        '''
+        self.render_cache = CacheSurface(max_size)
+        
+    def disable_render_cache(self):
+        '''
+        Disable render cache.
+        '''
+        self.render_cache = None
+        
+    def render_cell(self, cr, item, column, rect):
+        '''
+        Internal function to render cell, use render cache if it enable.
+        '''
+        render = item.get_column_renders()[column]
+        if self.render_cache == None:
+            render(cr, rect)
+        else:
+            self.render_cache.render(
+                cr, item, 
+                (column, rect.width, rect.height, ui_theme.get_ticker()),
+                rect, render)
+            
     def redraw_request(self, item):
+        if self.render_cache != None:
+            self.render_cache.invalidate(item)
+            
         if not item in self.redraw_request_list:
             self.redraw_request_list.append(item)
     
@@ -692,41 +872,105 @@ class TreeView(gtk.VBox):
         Add items.
         '''
         with self.keep_select_status():
+            self.items_change_id += 1
+            
             if clear_first:
                 self.visible_items = []
             
             if insert_pos == None:
+                start_row = len(self.visible_items)
                 self.visible_items += items
             else:
-                self.visible_items = self.visible_items[0:insert_pos] + items + self.visible_items[insert_pos::]
+                start_row = insert_pos
+                self.visible_items[insert_pos:insert_pos] = items
             
-            # Update redraw callback.
-            # Callback is better way to avoid perfermance problem than gobject signal.
-            for item in items:
-                item.redraw_request_callback = self.redraw_request
-                item.add_items_callback = self.add_items
-                item.delete_items_callback = self.delete_items
+            self.bind_item_callbacks(items)
             
-            self.update_item_index()    
+            self.update_item_index(start_row)    
             
-            self.update_item_widths()
+            if clear_first:
+                self.update_item_widths()
+            else:
+                self.update_item_widths(items)
                 
             self.update_vadjustment()
+            
+    def replace_items(self, items, start_row, end_row):
+        '''
+        Replace items between start_row and end_row with given items.
+        
+        Select status and scroll position are kept, it's useful to re-order items in place.
+        
+        @param items: New items.
+        @param start_row: Start row of replaced items.
+        @param end_row: End row of replaced items, not include.
+        '''
+        vadjust = self.scrolled_window.get_vadjustment()
+        vadjust_value = vadjust.get_value()
+        
+        with self.keep_select_status():
+            self.items_change_id += 1
+            
+            if self.render_cache != None:
+                item_set = set(items)
+                for item in self.visible_items[start_row:end_row]:
+                    if not item in item_set:
+                        self.render_cache.invalidate(item)
+            
+            self.visible_items[start_row:end_row] = items
+            
+            self.bind_item_callbacks(items)
+            
+            self.update_item_index(start_row)
+            
+            self.update_item_widths()
+            
+            self.update_vadjustment()
+            
+        vadjust.set_value(max(min(vadjust_value, vadjust.get_upper() - vadjust.get_page_size()), vadjust.get_lower()))
+        
+        self.draw_area.queue_draw()
+        
+    def bind_item_callbacks(self, items):
+        '''
+        Internal function to bind callbacks of items.
+        '''
+        # Callback is better way to avoid perfermance problem than gobject signal.
+        for item in items:
+            item.redraw_request_callback = self.redraw_request
+            item.add_items_callback = self.add_items
+            item.delete_items_callback = self.delete_items
+            item.replace_items_callback = self.replace_items
+            item.update_widths_callback = self.update_item_widths
+            item.get_sort_method_callback = self.get_sort_method
         
     def delete_items(self, items):
         with self.keep_select_status():
-            for item in items:
-                if item in self.visible_items:
-                    self.visible_items.remove(item)
+            self.items_change_id += 1
+            
+            if self.render_cache != None:
+                for item in items:
+                    self.render_cache.invalidate(item)
+                    
+            # Filter items with set, rows before first deleted item keep index.
+            delete_item_set = set(items)
+            start_row = len(self.visible_items)
+            for (row, item) in enumerate(self.visible_items):
+                if item in delete_item_set:
+                    start_row = row
+                    break
+                
+            self.visible_items[start_row:] = filter(lambda item: not item in delete_item_set, 
+                                                    self.visible_items[start_row:])
                     
-            self.update_item_index()    
+            self.update_item_index(start_row)    
             
             self.update_item_widths()
             
             self.update_vadjustment()
         
     def update_vadjustment(self):
-        vadjust_height = sum(map(lambda i: i.get_height(), self.visible_items))
+        vadjust_height = self.height_index.total()
         self.draw_area.set_size_request(-1, vadjust_height)
         vadjust = self.scrolled_window.get_vadjustment()
         vadjust.set_upper(vadjust_height)
@@ -769,8 +1013,7 @@ class TreeView(gtk.VBox):
         
         # Init top surface.
         if vadjust.get_value() != vadjust.get_lower():
-            top_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-            top_surface_cr = gtk.gdk.CairoContext(cairo.Context(top_surface))
+            (top_surface, top_surface_cr) = get_fade_surface("top", rect.width, self.mask_bound_height)
             
             clip_y = vadjust.get_value() + self.mask_bound_height
         else:
@@ -780,8 +1023,7 @@ class TreeView(gtk.VBox):
         
         # Init bottom surface.
         if vadjust.get_value() + vadjust.get_page_size() != vadjust.get_upper():
-            bottom_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, rect.width, self.mask_bound_height)
-            bottom_surface_cr = gtk.gdk.CairoContext(cairo.Context(bottom_surface))
+            (bottom_surface, bottom_surface_cr) = get_fade_surface("bottom", rect.width, self.mask_bound_height)
             
             clip_height = vadjust.get_page_size() - self.mask_bound_height - (clip_y - vadjust.get_value())
         else:
@@ -814,8 +1056,10 @@ class TreeView(gtk.VBox):
                         top_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                         top_surface_cr.clip()
                         
-                        item.get_column_renders()[index](
+                        self.render_cell(
                             top_surface_cr,
+                            item,
+                            index,
                             gtk.gdk.Rectangle(render_x, 
                                               render_y - int(vadjust.get_value()), 
                                               render_width, 
@@ -827,8 +1071,10 @@ class TreeView(gtk.VBox):
                         bottom_surface_cr.rectangle(rect.x, 0, rect.width, self.mask_bound_height)
                         bottom_surface_cr.clip()
                         
-                        item.get_column_renders()[index](
+                        self.render_cell(
                             bottom_surface_cr,
+                            item,
+                            index,
                             gtk.gdk.Rectangle(render_x, 
                                               render_y - int(vadjust.get_value()) - int(vadjust.get_page_size() - self.mask_bound_height), 
                                               render_width, 
@@ -843,7 +1089,7 @@ class TreeView(gtk.VBox):
                         cr.rectangle(render_x, render_y, render_width, render_height)
                         cr.clip()
                 
-                        item.get_column_renders()[index](cr, gtk.gdk.Rectangle(render_x, render_y, render_width, render_height))
+                        self.render_cell(cr, item, index, gtk.gdk.Rectangle(render_x, render_y, render_width, render_height))
                     
                 item_width_count += column_width
                 
@@ -851,57 +1097,27 @@ class TreeView(gtk.VBox):
             
         # Draw alpha mask on top surface.
         if top_surface:
-            i = 0
-            while (i <= self.mask_bound_height):
-                with cairo_state(cr):
-                    cr.rectangle(rect.x, vadjust.get_value() + i, rect.width, 1)
-                    cr.clip()
-                    cr.set_source_surface(top_surface, 0, vadjust.get_value())
-                    cr.paint_with_alpha(math.sin(i * math.pi / 2 / self.mask_bound_height))
-                    
-                i += 1    
+            paint_fade_surface(cr, top_surface, 0, vadjust.get_value(), True)
             
         # Draw alpha mask on bottom surface.
         if bottom_surface:
-            i = 0
-            while (i < self.mask_bound_height):
-                with cairo_state(cr):
-                    cr.rectangle(rect.x, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height + i, rect.width, 1)
-                    cr.clip()
-                    cr.set_source_surface(bottom_surface, 0, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height)
-                    cr.paint_with_alpha(1.0 - (math.sin(i * math.pi / 2 / self.mask_bound_height)))
-                    
-                i += 1    
+            paint_fade_surface(cr, bottom_surface, 0, vadjust.get_value() + vadjust.get_page_size() - self.mask_bound_height, False)
     
     def get_expose_bound(self):
         (offset_x, offset_y, viewport) = self.get_offset_coordinate(self.draw_area)
         page_size = self.scrolled_window.get_vadjustment().get_page_size()
         
-        start_row = None
-        end_row = None
-        start_y = None
-        item_height_count = 0
-        item_index_count = 0
-        for item in self.visible_items:
-            if start_row == None and start_y == None:
-                if item_height_count <= offset_y <= item_height_count + item.get_height():
-                    start_row = item_index_count
-                    start_y = item_height_count
-            elif end_row == None:
-                if item_height_count <= offset_y + page_size <= item_height_count + item.get_height():
-                    end_row = item_index_count + 1 # add 1 for python list split operation
-            else:
-                break
-            
-            item_index_count += 1
-            item_height_count += item.get_height()
-            
-        assert(start_row != None and start_y != None)    
+        start_row = self.get_row_with_coordinate(offset_y)
+        assert(start_row != None)    
+        start_y = self.height_index.prefix_sum(start_row)
         
-        # Items' height must smaller than page size if end_row is None after scan all items.
+        # Items' height must smaller than page size if end_row is None.
         # Then we need adjust end_row with last index of visible list.
+        end_row = self.height_index.find_row(offset_y + page_size)
         if end_row == None:
             end_row = len(self.visible_items)
+        else:
+            end_row += 1 # add 1 for python list split operation
         
         return (start_row, end_row, start_y)    
     
@@ -1208,16 +1424,13 @@ class TreeView(gtk.VBox):
         return self.get_row_with_coordinate(event_y)
         
     def get_row_with_coordinate(self, y):
-        item_height_count = 0
-        item_index_count = 0
-        for item in self.visible_items:
-            if item_height_count <= y <= item_height_count + item.get_height():
-                return item_index_count
-            
-            item_height_count += item.get_height()
-            item_index_count += 1
+        row = self.height_index.find_row(y)
+        
+        # Bottom edge of last item still belong to it.
+        if row == None and len(self.visible_items) > 0 and y == self.height_index.total():
+            row = len(self.visible_items) - 1
             
-        return None    
+        return row
 
     def draw_mask(self, cr, x, y, w, h):
         '''
@@ -1315,12 +1528,15 @@ class TreeItem(gobject.GObject):
         '''
         gobject.GObject.__init__(self)
         self.parent_item = None
-        self.chlid_items = None
+        self.child_items = None
         self.row_index = None
         self.column_index = None
         self.redraw_request_callback = None
         self.add_items_callback = None
         self.delete_items_callback = None
+        self.replace_items_callback = None
+        self.update_widths_callback = None
+        self.get_sort_method_callback = None
         self.is_select = False
         self.is_expand = False
         self.drag_line = False
@@ -1353,6 +1569,14 @@ class TreeItem(gobject.GObject):
     def double_click(self):
         pass        
     
+    def set_sorted_child_items(self, child_items):
+        '''
+        Callback after TreeView sort column, item can save sort order of children.
+        
+        @param child_items: Visible children of item, in sorted order.
+        '''
+        pass
+    
     def draw_drag_line(self, drag_line, drag_line_at_bottom=False):
         pass
     
@@ -24,6 +24,7 @@
 from draw import draw_pixbuf
 from utils import is_in_rect, color_hex_to_cairo
 from constant import PANED_HANDLE_SIZE
+from frame_clock import frame_clock
 import gobject
 import gtk
 import math
@@ -59,7 +60,10 @@ class Paned(gtk.Paned):
         self.init_button("normal")
         self.animation_delay = 20 # milliseconds
         self.animation_times = 10
-        self.animation_position_frames = []
+        self.animation_id = None
+        self.animation_start_time = None
+        self.animation_start_position = 0
+        self.animation_end_position = 0
         self.press_coordinate = None
         
     def init_button(self, status):
@@ -149,13 +153,13 @@ class Paned(gtk.Paned):
     def do_enter_notify_event(self, e):
         self.show_button = True
         
-        self.queue_draw()
+        frame_clock.queue_draw(self)
     
     def do_leave_notify_event(self, e):
         self.show_button = False
         self.init_button("normal")
         
-        self.queue_draw()
+        frame_clock.queue_draw(self)
         
     def do_motion_notify_event(self, e):
         '''
@@ -175,7 +179,7 @@ class Paned(gtk.Paned):
             
             self.init_button("normal")
 
-        self.queue_draw()
+        frame_clock.queue_draw(self)
         
         gtk.Paned.do_motion_notify_event(self, e)
 
@@ -233,21 +237,28 @@ class Paned(gtk.Paned):
         current_position = self.get_position()
         if self.enable_animation:
             if new_position != current_position:
-                for i in range(0, self.animation_times + 1):
-                    step = int(math.sin(math.pi * i / 2 / self.animation_times) * (new_position - current_position))
-                    self.animation_position_frames.append(current_position + step)
-                    
-                if self.animation_position_frames[-1] != new_position:
-                    self.animation_position_frames.append(new_position)
-                    
-                gtk.timeout_add(self.animation_delay, self.update_position)
+                self.animation_start_time = None
+                self.animation_start_position = current_position
+                self.animation_end_position = new_position
+                
+                frame_clock.remove(self.animation_id)
+                self.animation_id = frame_clock.add(self.update_position)
         else:
             self.set_position(new_position)
         
-    def update_position(self):
-        self.set_position(self.animation_position_frames.pop(0))        
+    def update_position(self, frame_time):
+        if self.animation_start_time == None:
+            self.animation_start_time = frame_time
+            
+        # Animation duration is same as animation_times frames of animation_delay.
+        duration = self.animation_delay * self.animation_times
+        factor = min((frame_time - self.animation_start_time) * 1000.0 / duration, 1.0)
+        step = int(math.sin(math.pi * factor / 2) * (self.animation_end_position - self.animation_start_position))
+        self.set_position(self.animation_start_position + step)
         
-        if self.animation_position_frames == []:
+        if factor >= 1.0:
+            self.set_position(self.animation_end_position)
+            self.animation_id = None
             return False
         else:
             return True
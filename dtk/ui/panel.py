@@ -20,6 +20,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from frame_clock import frame_clock
 from skin_config import skin_config
 from theme import ui_theme
 from utils import remove_timeout_id
@@ -36,6 +37,7 @@ class Panel(gtk.Window):
     @undocumented: stop_render
     @undocumented: start_show
     @undocumented: start_hide
+    @undocumented: get_render_steps
     @undocumented: render_show
     @undocumented: render_hide
     @undocumented: shape_panel
@@ -62,6 +64,7 @@ class Panel(gtk.Window):
         self.set_type_hint(gtk.gdk.WINDOW_TYPE_HINT_DIALOG) # make panel window don't switch in window manager
         self.start_show_id = None
         self.start_hide_id = None
+        self.render_time = None
         self.delay = 50         # milliseconds
         self.show_inc_opacity = 0.1
         self.hide_dec_opacity = 0.05
@@ -77,8 +80,10 @@ class Panel(gtk.Window):
         Internal function to stop render.
         '''
         # Stop callback.
-        remove_timeout_id(self.start_show_id)
-        remove_timeout_id(self.start_hide_id)
+        frame_clock.remove(self.start_show_id)
+        frame_clock.remove(self.start_hide_id)
+        self.start_show_id = None
+        self.start_hide_id = None
             
     def show_panel(self):
         '''
@@ -100,7 +105,8 @@ class Panel(gtk.Window):
         '''
         if self.start_show_id == None and self.get_opacity() != 1:
             self.stop_render()
-            self.start_show_id = gtk.timeout_add(self.delay, self.render_show)
+            self.render_time = None
+            self.start_show_id = frame_clock.add(self.render_show)
             self.show_all()
         
     def start_hide(self):
@@ -109,13 +115,29 @@ class Panel(gtk.Window):
         '''
         if self.start_hide_id == None and self.get_opacity() != 0:
             self.stop_render()
-            self.start_hide_id = gtk.timeout_add(self.delay, self.render_hide)
+            self.render_time = None
+            self.start_hide_id = frame_clock.add(self.render_hide)
+    
+    def get_render_steps(self, frame_time):
+        '''
+        Internal function to get steps of opacity change since last frame.
+        
+        Opacity change show_inc_opacity or hide_dec_opacity every delay milliseconds.
+        '''
+        if self.render_time == None:
+            steps = 1
+        else:
+            steps = (frame_time - self.render_time) * 1000.0 / self.delay
+        self.render_time = frame_time
+        
+        return steps
     
-    def render_show(self):
+    def render_show(self, frame_time):
         '''
         Internal function to render show effect.
         '''
-        self.set_opacity(min(self.get_opacity() + self.show_inc_opacity, 1))
+        self.set_opacity(min(self.get_opacity() + self.show_inc_opacity * self.get_render_steps(frame_time), 1))
+        frame_clock.queue_draw(self)
         
         if self.get_opacity() >= 1:
             self.stop_render()
@@ -123,11 +145,12 @@ class Panel(gtk.Window):
         else:
             return True
     
-    def render_hide(self):
+    def render_hide(self, frame_time):
         '''
         Internal function to render hide effect.
         '''
-        self.set_opacity(max(self.get_opacity() - self.hide_dec_opacity, 0))
+        self.set_opacity(max(self.get_opacity() - self.hide_dec_opacity * self.get_render_steps(frame_time), 0))
+        frame_clock.queue_draw(self)
         
         if self.get_opacity() <= 0:
             self.stop_render()
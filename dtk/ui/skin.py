@@ -34,26 +34,44 @@ from locales import _
 from scrolled_window import ScrolledWindow
 from skin_config import skin_config
 from theme import ui_theme
+from thread_pool import MissionThreadPool, MissionThread
 from threads import post_gui
+from thumbnail import get_thumbnail
 import tooltip as Tooltip
 import gobject
 import gtk
 import math
 import os
 import shutil
+import sys
 import tarfile
 import threading as td
+import traceback
 import urllib
 import uuid
 from utils import (is_in_rect, set_cursor, remove_timeout_id,
                    color_hex_to_cairo, cairo_state, container_remove_all, 
                    cairo_disable_antialias, remove_directory, end_with_suffixs, 
                    create_directory, touch_file, scroll_to_bottom, 
-                   place_center, get_pixbuf_support_foramts, find_similar_color, 
-                   get_optimum_pixbuf_from_file)
+                   place_center, get_pixbuf_support_foramts, find_similar_color)
 
 __all__ = ["SkinWindow"]
 
+SKIN_PREVIEW_WIDTH = 86
+SKIN_PREVIEW_HEIGHT = 56
+
+# Skin packages maybe import in parallel, theme directories are shared by them.
+skin_theme_lock = td.Lock()
+
+def get_skin_preview_pixbuf(background_path):
+    '''
+    Get preview pixbuf of skin background.
+    
+    @param background_path: Background image path of skin.
+    @return: Return preview pixbuf.
+    '''
+    return get_thumbnail(background_path, SKIN_PREVIEW_WIDTH, SKIN_PREVIEW_HEIGHT, False)
+
 class LoadSkinThread(td.Thread):
     '''
     Thread to load skin.
@@ -87,9 +105,142 @@ class LoadSkinThread(td.Thread):
                 dirs.sort()         # sort directory with alpha order
                 for filename in files:
                     if end_with_suffixs(filename, support_foramts):
-                        self.add_skin_icon(root, filename)
+                        # Decode preview in thread, don't block GUI thread.
+                        self.add_skin_icon(root, filename, get_skin_preview_pixbuf(os.path.join(root, filename)))
 
         self.add_add_icon()                
+        
+class ImportSkinMission(MissionThread):
+    '''
+    Mission to import skin from image or skin package.
+    
+    Mission prepare skin directory and preview pixbuf in thread,
+    and call finish_callback with mission when finish.
+    '''
+	
+    def __init__(self, filepath, finish_callback):
+        '''
+        Initialize ImportSkinMission class.
+        
+        @param filepath: Image or skin package (tar.gz) path.
+        @param finish_callback: Callback when mission finish, callback receive mission.
+        '''
+        MissionThread.__init__(self)
+        self.filepath = filepath
+        self.finish_callback = finish_callback
+        self.skin_dir = None
+        self.skin_image_file = None
+        self.pixbuf = None
+        self.version_mismatch = False
+        
+    def start_mission(self):
+        '''
+        Import skin.
+        '''
+        try:
+            if end_with_suffixs(self.filepath, get_pixbuf_support_foramts()):
+                self.import_image()
+            elif end_with_suffixs(self.filepath, ["tar.gz"]):
+                self.import_package()
+                
+            if self.skin_dir != None:
+                self.pixbuf = get_skin_preview_pixbuf(os.path.join(self.skin_dir, self.skin_image_file))
+        except Exception, e:
+            print "ImportSkinMission: import %s failed: %s" % (self.filepath, e)
+            traceback.print_exc(file=sys.stdout)
+            
+            if self.skin_dir != None:
+                remove_directory(self.skin_dir)
+                self.skin_dir = None
+            
+        self.finish_callback(self)
+        
+    def import_image(self):
+        '''
+        Create skin directory from image.
+        '''
+        # Init.
+        skin_dir = os.path.join(skin_config.user_skin_dir, str(uuid.uuid4()))
+        skin_image_file = os.path.basename(self.filepath)
+        config_file = os.path.join(skin_dir, "config.ini")
+        dominant_color = get_dominant_color(self.filepath)
+        similar_color = find_similar_color(dominant_color)[0]
+        default_config = [
+            ("theme", [("theme_name", similar_color)]),
+            ("application", [("app_id", skin_config.app_given_id),
+                             ("app_version", skin_config.app_given_version)]),
+            ("background", [("image", skin_image_file),
+                            ("x", "0"),
+                            ("y", "0"),
+                            ("scale_x", "1.0"),
+                            ("scale_y", "1.0"),
+                            ("dominant_color", dominant_color)]),
+            ("action", [("deletable", "True"),
+                        ("editable", "True"),
+                        ("vertical_mirror", "False"),
+                        ("horizontal_mirror", "False")])]
+        
+        # Create skin directory.
+        create_directory(skin_dir, True)
+        self.skin_dir = skin_dir
+        
+        # Copy skin image file.
+        shutil.copy(self.filepath, skin_dir)        
+        
+        # Touch skin config file.
+        touch_file(config_file)
+        
+        # Write default skin config information.
+        Config(config_file, default_config).write()
+        
+        self.skin_image_file = skin_image_file
+        
+    def import_package(self):
+        '''
+        Create skin directory from skin package.
+        '''
+        # Init.
+        skin_dir = os.path.join(skin_config.user_skin_dir, str(uuid.uuid4()))
+        
+        # Create skin directory.
+        create_directory(skin_dir, True)
+        self.skin_dir = skin_dir
+        
+        # Extract skin package.
+        tar = tarfile.open(self.filepath, "r:gz")
+        tar.extractall(skin_dir)
+        
+        # Get skin image file.
+        config = Config(os.path.join(skin_dir, "config.ini"))
+        config.load()
+
+        # Move theme files to given directory if theme is not in default theme list.
+        skin_theme_name = config.get("theme", "theme_name")
+        if not skin_theme_name in COLOR_SEQUENCE:
+            # Check version when package have special theme that not include in standard themes.
+            app_id = config.get("application", "app_id")
+            app_version = config.get("application", "app_version")
+            if app_id == skin_config.app_given_id and app_version == skin_config.app_given_version:
+                with skin_theme_lock:
+                    # Remove same theme from given directories.
+                    remove_directory(os.path.join(skin_config.ui_theme_dir, skin_theme_name))
+                    remove_directory(os.path.join(skin_config.app_theme_dir, skin_theme_name))
+                    
+                    # Move new theme files to given directories.
+                    shutil.move(os.path.join(skin_dir, "ui_theme", skin_theme_name), skin_config.ui_theme_dir)
+                    shutil.move(os.path.join(skin_dir, "app_theme", skin_theme_name), skin_config.app_theme_dir)
+                
+                # Remove temp theme directories under skin directory.
+                remove_directory(os.path.join(skin_dir, "ui_theme"))        
+                remove_directory(os.path.join(skin_dir, "app_theme"))        
+            else:
+                # Remove skin directory if version mismatch.
+                remove_directory(skin_dir)
+                self.skin_dir = None
+                self.version_mismatch = True
+                return 
+        
+        self.skin_image_file = config.get("background", "image")
 
 class SkinWindow(DialogBox):
     '''
@@ -182,6 +333,9 @@ class SkinPreviewPage(gtk.VBox):
         self.preview_scrolled_window.add_child(self.preview_view)
         self.pack_start(self.preview_align, True, True)
         
+        self.import_skin_number = 0
+        self.import_skin_dir = None
+        
         LoadSkinThread([skin_config.system_skin_dir, skin_config.user_skin_dir],
                        self.add_skin_icon,
                        self.add_add_icon).start()
@@ -196,14 +350,15 @@ class SkinPreviewPage(gtk.VBox):
         self.connect("drag-data-received", self.drag_skin_file)
         
     @post_gui    
-    def add_skin_icon(self, root, filename):
+    def add_skin_icon(self, root, filename, pixbuf=None):
         '''Add skin icon.'''
         self.preview_view.add_items([SkinPreviewIcon(
                     root, 
                     filename, 
                     self.change_skin_callback, 
                     self.switch_edit_page_callback,
-                    self.pop_delete_skin_dialog)])
+                    self.pop_delete_skin_dialog,
+                    pixbuf)])
         
     @post_gui
     def add_add_icon(self):
@@ -212,125 +367,73 @@ class SkinPreviewPage(gtk.VBox):
         
     def drag_skin_file(self, widget, drag_context, x, y, selection_data, info, timestamp):
         '''Drag skin file.'''
-        self.create_skin_from_file(urllib.unquote(selection_data.get_uris()[0].split("file://")[1]))            
+        self.import_skins(map(lambda uri: urllib.unquote(uri.split("file://")[1]), 
+                              filter(lambda uri: uri.startswith("file://"), selection_data.get_uris())))
         
     def create_skin_from_file(self, skin_file):
         '''Create skin from file.'''
-        support_foramts = get_pixbuf_support_foramts()
-        if end_with_suffixs(skin_file, support_foramts):
-            self.create_skin_from_image(skin_file)
-        elif end_with_suffixs(skin_file, ["tar.gz"]):
-            self.create_skin_from_package(skin_file)
+        self.import_skins([skin_file])
         
     def create_skin_from_image(self, filepath):
         '''Create skin from image.'''
-        # Init.
-        skin_dir = os.path.join(skin_config.user_skin_dir, str(uuid.uuid4()))
-        skin_image_file = os.path.basename(filepath)
-        config_file = os.path.join(skin_dir, "config.ini")
-        dominant_color = get_dominant_color(filepath)
-        similar_color = find_similar_color(dominant_color)[0]
-        default_config = [
-            ("theme", [("theme_name", similar_color)]),
-            ("application", [("app_id", skin_config.app_given_id),
-                             ("app_version", skin_config.app_given_version)]),
-            ("background", [("image", skin_image_file),
-                            ("x", "0"),
-                            ("y", "0"),
-                            ("scale_x", "1.0"),
-                            ("scale_y", "1.0"),
-                            ("dominant_color", dominant_color)]),
-            ("action", [("deletable", "True"),
-                        ("editable", "True"),
-                        ("vertical_mirror", "False"),
-                        ("horizontal_mirror", "False")])]
+        self.import_skins([filepath])
         
-        # Create skin directory.
-        create_directory(skin_dir, True)
+    def create_skin_from_package(self, filepath):
+        '''Create skin from package.'''
+        self.import_skins([filepath])
         
-        # Copy skin image file.
-        shutil.copy(filepath, skin_dir)        
+    def import_skins(self, filepaths):
+        '''
+        Import skins from images or skin packages.
         
-        # Touch skin config file.
-        touch_file(config_file)
+        Skins are imported in thread pool, preview is added to icon view when each skin finish,
+        and last imported skin is applied after all skins finish.
+        Thread pool exit when all skins of this import finish.
         
-        # Write default skin config information.
-        Config(config_file, default_config).write()
+        @param filepaths: A list of image or skin package (tar.gz) path.
+        '''
+        support_foramts = get_pixbuf_support_foramts() + ["tar.gz"]
+        missions = map(lambda filepath: ImportSkinMission(filepath, self.finish_import_skin),
+                       filter(lambda filepath: end_with_suffixs(filepath, support_foramts), filepaths))
         
-        # Apply new skin.
-        self.preview_view.add_items([SkinPreviewIcon(
-                    skin_dir,
-                    skin_image_file,
-                    self.change_skin_callback,
-                    self.switch_edit_page_callback,
-                    self.pop_delete_skin_dialog
-                    )], -1)
-        if skin_config.reload_skin(os.path.basename(skin_dir)):
-            skin_config.apply_skin()
+        if len(missions) > 0:
+            self.import_skin_number += len(missions)
             
-            self.highlight_skin()    
+            # Add missions before start pool, pool won't exit before missions added.
+            import_skin_pool = MissionThreadPool(exit_when_finish=True)
+            import_skin_pool.add_missions(missions)
+            import_skin_pool.start()
             
-            # Scroll scrollbar to bottom.
-            scroll_to_bottom(self.preview_scrolled_window)            
-        
-    def create_skin_from_package(self, filepath):
-        '''Create skin from package.'''
-        # Init.
-        skin_dir = os.path.join(skin_config.user_skin_dir, str(uuid.uuid4()))
-        
-        # Create skin directory.
-        create_directory(skin_dir, True)
-        
-        # Extract skin package.
-        tar = tarfile.open(filepath, "r:gz")
-        tar.extractall(skin_dir)
-        
-        # Get skin image file.
-        config = Config(os.path.join(skin_dir, "config.ini"))
-        config.load()
-
-        # Move theme files to given directory if theme is not in default theme list.
-        skin_theme_name = config.get("theme", "theme_name")
-        if not skin_theme_name in COLOR_SEQUENCE:
-            # Check version when package have special theme that not include in standard themes.
-            app_id = config.get("application", "app_id")
-            app_version = config.get("application", "app_version")
-            if app_id == skin_config.app_given_id and app_version == skin_config.app_given_version:
-                # Remove same theme from given directories.
-                remove_directory(os.path.join(skin_config.ui_theme_dir, skin_theme_name))
-                remove_directory(os.path.join(skin_config.app_theme_dir, skin_theme_name))
+    @post_gui
+    def finish_import_skin(self, mission):
+        '''Add preview of imported skin, apply skin after all skins finish.'''
+        self.import_skin_number -= 1
+        
+        if mission.skin_dir != None:
+            self.preview_view.add_items([SkinPreviewIcon(
+                        mission.skin_dir,
+                        mission.skin_image_file,
+                        self.change_skin_callback,
+                        self.switch_edit_page_callback,
+                        self.pop_delete_skin_dialog,
+                        mission.pixbuf,
+                        )], -1)
+            self.import_skin_dir = mission.skin_dir
+        elif mission.version_mismatch:
+            ConfirmDialog(_("Skin version mismatch"),
+                          _("Import skin version is mismatch with current one!")).show_all()
+            
+        # Apply new skin only once.
+        if self.import_skin_number == 0 and self.import_skin_dir != None:
+            if skin_config.reload_skin(os.path.basename(self.import_skin_dir)):
+                skin_config.apply_skin()
                 
-                # Move new theme files to given directories.
-                shutil.move(os.path.join(skin_dir, "ui_theme", skin_theme_name), skin_config.ui_theme_dir)
-                shutil.move(os.path.join(skin_dir, "app_theme", skin_theme_name), skin_config.app_theme_dir)
+                self.highlight_skin()    
                 
-                # Remove temp theme directories under skin directory.
-                remove_directory(os.path.join(skin_dir, "ui_theme"))        
-                remove_directory(os.path.join(skin_dir, "app_theme"))        
-            else:
-                # Remove skin directory if version mismatch.
-                remove_directory(skin_dir)
+                # Scroll scrollbar to bottom.
+                scroll_to_bottom(self.preview_scrolled_window)            
                 
-                ConfirmDialog(_("Skin version mismatch"),
-                              _("Import skin version is mismatch with current one!")).show_all()
-                return 
-        
-        # Apply new skin.
-        skin_image_file = config.get("background", "image")
-        self.preview_view.add_items([SkinPreviewIcon(
-                    skin_dir,
-                    skin_image_file,
-                    self.change_skin_callback,
-                    self.switch_edit_page_callback,
-                    self.pop_delete_skin_dialog
-                    )], -1)
-        if skin_config.reload_skin(os.path.basename(skin_dir)):
-            skin_config.apply_skin()
-            
-            self.highlight_skin()    
-            
-            # Scroll scrollbar to bottom.
-            scroll_to_bottom(self.preview_scrolled_window)            
+            self.import_skin_dir = None
                     
     def highlight_skin(self):
         '''Highlight skin.'''
@@ -362,6 +465,7 @@ class SkinPreviewPage(gtk.VBox):
                         
             # Remove skin directory.
             remove_directory(item.skin_dir)
+            skin_config.remove_skin_config_cache(item.skin_dir)
             
             # Remove item from icon view.
             self.preview_view.delete_items([item])
@@ -386,7 +490,8 @@ class SkinPreviewIcon(gobject.GObject):
                  background_file, 
                  change_skin_callback,
                  switch_edit_page_callback,
-                 pop_delete_skin_dialog_callback):
+                 pop_delete_skin_dialog_callback,
+                 pixbuf=None):
         '''Init item icon.'''
         gobject.GObject.__init__(self)
         self.skin_dir = skin_dir
@@ -395,8 +500,8 @@ class SkinPreviewIcon(gobject.GObject):
         self.switch_edit_page_callback = switch_edit_page_callback
         self.pop_delete_skin_dialog_callback = pop_delete_skin_dialog_callback
         self.background_path = os.path.join(skin_dir, background_file)
-        self.width = 86
-        self.height = 56
+        self.width = SKIN_PREVIEW_WIDTH
+        self.height = SKIN_PREVIEW_HEIGHT
         self.icon_padding = 2
         self.padding_x = 7
         self.padding_y = 10
@@ -405,15 +510,18 @@ class SkinPreviewIcon(gobject.GObject):
         self.delete_button_status = self.BUTTON_HIDE
         self.edit_button_status = self.BUTTON_HIDE
         
-        self.pixbuf = get_optimum_pixbuf_from_file(self.background_path, self.width, self.height, False)
+        # Use preview pixbuf that decoded in thread if given.
+        if pixbuf == None:
+            self.pixbuf = get_skin_preview_pixbuf(self.background_path)
+        else:
+            self.pixbuf = pixbuf
         
         self.show_delete_button_id = None
         self.show_edit_button_id = None
         self.show_delay = 500  # milliseconds
         
-        # Load skin config information.
-        self.config = Config(os.path.join(self.skin_dir, "config.ini"))
-        self.config.load()
+        # Mirrored preview pixbuf, key is (vertical_mirror, horizontal_mirror).
+        self.mirror_pixbuf_dict = {(False, False) : self.pixbuf}
         
     def is_in_delete_button_area(self, x, y):
         '''Is cursor in delete button area.'''
@@ -437,11 +545,30 @@ class SkinPreviewIcon(gobject.GObject):
     
     def is_deletable(self):
         '''Is deletable.'''
-        return self.config.getboolean("action", "deletable")
+        return skin_config.get_skin_config(self.skin_dir).getboolean("action", "deletable")
     
     def is_editable(self):
         '''Is editable.'''
-        return self.config.getboolean("action", "editable")    
+        return skin_config.get_skin_config(self.skin_dir).getboolean("action", "editable")    
+    
+    def get_mirror_pixbuf(self):
+        '''Get preview pixbuf with mirror status of skin.'''
+        preview_config = skin_config.get_skin_config(self.skin_dir)
+        mirror_key = (preview_config.getboolean("action", "vertical_mirror"),
+                      preview_config.getboolean("action", "horizontal_mirror"))
+        
+        if not self.mirror_pixbuf_dict.has_key(mirror_key):
+            (vertical_mirror, horizontal_mirror) = mirror_key
+            pixbuf = self.pixbuf
+            if vertical_mirror:
+                pixbuf = pixbuf.flip(True)
+            
+            if horizontal_mirror:
+                pixbuf = pixbuf.flip(False)
+                
+            self.mirror_pixbuf_dict[mirror_key] = pixbuf
+            
+        return self.mirror_pixbuf_dict[mirror_key]
         
     def emit_redraw_request(self):
         '''Emit redraw-request signal.'''
@@ -473,15 +600,7 @@ class SkinPreviewIcon(gobject.GObject):
         # Draw background.
         with cairo_state(cr):
             # Mirror image if necessarily.
-            preview_config = Config(os.path.join(self.skin_dir, "config.ini"))    
-            preview_config.load()
-            
-            pixbuf = self.pixbuf.copy()
-            if preview_config.getboolean("action", "vertical_mirror"):
-                pixbuf = pixbuf.flip(True)
-            
-            if preview_config.getboolean("action", "horizontal_mirror"):
-                pixbuf = pixbuf.flip(False)
+            pixbuf = self.get_mirror_pixbuf()
                 
             # Draw cover.
             draw_pixbuf(
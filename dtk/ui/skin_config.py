@@ -20,7 +20,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from cache_pixbuf import CachePixbuf
+from cache_pixbuf import CachePixbuf, PixbufScaler, scaled_pixbuf_cache
 from config import Config
 from constant import SHADE_SIZE, COLOR_SEQUENCE
 from draw import draw_pixbuf, draw_vlinear, draw_hlinear
@@ -58,6 +58,8 @@ class SkinConfig(gobject.GObject):
     @undocumented: vertical_mirror_background
     @undocumented: horizontal_mirror_background
     @undocumented: render_background
+    @undocumented: get_background_pixbuf
+    @undocumented: finish_background_scale
     @undocumented: export_skin
     '''
     
@@ -72,6 +74,13 @@ class SkinConfig(gobject.GObject):
         # Init.
         gobject.GObject.__init__(self)
         self.cache_pixbuf = CachePixbuf()
+        self.progressive_scale = True
+        self.background_scaler = PixbufScaler()
+        self.fast_pixbuf_key = None
+        self.fast_pixbuf = None
+        self.scaled_pixbuf_key = None
+        self.scaled_pixbuf = None
+        self.skin_config_dict = {}
         
         self.theme_list = []
         self.window_list = []
@@ -111,6 +120,45 @@ class SkinConfig(gobject.GObject):
         else:
             return None
         
+    def get_skin_config(self, skin_dir):
+        '''
+        Get config of given skin directory.
+        
+        Config is cached until modify time or size of config file changed, 
+        so render skin preview don't need read config file every time.
+        
+        Don't change config return by this function, it's shared by all callers.
+        
+        @param skin_dir: Skin directory.
+        @return: Return Config of skin.
+        '''
+        config_file = os.path.join(skin_dir, "config.ini")
+        try:
+            config_stat = os.stat(config_file)
+            config_stamp = (config_stat.st_mtime, config_stat.st_size)
+        except OSError:
+            config_stamp = None
+            
+        if self.skin_config_dict.has_key(skin_dir):
+            (cache_stamp, config) = self.skin_config_dict[skin_dir]
+            if cache_stamp == config_stamp:
+                return config
+            
+        config = Config(config_file)
+        config.load()
+        self.skin_config_dict[skin_dir] = (config_stamp, config)
+        
+        return config
+    
+    def remove_skin_config_cache(self, skin_dir):
+        '''
+        Remove cached config of given skin directory.
+        
+        @param skin_dir: Skin directory.
+        '''
+        if self.skin_config_dict.has_key(skin_dir):
+            del self.skin_config_dict[skin_dir]
+        
     def is_skin_exist(self, skin_name, system_skin_dir, user_skin_dir):
         '''
         Internal function to is skin exist in skin directories.
@@ -279,6 +327,10 @@ class SkinConfig(gobject.GObject):
         self.config.set("action", "horizontal_mirror", self.horizontal_mirror)
         
         self.config.write(given_filepath)
+        
+        # Config file maybe change in same second, remove cache make sure read new value.
+        if given_filepath == None:
+            self.remove_skin_config_cache(self.skin_dir)
     
     def change_theme(self, theme_name):
         '''
@@ -383,6 +435,79 @@ class SkinConfig(gobject.GObject):
         
         self.apply_skin()
     
+    def set_progressive_scale(self, progressive_scale):
+        '''
+        Set whether scale background progressively.
+        
+        When progressive scale is enable, background will draw with fast scaled pixbuf first, 
+        and redraw with high quality pixbuf after background thread finish scale.
+        
+        @param progressive_scale: Set as True to enable progressive scale, default is True.
+        '''
+        self.progressive_scale = progressive_scale
+        
+    def get_background_pixbuf(self, widget, background_width, background_height):
+        '''
+        Internal function to get scaled background pixbuf.
+        '''
+        if not self.progressive_scale:
+            self.cache_pixbuf.scale(self.background_pixbuf, background_width, background_height,
+                                    self.vertical_mirror, self.horizontal_mirror)
+            return self.cache_pixbuf.get_cache()
+        
+        # Use high quality pixbuf if it has scaled.
+        # Keep last high quality pixbuf here, because huge pixbuf won't save in global cache.
+        pixbuf_key = (self.background_pixbuf, background_width, background_height, 
+                      self.vertical_mirror, self.horizontal_mirror)
+        if self.scaled_pixbuf_key == pixbuf_key:
+            return self.scaled_pixbuf
+        
+        pixbuf = scaled_pixbuf_cache.lookup(
+            self.background_pixbuf, background_width, background_height, gtk.gdk.INTERP_BILINEAR,
+            self.vertical_mirror, self.horizontal_mirror)
+        if pixbuf != None:
+            self.scaled_pixbuf_key = pixbuf_key
+            self.scaled_pixbuf = pixbuf
+            return pixbuf
+        
+        # Scale high quality pixbuf in background thread.
+        self.background_scaler.scale(
+            self.background_pixbuf, background_width, background_height,
+            self.vertical_mirror, self.horizontal_mirror,
+            lambda pixbuf: self.finish_background_scale(widget, pixbuf_key, pixbuf))
+        
+        # Draw fast scaled pixbuf before high quality pixbuf finish,
+        # fast pixbuf is shared by all widgets that render background in same frame.
+        if self.fast_pixbuf_key != pixbuf_key:
+            pixbuf = self.background_pixbuf.scale_simple(background_width, background_height, gtk.gdk.INTERP_NEAREST)
+            if self.vertical_mirror:
+                pixbuf = pixbuf.flip(True)
+            if self.horizontal_mirror:
+                pixbuf = pixbuf.flip(False)
+                
+            self.fast_pixbuf_key = pixbuf_key
+            self.fast_pixbuf = pixbuf
+            
+        return self.fast_pixbuf
+    
+    def finish_background_scale(self, widget, pixbuf_key, pixbuf):
+        '''
+        Internal function to redraw windows after high quality background scaled.
+        '''
+        self.scaled_pixbuf_key = pixbuf_key
+        self.scaled_pixbuf = pixbuf
+        
+        # Release fast pixbuf.
+        self.fast_pixbuf_key = None
+        self.fast_pixbuf = None
+        
+        for window in self.window_list:
+            window.queue_draw()
+            
+        toplevel = widget.get_toplevel()
+        if not toplevel in self.window_list:
+            toplevel.queue_draw()
+        
     def render_background(self, cr, widget, x, y, 
                           translate_width=0,
                           translate_height=0):
@@ -399,12 +524,10 @@ class SkinConfig(gobject.GObject):
         background_y = int(self.y * self.scale_y)
         background_width = int(self.background_pixbuf.get_width() * self.scale_x)
         background_height = int(self.background_pixbuf.get_height() * self.scale_y)
-        self.cache_pixbuf.scale(self.background_pixbuf, background_width, background_height,
-                                self.vertical_mirror, self.horizontal_mirror)
-                
+        
         draw_pixbuf(
             cr,
-            self.cache_pixbuf.get_cache(),
+            self.get_background_pixbuf(widget, background_width, background_height),
             x + background_x,
             y + background_y)
         
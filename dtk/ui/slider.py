@@ -79,7 +79,7 @@ class Slider(gtk.Viewport):
         end_position = widget.get_allocation().x
 
         if start_position != end_position:
-            timeline = Timeline(500, CURVE_SINE)
+            timeline = Timeline(500, CURVE_SINE, self)
             timeline.connect('update', update)
             timeline.run()
             
@@ -141,14 +141,18 @@ class DynamicShadowColor(object):
 class DynamicPixbuf(object):
     '''
     Dynamic pixbuf.
+    
+    Pixbuf is decoded lazily when first call get_pixbuf after filepath update.
     '''
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, pixbuf_cache=None):
         '''
         Initialize DynamicPixbuf class.
         
         @param filepath: Dynamic pixbuf filepath.
+        @param pixbuf_cache: Dict to share decoded pixbuf with filepath, default is None.
         '''
+        self.pixbuf_cache = pixbuf_cache
         self.update(filepath)
         
     def update(self, filepath):
@@ -157,12 +161,22 @@ class DynamicPixbuf(object):
         
         @param filepath: Dynamic pixbuf filepath.
         '''
-        self.pixbuf = gtk.gdk.pixbuf_new_from_file(filepath)
+        self.filepath = filepath
+        self.pixbuf = None
 
     def get_pixbuf(self):
         '''
         Get pixbuf.
         '''
+        if self.pixbuf == None:
+            if self.pixbuf_cache == None:
+                self.pixbuf = gtk.gdk.pixbuf_new_from_file(self.filepath)
+            elif self.pixbuf_cache.has_key(self.filepath):
+                self.pixbuf = self.pixbuf_cache[self.filepath]
+            else:
+                self.pixbuf = gtk.gdk.pixbuf_new_from_file(self.filepath)
+                self.pixbuf_cache[self.filepath] = self.pixbuf
+            
         return self.pixbuf
 
 class Theme(object):
@@ -190,6 +204,8 @@ class Theme(object):
         self.color_dict = {}
         self.alpha_color_dict = {}
         self.shadow_color_dict = {}
+        self.theme_dir_dict = {}
+        self.theme_pixbuf_dict = {}
         
         # Create directory if necessarily.
         for theme_dir in [self.system_theme_dir, self.user_theme_dir]:
@@ -225,12 +241,20 @@ class Theme(object):
         
         @return: Return filepath of theme.
         '''
-        theme_file_dir = None
-        for theme_dir in [self.system_theme_dir, self.user_theme_dir]:
-            if os.path.exists(theme_dir):
-                if self.theme_name in os.listdir(os.path.expanduser(theme_dir)):
-                    theme_file_dir = theme_dir
-                    break
+        # Theme directory is memoized, avoid list theme directories for every lookup.
+        if self.theme_dir_dict.has_key(self.theme_name):
+            theme_file_dir = self.theme_dir_dict[self.theme_name]
+        else:
+            theme_file_dir = None
+            for theme_dir in [self.system_theme_dir, self.user_theme_dir]:
+                if os.path.exists(theme_dir):
+                    if self.theme_name in os.listdir(os.path.expanduser(theme_dir)):
+                        theme_file_dir = theme_dir
+                        break
+                    
+            # Don't memoize missing theme, it maybe add later.
+            if theme_file_dir:
+                self.theme_dir_dict[self.theme_name] = theme_file_dir
             
         if theme_file_dir:
             return os.path.join(theme_file_dir, self.theme_name, filename)
@@ -247,7 +271,9 @@ class Theme(object):
         '''
         # Just init pixbuf_dict when first load some pixbuf.
         if not self.pixbuf_dict.has_key(path):
-            self.pixbuf_dict[path] = DynamicPixbuf(self.get_theme_file_path("image/%s" % (path)))
+            self.pixbuf_dict[path] = DynamicPixbuf(
+                self.get_theme_file_path("image/%s" % (path)),
+                self.theme_pixbuf_dict)
             
         return self.pixbuf_dict[path]
 
@@ -287,6 +313,18 @@ class Theme(object):
         '''
         return self.ticker    
     
+    def clear_cache(self):
+        '''
+        Clear memoized theme directories and decoded pixbufs of all themes.
+        
+        Decoded pixbufs of current theme will decode again when them are used.
+        '''
+        self.theme_dir_dict.clear()
+        self.theme_pixbuf_dict.clear()
+        
+        for (path, pixbuf) in self.pixbuf_dict.items():
+            pixbuf.update(self.get_theme_file_path("image/%s" % (path)))
+    
     def change_theme(self, new_theme_name):
         '''
         Change theme with given new theme name.
@@ -299,7 +337,7 @@ class Theme(object):
         # Change theme name.
         self.theme_name = new_theme_name
 
-        # Update dynmaic pixbuf.
+        # Update dynmaic pixbuf, pixbuf will decode when it use first time.
         for (path, pixbuf) in self.pixbuf_dict.items():
             pixbuf.update(self.get_theme_file_path("image/%s" % (path)))
             
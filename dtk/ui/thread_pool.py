@@ -20,10 +20,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from contextlib import contextmanager 
-from threading import Lock
-import Queue as Q
+from threads import post_gui
+import gobject
 import gtk
+import heapq
 import os
 import threading as td
 import time
@@ -34,16 +34,28 @@ class MissionThreadPool(td.Thread):
     """
     A class of thread pool.
     
-    @undocumented: loop
-    @undocumented: start_missions
-    @undocumented: wake_up_wait_missions
-    @undocumented: sync
+    Pool start fixed number of long-lived worker threads, 
+    workers pull missions from priority queue, mission with smaller priority value run first,
+    missions with same priority run in submission order.
+    
+    Visible missions run before invisible missions if visibility hint is given, 
+    see L{ set_visible_keys <set_visible_keys>} and L{ follow_visible_items <follow_visible_items>}.
+    
+    Mission with same key (see L{ MissionThread.get_mission_key <MissionThread.get_mission_key>}) 
+    won't add again if it's still wait or running, and wait mission can cancel by key.
+    
+    Mission results are batched and pass to clean_callback in GUI thread.
+    
+    @undocumented: run_worker
+    @undocumented: get_next_mission
     @undocumented: finish_mission
     @undocumented: clean_mission
+    @undocumented: push_mission
+    @undocumented: update_mission_entry
+    @undocumented: update_visible_keys
+    @undocumented: is_mission_visible
     """
     
-    FINISH_SIGNAL = "Finish"
-	
     def __init__(self, 
                  concurrent_thread_num=5, # max concurrent thread number
                  clean_delay=0,           # clean delay (milliseconds)
@@ -53,9 +65,9 @@ class MissionThreadPool(td.Thread):
         """
         Initialise the thread pool.
 
-        @param concurrent_thread_num: Max concurrent thread number.
-        @param clean_delay: The time between the finish of the thread and the invocation of thread clean up function.
-        @param clean_callback: The clean up function, which is invoked after the thread is finished.
+        @param concurrent_thread_num: Number of worker threads.
+        @param clean_delay: The time between the finish of the mission and the invocation of clean up function, results finish in this time are passed to clean up function together.
+        @param clean_callback: The clean up function, which is invoked in GUI thread with list of mission result.
         @param exit_when_finish: Indicates whether the thread pool should be destroyed after all mission is finished. By default, it's False.
         """
         # Init thread.
@@ -66,167 +78,424 @@ class MissionThreadPool(td.Thread):
         self.concurrent_thread_num = concurrent_thread_num
         self.clean_delay = clean_delay
         self.clean_callback = clean_callback
-        self.clean_time = time.time()
         self.exit_when_finish = exit_when_finish
         
-        # Init list.
-        self.active_mission_list = []
-        self.wait_mission_list = []
+        # Init mission queue.
+        self.mission_heap = []
+        self.mission_sequence = 0
+        self.wait_mission_number = 0
+        self.active_mission_set = set()
+        self.mission_key_dict = {}
         self.mission_result_list = []
+        self.clean_id = None
+        self.has_mission = False
+        self.worker_list = []
+        self.visible_key_set = None
+        self.follow_id = None
         
         # Init lock.
-        self.thread_sync_lock = Lock()
-        self.mission_lock = Q.Queue()
+        self.mission_condition = td.Condition()
+        
+        # Init stats.
+        self.reset_stats()
 
     def run(self):
         """
-        The thread function.
+        The thread function, start worker threads and wait them exit.
         """
-        self.loop()
+        for index in range(self.concurrent_thread_num):
+            worker = td.Thread(target=self.run_worker)
+            worker.setDaemon(True)
+            worker.start()
+            self.worker_list.append(worker)
+            
+        for worker in self.worker_list:
+            worker.join()
+            
+        print ">>> Exit thread pool %s" % (self)
         
-    def loop(self):
+    def run_worker(self):
         """
-        Internal function to do loop.
-
-        It is called recusivly to start new mission and monitor the missions' status.
+        Internal function to run missions in worker thread.
         """
-        result = self.mission_lock.get()
-        if result == self.FINISH_SIGNAL:
-            print ">>> Finish missions."
-            if self.exit_when_finish:
-                print ">>> Exit thread pool %s" % (self)
-            else:
-                print ">>> Wait new missions."
-                self.loop()
-        else:
-            self.start_missions(result)
-            self.loop()
+        while True:
+            mission = self.get_next_mission()
+            if mission == None:
+                break
+            
+            try:
+                mission.start_mission()
+            except Exception, e:
+                print "MissionThreadPool: mission %s got error: %s" % (mission, e)
+                traceback.print_exc(file=sys.stdout)
+                
+            self.finish_mission(mission)
+            
+    def get_next_mission(self):
+        """
+        Internal function to get next mission, block until mission is available.
+        
+        @return: Return next mission, or return None if worker should exit.
+        """
+        with self.mission_condition:
+            while True:
+                while len(self.mission_heap) > 0:
+                    mission = heapq.heappop(self.mission_heap)[-1]
+                    # Entry is None if mission re-prioritized.
+                    if mission != None and not mission.is_cancelled():
+                        mission.heap_entry = None
+                        self.wait_mission_number -= 1
+                        self.active_mission_set.add(mission)
+                        
+                        mission.start_time = time.time()
+                        self.total_wait_time += mission.start_time - mission.add_time
+                        
+                        return mission
+                        
+                if self.exit_when_finish and self.has_mission and len(self.active_mission_set) == 0:
+                    return None
+                
+                self.mission_condition.wait()
             
     def add_missions(self, missions):
         """
         Add missions to the thread pool.
+        
+        Mission is ignored if mission with same key is waiting or running.
 
         @param missions: A list of mission which is of type class MissionThread.
+        @return: Return list of missions that added in thread pool.
         """
-        self.mission_lock.put(missions)
+        add_missions = []
+        with self.mission_condition:
+            for mission in missions:
+                mission_key = mission.get_mission_key()
+                if mission_key != None:
+                    if self.mission_key_dict.has_key(mission_key):
+                        self.duplicate_number += 1
+                        continue
+                    else:
+                        self.mission_key_dict[mission_key] = mission
+                        
+                mission.add_time = time.time()
+                self.push_mission(mission)
+                self.wait_mission_number += 1
+                add_missions.append(mission)
+                
+            if len(add_missions) > 0:
+                self.has_mission = True
+                self.mission_condition.notify_all()
+                
+        return add_missions
+    
+    def add_mission(self, mission):
+        """
+        Add mission to the thread pool.
         
-    def start_missions(self, missions):
+        @param mission: Mission of type class MissionThread.
+        @return: Return True if mission added, or return False if mission with same key is waiting or running.
         """
-        Internal function to start missions in the thread pool.
-
-        @param missions: A list of mission which is of type class MissionThread.
+        return len(self.add_missions([mission])) > 0
+    
+    def push_mission(self, mission, mission_sequence=None):
         """
-        for (index, mission) in enumerate(missions):
-            # Add to wait list if active mission number reach max value.
-            if len(self.active_mission_list) >= self.concurrent_thread_num:
-                self.wait_mission_list += missions[index::]
-                break
-            # Otherwise start new mission.
-            else:
-                self.start_mission(mission)
-                
-    def start_mission(self, mission):
+        Internal function to push mission in priority queue, need hold mission_condition.
+        
+        Visible mission is pushed before invisible mission.
+        
+        @param mission: Mission of type class MissionThread.
+        @param mission_sequence: Sequence of mission, keep it when re-push mission, then missions with same priority still run with add order. Default is None to use new sequence.
         """
-        Start a specific mission in the thread pool.
-
-        @param mission: a mission which is of type class MissionThread.
+        if mission_sequence == None:
+            mission_sequence = self.mission_sequence
+            self.mission_sequence += 1
+            
+        mission.heap_entry = [not self.is_mission_visible(mission), mission.mission_priority, mission_sequence, mission]
+        heapq.heappush(self.mission_heap, mission.heap_entry)
+        
+    def is_mission_visible(self, mission):
         """
-        self.active_mission_list.append(mission)
-        mission.finish_mission = self.finish_mission
-        mission.start()
-                
-    def wake_up_wait_missions(self):
+        Internal function to check whether mission is visible, need hold mission_condition.
         """
-        Internal function to wake up the mission which is in waiting list.
+        mission_key = mission.get_mission_key()
+        return self.visible_key_set == None or (mission_key != None and mission_key in self.visible_key_set)
+        
+    def update_mission_entry(self, mission):
         """
-        for mission in self.wait_mission_list:
-            # Just break loop when active mission is bigger than max value.
-            if len(self.active_mission_list) >= self.concurrent_thread_num:
-                break
-            # Otherwise add mission from wait list.
+        Internal function to update priority of wait mission, need hold mission_condition.
+        
+        Old entry in queue is marked as invalid, new entry is pushed with old sequence, 
+        so update priority don't need rebuild queue, and mission keep add order in same priority.
+        
+        @param mission: Mission of type class MissionThread.
+        """
+        if mission.heap_entry != None:
+            mission_sequence = mission.heap_entry[2]
+            mission.heap_entry[-1] = None
+            self.push_mission(mission, mission_sequence)
+        
+    def set_mission_priority(self, mission_key, mission_priority):
+        """
+        Change priority of wait mission with given key.
+        
+        @param mission_key: Key of mission.
+        @param mission_priority: New priority, mission with smaller priority value run first.
+        @return: Return True if find wait mission with given key.
+        """
+        with self.mission_condition:
+            mission = self.mission_key_dict.get(mission_key)
+            if mission != None and mission.heap_entry != None:
+                mission.mission_priority = mission_priority
+                self.update_mission_entry(mission)
+                
+                return True
             else:
-                # Remove from wait list.
-                if mission in self.wait_mission_list:
-                    self.wait_mission_list.remove(mission)
+                return False
+            
+    def set_visible_keys(self, visible_keys, cancel_invisible=False):
+        """
+        Set key of missions that item is visible, wait missions of visible items run first.
+        
+        Just missions that visibility changed are re-prioritized, 
+        so it's cheap to call this function when view scroll.
+        
+        @param visible_keys: Key list of visible missions, set None to clean visibility hint.
+        @param cancel_invisible: If True, cancel wait missions that item scrolled out of view, default is False, those missions just run after visible missions.
+        """
+        with self.mission_condition:
+            self.update_visible_keys(visible_keys, cancel_invisible)
+        
+    def update_visible_keys(self, visible_keys, cancel_invisible):
+        """
+        Internal function to update visible keys, need hold mission_condition.
+        """
+        old_visible_key_set = self.visible_key_set
+        if visible_keys == None:
+            self.visible_key_set = None
+        else:
+            self.visible_key_set = set(visible_keys)
+            
+        if old_visible_key_set == None or self.visible_key_set == None:
+            # Visibility of all missions changed, update entries in place and rebuild queue, 
+            # entries keep their sequence, so missions with same priority keep add order.
+            self.mission_heap = filter(lambda entry: entry[-1] != None and not entry[-1].is_cancelled(), 
+                                       self.mission_heap)
+            for entry in self.mission_heap:
+                entry[0] = not self.is_mission_visible(entry[-1])
+            heapq.heapify(self.mission_heap)
+        else:
+            # Cancel missions that scrolled out of view.
+            if cancel_invisible:
+                for mission_key in old_visible_key_set - self.visible_key_set:
+                    mission = self.mission_key_dict.get(mission_key)
+                    if mission != None and mission.heap_entry != None:
+                        del self.mission_key_dict[mission_key]
+                        mission.cancel()
+                        mission.heap_entry = None
+                        self.cancel_number += 1
+                        self.wait_mission_number -= 1
+                    
+            # Re-prioritize missions that visibility changed.
+            for mission_key in old_visible_key_set ^ self.visible_key_set:
+                mission = self.mission_key_dict.get(mission_key)
+                if mission != None:
+                    self.update_mission_entry(mission)
+                    
+    def follow_visible_items(self, view, mission_key_callback=None, cancel_invisible=False):
+        """
+        Update visibility hint automatically when view redraw (such as scroll).
+        
+        @param view: View that has get_visible_items method, such as L{ ListView <listview.ListView>} or L{ IconView <iconview.IconView>}.
+        @param mission_key_callback: Callback to get mission key from view item, default use item as mission key.
+        @param cancel_invisible: If True, cancel wait missions that item scrolled out of view.
+        """
+        if mission_key_callback == None:
+            mission_key_callback = lambda item: item
+            
+        @post_gui
+        def update_visible_items():
+            self.follow_id = None
+            self.set_visible_keys(map(mission_key_callback, view.get_visible_items()), cancel_invisible)
+            
+            return False
+            
+        def expose_view(widget, event):
+            # Update after expose finish, and update once for many expose events.
+            if self.follow_id == None:
+                self.follow_id = gobject.idle_add(update_visible_items)
                 
-                # Start new mission.
-                self.start_mission(mission)
+            return False
+            
+        view.connect_after("expose-event", expose_view)
+        
+    def cancel_mission(self, mission_key):
+        """
+        Cancel mission with given key.
+        
+        Waiting mission won't start, running mission is marked as cancelled,
+        long mission can check L{ MissionThread.is_cancelled <MissionThread.is_cancelled>} and return early.
+        Result of cancelled mission won't pass to clean_callback.
+        
+        @param mission_key: Key of mission.
+        @return: Return True if find mission with given key.
+        """
+        with self.mission_condition:
+            if self.mission_key_dict.has_key(mission_key):
+                mission = self.mission_key_dict.pop(mission_key)
+                mission.cancel()
+                self.cancel_number += 1
                 
-    @contextmanager
-    def sync(self):
+                # Cancelled wait mission is dropped when worker pop it from queue.
+                if not mission in self.active_mission_set:
+                    self.wait_mission_number -= 1
+                    mission.heap_entry = None
+                    
+                return True
+            else:
+                return False
+            
+    def cancel_all_missions(self):
+        """
+        Cancel all waiting missions and mark running missions as cancelled.
         """
-        Internal function do synchronize jobs.
+        with self.mission_condition:
+            for entry in self.mission_heap:
+                mission = entry[-1]
+                if mission != None and not mission.is_cancelled():
+                    mission.cancel()
+                    mission.heap_entry = None
+                    self.cancel_number += 1
+            for mission in self.active_mission_set:
+                if not mission.is_cancelled():
+                    mission.cancel()
+                    self.cancel_number += 1
+                
+            self.mission_heap = []
+            self.wait_mission_number = 0
+            self.mission_key_dict = {}
+            
+    def has_mission_key(self, mission_key):
         """
-        self.thread_sync_lock.acquire()
-        try:  
-            yield  
-        except Exception, e:  
-            print 'function sync got error: %s' % e  
-            traceback.print_exc(file=sys.stdout)
-        else:  
-            self.thread_sync_lock.release()
+        Whether mission with given key is waiting or running.
         
+        @param mission_key: Key of mission.
+        @return: Return True if mission with given key is waiting or running.
+        """
+        with self.mission_condition:
+            return self.mission_key_dict.has_key(mission_key)
+            
     def finish_mission(self, mission):
         """
-        Internal function that invoked by the MissionThread for every certain time.
+        Internal function that invoked by worker thread after mission finish.
 
         @param mission: A mission of type MissionThread.
         """
-        with self.sync():
-            # Remove mission from active mission list.
-            if mission in self.active_mission_list:
+        with self.mission_condition:
+            self.active_mission_set.discard(mission)
+            
+            mission_key = mission.get_mission_key()
+            if mission_key != None and self.mission_key_dict.get(mission_key) == mission:
+                del self.mission_key_dict[mission_key]
+                
+            self.total_run_time += time.time() - mission.start_time
+            self.finish_number += 1
+                
+            # Batch result, clean_callback is called once for all results finish in clean delay.
+            if self.clean_callback != None and not mission.is_cancelled():
                 self.mission_result_list.append(mission.get_mission_result())
-                self.active_mission_list.remove(mission)
                 
-            # Wake up wait missions.
-            self.wake_up_wait_missions()
-            
-            # Do clean work.
-            if self.clean_delay > 0 and self.clean_callback != None and len(self.mission_result_list) > 0:
-                # Get current time.
-                current_time = time.time()
+                if self.clean_id == None:
+                    if self.clean_delay > 0:
+                        self.clean_id = gobject.timeout_add(self.clean_delay, self.clean_mission)
+                    else:
+                        self.clean_id = gobject.idle_add(self.clean_mission)
                 
-                # Do clean work no mission will start or time reach delay.
-                if (len(self.active_mission_list) == 0 and len(self.wait_mission_list) == 0) or (current_time - self.clean_time) * 1000 > self.clean_delay:
-                    self.clean_mission(current_time)
-                    
-            # Exit thread when download finish.
-            if (len(self.active_mission_list) == 0 and len(self.wait_mission_list) == 0):
-                self.mission_lock.put(self.FINISH_SIGNAL)
+            if self.wait_mission_number == 0 and len(self.active_mission_set) == 0:
+                print ">>> Finish missions."
+                
+                # Wake up waiting workers, make them exit if exit_when_finish is True.
+                self.mission_condition.notify_all()
                     
-    def clean_mission(self, current_time):
+    @post_gui
+    def clean_mission(self):
         """
-        Internal function to call clean_callback of the mission which is invoked in finish_mission.
-
-        @param current_time: the time of type float which indicates the time the clean_mission is invoked.
+        Internal function to call clean_callback with batched mission results in GUI thread.
         """
-        # Do clean work.
-        self.clean_callback(self.mission_result_list)
-                    
-        # Clean mission result list.
-        self.mission_result_list = []                
-                    
-        # Record new clean time.
-        self.clean_time = current_time
+        with self.mission_condition:
+            mission_result_list = self.mission_result_list
+            self.mission_result_list = []
+            self.clean_id = None
+            
+        if len(mission_result_list) > 0:
+            self.clean_callback(mission_result_list)
+            
+        return False
+    
+    def get_stats(self):
+        """
+        Get stats of thread pool.
+        
+        @return: Return dict with wait_missions (queue depth), active_missions, finish_missions, 
+        cancel_missions, duplicate_missions, average_wait_time, average_run_time (seconds) 
+        and throughput (finish missions per second).
+        """
+        with self.mission_condition:
+            if self.finish_number > 0:
+                average_wait_time = self.total_wait_time / self.finish_number
+                average_run_time = self.total_run_time / self.finish_number
+            else:
+                average_wait_time = average_run_time = 0
+                
+            return {
+                "wait_missions" : self.wait_mission_number,
+                "active_missions" : len(self.active_mission_set),
+                "finish_missions" : self.finish_number,
+                "cancel_missions" : self.cancel_number,
+                "duplicate_missions" : self.duplicate_number,
+                "average_wait_time" : average_wait_time,
+                "average_run_time" : average_run_time,
+                "throughput" : self.finish_number / max(time.time() - self.stats_time, 0.001),
+                }
+        
+    def reset_stats(self):
+        """
+        Reset stats of thread pool.
+        """
+        self.stats_time = time.time()
+        self.finish_number = 0
+        self.cancel_number = 0
+        self.duplicate_number = 0
+        self.total_wait_time = 0
+        self.total_run_time = 0
                     
 class MissionThread(td.Thread):
     """
     This class stands for a single mission in the thread pool.
+    
+    Mission is run by worker thread of L{ MissionThreadPool <MissionThreadPool>}, 
+    it's still a thread for compatibility, you can start it directly without thread pool.
     """
 	
-    def __init__(self):
+    def __init__(self, mission_priority=0):
         """
         Initialise the MissionThread.
+        
+        @param mission_priority: Mission with smaller priority value run first, default is 0.
         """
         td.Thread.__init__(self)
         self.setDaemon(True) # make thread exit when main program exit 
         
+        self.mission_priority = mission_priority
+        self.mission_cancelled = False
+        self.heap_entry = None
+        self.add_time = time.time()
+        self.start_time = time.time()
+        
     def run(self):
         """
         The thread function.
         """
         self.start_mission()
-        self.finish_mission(self)
         
     def start_mission(self):
         """
@@ -245,6 +514,30 @@ class MissionThread(td.Thread):
         @return: If you don't want handle result, just return None.
         """
         return None
+    
+    def get_mission_key(self):
+        """
+        Return the mission key, thread pool use key to remove duplicate mission and cancel mission.
+        
+        This function is MissionThread template, you should write your own implementation.
+        
+        @return: Return hashable key, or return None if mission don't need key.
+        """
+        return None
+    
+    def cancel(self):
+        """
+        Mark mission as cancelled.
+        """
+        self.mission_cancelled = True
+        
+    def is_cancelled(self):
+        """
+        Whether mission is cancelled.
+        
+        @return: Return True if mission is cancelled.
+        """
+        return self.mission_cancelled
         
 class TestMissionThread(MissionThread):
     '''Test mission thread.'''
@@ -264,6 +557,10 @@ class TestMissionThread(MissionThread):
         '''Get misssion retsult.'''
         return os.path.join("/home/cover", self.artist)
     
+    def get_mission_key(self):
+        '''Get mission key.'''
+        return self.artist
+    
 def clean_cover(filepath):
     '''Clean cover.'''
     print "#### Update covers %s" % (filepath)    
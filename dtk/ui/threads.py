@@ -20,8 +20,145 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import deque
+import gobject
 import gtk
+import sys
 import threading as td
+import time
+import traceback
+
+class GuiDispatcher(object):
+    '''
+    Dispatch callables posted from other threads in GUI thread.
+    
+    Posted callables are collected in queue and drained in one idle callback,
+    so many posts from worker threads just acquire GDK lock once.
+    Callables run in the order they are posted.
+    
+    Worker thread block when queue is full, until GUI thread drain queue.
+    
+    @undocumented: drain
+    '''
+    
+    LATENCY_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512] # milliseconds
+	
+    def __init__(self, max_queue_size=1024, drain_time=0.008):
+        '''
+        Initialize GuiDispatcher class.
+        
+        @param max_queue_size: Max number of callables in queue, post from worker thread block when queue is full.
+        @param drain_time: Max seconds that one idle callback run callables, rest callables run in next idle callback, default is 8 milliseconds.
+        '''
+        self.max_queue_size = max_queue_size
+        self.drain_time = drain_time
+        self.queue = deque()
+        self.condition = td.Condition()
+        self.drain_id = None
+        
+        self.reset_stats()
+        
+    def post(self, func, *a, **kw):
+        '''
+        Post callable to run in GUI thread.
+        
+        @param func: Callable object.
+        @param a: Arguments of callable.
+        @param kw: Keyword arguments of callable.
+        '''
+        with self.condition:
+            # Block worker thread until queue has space.
+            while len(self.queue) >= self.max_queue_size:
+                self.block_count += 1
+                self.condition.wait()
+                
+            self.queue.append((time.time(), func, a, kw))
+            self.post_count += 1
+            
+            if self.drain_id == None:
+                self.drain_id = gobject.idle_add(self.drain)
+                
+    def drain(self):
+        '''
+        Internal function to run posted callables in GUI thread.
+        '''
+        start_time = time.time()
+        
+        gtk.gdk.threads_enter()
+        try:
+            while True:
+                with self.condition:
+                    if len(self.queue) == 0:
+                        self.drain_id = None
+                        return False
+                    elif time.time() - start_time > self.drain_time:
+                        # Run rest callables in next idle callback, don't block redraw.
+                        return True
+                    
+                    (post_time, func, a, kw) = self.queue.popleft()
+                    self.condition.notify_all()
+                    
+                self.add_latency(time.time() - post_time)
+                
+                try:
+                    func(*a, **kw)
+                except Exception, e:
+                    print "GuiDispatcher.drain: %s got error: %s" % (func, e)
+                    traceback.print_exc(file=sys.stdout)
+        finally:
+            gtk.gdk.threads_leave()
+            
+    def add_latency(self, latency):
+        '''
+        Internal function to record latency between post and run.
+        
+        @param latency: Latency in seconds.
+        '''
+        latency = latency * 1000
+        for (index, bucket) in enumerate(self.LATENCY_BUCKETS):
+            if latency <= bucket:
+                self.latency_histogram[index] += 1
+                break
+        else:
+            self.latency_histogram[-1] += 1
+            
+        self.max_latency = max(self.max_latency, latency)
+        
+    def get_stats(self):
+        '''
+        Get stats of dispatcher.
+        
+        @return: Return dict with queue_size, post_count, block_count (times that worker thread blocked by full queue), 
+        max_latency (milliseconds) and latency_histogram, latency_histogram is list of (upper bound of bucket in milliseconds, count), 
+        upper bound of last bucket is None.
+        '''
+        with self.condition:
+            return {
+                "queue_size" : len(self.queue),
+                "post_count" : self.post_count,
+                "block_count" : self.block_count,
+                "max_latency" : self.max_latency,
+                "latency_histogram" : zip(self.LATENCY_BUCKETS + [None], self.latency_histogram),
+                }
+        
+    def reset_stats(self):
+        '''
+        Reset stats of dispatcher.
+        '''
+        self.post_count = 0
+        self.block_count = 0
+        self.max_latency = 0
+        self.latency_histogram = [0] * (len(self.LATENCY_BUCKETS) + 1)
+        
+gui_dispatcher = GuiDispatcher()
+    
+def is_main_thread():
+    '''
+    Whether current thread is main thread.
+    
+    @return: Return True if current thread is main thread.
+    '''
+    return isinstance(td.current_thread(), td._MainThread)
 
 def post_gui(func):
     '''
@@ -29,6 +166,9 @@ def post_gui(func):
 
     You should use post_gui wrap graphics function if function call from other threads.
     
+    Function call from other threads is posted to L{ gui_dispatcher <GuiDispatcher>} and return immediately, 
+    function call from main thread run directly and return value of function.
+    
     Usage:
 
     >>> @post_gui
@@ -36,10 +176,13 @@ def post_gui(func):
     >>>     ....
     '''
     def wrap(*a, **kw):
-        gtk.gdk.threads_enter()
-        ret = func(*a, **kw)
-        gtk.gdk.threads_leave()
-        return ret
+        if is_main_thread():
+            gtk.gdk.threads_enter()
+            ret = func(*a, **kw)
+            gtk.gdk.threads_leave()
+            return ret
+        else:
+            gui_dispatcher.post(func, *a, **kw)
     return wrap
 
 class AnonymityThread(td.Thread):
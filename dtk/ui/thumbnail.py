@@ -0,0 +1,250 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2011 ~ 2012 Deepin, Inc.
+#               2011 ~ 2012 Wang Yong
+# 
+# Author:     Wang Yong <lazycat.manatee@gmail.com>
+# Maintainer: Wang Yong <lazycat.manatee@gmail.com>
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from cache_pixbuf import get_pixbuf_size
+from collections import OrderedDict
+from threads import AnonymityThread, post_gui
+from utils import get_optimum_pixbuf_from_file, create_directory
+import gtk
+import hashlib
+import os
+import sys
+import tempfile
+import threading as td
+import traceback
+import urllib
+
+__all__ = ["get_thumbnail", "get_thumbnail_async", "lookup_thumbnail", "clear_thumbnail_cache"]
+
+THUMBNAIL_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), 
+    "thumbnails", "deepin-ui")
+THUMBNAIL_MEMORY_SIZE = 16 * 1024 * 1024
+
+thumbnail_dict = OrderedDict()
+thumbnail_lock = td.Lock()
+thumbnail_memory_size = 0
+
+def get_thumbnail_uri(filepath):
+    '''
+    Internal function to get uri of file, uri is used as thumbnail identity.
+    
+    @param filepath: File path.
+    @return: Return file uri.
+    '''
+    return "file://" + urllib.pathname2url(os.path.abspath(filepath))
+
+def get_thumbnail_path(uri, expect_width, expect_height, cut_middle_area):
+    '''
+    Internal function to get thumbnail path on disk.
+    
+    Thumbnail store follow freedesktop layout: file name is md5 of uri, 
+    and source modify time saved in png text chunk.
+    Every (size, cut mode) has it's own directory, because freedesktop just define normal and large size.
+    
+    @param uri: File uri.
+    @param expect_width: Expect width.
+    @param expect_height: Expect height.
+    @param cut_middle_area: Whether cut image with middle area.
+    @return: Return thumbnail path.
+    '''
+    if cut_middle_area:
+        thumbnail_mode = "cut"
+    else:
+        thumbnail_mode = "scale"
+        
+    return os.path.join(
+        THUMBNAIL_CACHE_DIR,
+        "%sx%s-%s" % (expect_width, expect_height, thumbnail_mode),
+        "%s.png" % (hashlib.md5(uri).hexdigest()))
+
+def get_thumbnail_key(filepath, expect_width, expect_height, cut_middle_area):
+    '''
+    Internal function to get key of thumbnail.
+    
+    @return: Return (uri, mtime, size, expect_width, expect_height, cut_middle_area).
+    '''
+    file_stat = os.stat(filepath)
+    return (get_thumbnail_uri(filepath), str(int(file_stat.st_mtime)), str(file_stat.st_size),
+            expect_width, expect_height, cut_middle_area)
+
+def add_thumbnail(key, pixbuf):
+    '''
+    Internal function to add thumbnail in memory cache, least recently used thumbnail will be evicted.
+    '''
+    global thumbnail_memory_size
+    
+    with thumbnail_lock:
+        if thumbnail_dict.has_key(key):
+            thumbnail_memory_size -= get_pixbuf_size(thumbnail_dict.pop(key))
+            
+        thumbnail_dict[key] = pixbuf
+        thumbnail_memory_size += get_pixbuf_size(pixbuf)
+        
+        while thumbnail_memory_size > THUMBNAIL_MEMORY_SIZE and len(thumbnail_dict) > 1:
+            (_, evict_pixbuf) = thumbnail_dict.popitem(last=False)
+            thumbnail_memory_size -= get_pixbuf_size(evict_pixbuf)
+    
+def read_thumbnail(thumbnail_path, uri, mtime, size):
+    '''
+    Internal function to read thumbnail from disk.
+    
+    @return: Return thumbnail pixbuf, or return None if thumbnail not exist or out of date.
+    '''
+    if not os.path.exists(thumbnail_path):
+        return None
+    
+    try:
+        pixbuf = gtk.gdk.pixbuf_new_from_file(thumbnail_path)
+    except Exception:
+        return None
+    
+    if (pixbuf.get_option("tEXt::Thumb::URI") == uri 
+        and pixbuf.get_option("tEXt::Thumb::MTime") == mtime
+        and pixbuf.get_option("tEXt::Thumb::Size") == size):
+        return pixbuf
+    else:
+        return None
+    
+def write_thumbnail(thumbnail_path, pixbuf, uri, mtime, size):
+    '''
+    Internal function to write thumbnail to disk.
+    
+    Thumbnail is written to temporary file first and rename to target path, 
+    so other process won't read incomplete thumbnail.
+    '''
+    temp_path = None
+    try:
+        thumbnail_dir = os.path.dirname(thumbnail_path)
+        create_directory(thumbnail_dir)
+        
+        # Unique temporary file for every writer, mkstemp create it with mode 0600.
+        (temp_fd, temp_path) = tempfile.mkstemp(".tmp", os.path.basename(thumbnail_path) + ".", thumbnail_dir)
+        os.close(temp_fd)
+        
+        pixbuf.save(temp_path, "png", {"tEXt::Thumb::URI" : uri,
+                                       "tEXt::Thumb::MTime" : mtime,
+                                       "tEXt::Thumb::Size" : size})
+        os.rename(temp_path, thumbnail_path)
+    except Exception, e:
+        print "write_thumbnail: write %s failed: %s" % (thumbnail_path, e)
+        
+        if temp_path != None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+def lookup_thumbnail(filepath, expect_width, expect_height, cut_middle_area=True):
+    '''
+    Lookup thumbnail in memory cache, don't read disk or decode image.
+    
+    @param filepath: Filepath to contain image.
+    @param expect_width: Expect width.
+    @param expect_height: Expect height.
+    @param cut_middle_area: Default cut image with middle area.
+    @return: Return thumbnail pixbuf, or return None if thumbnail not in memory.
+    '''
+    try:
+        key = get_thumbnail_key(filepath, expect_width, expect_height, cut_middle_area)
+    except OSError:
+        return None
+    
+    with thumbnail_lock:
+        if thumbnail_dict.has_key(key):
+            pixbuf = thumbnail_dict.pop(key)
+            thumbnail_dict[key] = pixbuf
+            return pixbuf
+        else:
+            return None
+        
+def get_thumbnail(filepath, expect_width, expect_height, cut_middle_area=True):
+    '''
+    Get thumbnail of image, result is same as L{ get_optimum_pixbuf_from_file <utils.get_optimum_pixbuf_from_file>}.
+    
+    Thumbnail is cached in memory and disk with (path, modify time, file size, expect size, cut mode),
+    so request same thumbnail again won't decode image.
+    
+    This function is safe to call in other threads.
+    
+    @param filepath: Filepath to contain image.
+    @param expect_width: Expect width.
+    @param expect_height: Expect height.
+    @param cut_middle_area: Default cut image with middle area.
+    @return: Return thumbnail pixbuf.
+    '''
+    pixbuf = lookup_thumbnail(filepath, expect_width, expect_height, cut_middle_area)
+    if pixbuf != None:
+        return pixbuf
+    
+    key = get_thumbnail_key(filepath, expect_width, expect_height, cut_middle_area)
+    (uri, mtime, size, _, _, _) = key
+    thumbnail_path = get_thumbnail_path(uri, expect_width, expect_height, cut_middle_area)
+    
+    # Read thumbnail on disk.
+    pixbuf = read_thumbnail(thumbnail_path, uri, mtime, size)
+    
+    # Generate thumbnail if cache not exist.
+    if pixbuf == None:
+        # Copy subpixbuf, don't keep scaled image in memory.
+        pixbuf = get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_middle_area).copy()
+        write_thumbnail(thumbnail_path, pixbuf, uri, mtime, size)
+        
+    add_thumbnail(key, pixbuf)
+        
+    return pixbuf
+
+def get_thumbnail_async(filepath, expect_width, expect_height, callback, cut_middle_area=True):
+    '''
+    Get thumbnail of image in background thread.
+    
+    IconView item can draw placeholder first, and redraw itself in callback.
+    
+    @param filepath: Filepath to contain image.
+    @param expect_width: Expect width.
+    @param expect_height: Expect height.
+    @param callback: Callback in GUI thread after thumbnail finish, callback receive file path and thumbnail pixbuf, pixbuf is None if load failed.
+    @param cut_middle_area: Default cut image with middle area.
+    '''
+    @post_gui
+    def finish_thumbnail(pixbuf):
+        callback(filepath, pixbuf)
+        
+    def load_thumbnail():
+        try:
+            pixbuf = get_thumbnail(filepath, expect_width, expect_height, cut_middle_area)
+        except Exception, e:
+            print "get_thumbnail_async: load %s failed: %s" % (filepath, e)
+            traceback.print_exc(file=sys.stdout)
+            pixbuf = None
+            
+        finish_thumbnail(pixbuf)
+        
+    AnonymityThread(load_thumbnail).start()
+    
+def clear_thumbnail_cache():
+    '''
+    Clear thumbnail cache in memory, thumbnail on disk is keep.
+    '''
+    global thumbnail_memory_size
+    
+    with thumbnail_lock:
+        thumbnail_dict.clear()
+        thumbnail_memory_size = 0
@@ -20,16 +20,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from frame_clock import frame_clock
 import gobject
 import math
 
 CURVE_LINEAR = lambda x: x
 CURVE_SINE = lambda x: math.sin(math.pi / 2 * x)
-FRAMERATE = 30.0
 
 class Timeline(gobject.GObject):
     '''
     Timeline.
+    
+    Timeline is driven by frame_clock, progress is computed with elapsed time.
     '''
 
     __gtype_name__ = 'Timeline'
@@ -38,32 +40,29 @@ class Timeline(gobject.GObject):
         'completed': (gobject.SIGNAL_RUN_LAST, gobject.TYPE_NONE, ())
         }
 
-    def __init__(self, duration, curve):
+    def __init__(self, duration, curve, widget=None):
         '''
         Initialize Timeline class.
 
         @param duration: Animation duration. 
         @param curve: Animation curve.
+        @param widget: Widget to redraw after every update, redraw is coalesced by frame_clock, default is None.
         '''
         gobject.GObject.__init__(self)
 
         self.duration = duration
         self.curve = curve
+        self.widget = widget
 
-        self._states = []
+        self._start_time = None
         self._stopped = False
 
     def run(self):
         '''
         Run.
         '''
-        n_frames = (self.duration / 1000.0) * FRAMERATE
-
-        while len(self._states) <= n_frames:
-            self._states.append(self.curve(len(self._states) * (1.0 / n_frames)))
-        self._states.reverse()
-
-        gobject.timeout_add(int(self.duration / n_frames), self.update)
+        self._start_time = None
+        frame_clock.add(self.update)
 
     def stop(self):
         '''
@@ -71,16 +70,28 @@ class Timeline(gobject.GObject):
         '''
         self._stopped = True
 
-    def update(self):
+    def update(self, frame_time):
         '''
         Update.
+        
+        @param frame_time: Frame time from frame_clock, in seconds.
         '''
         if self._stopped:
             self.emit('completed')
             return False
+        
+        if self._start_time == None:
+            self._start_time = frame_time
+            
+        if self.duration > 0:
+            progress = min((frame_time - self._start_time) * 1000.0 / self.duration, 1.0)
+        else:
+            progress = 1.0
 
-        self.emit('update', self._states.pop())
-        if len(self._states) == 0:
+        self.emit('update', self.curve(progress))
+        if self.widget != None:
+            frame_clock.queue_draw(self.widget)
+        if progress >= 1.0:
             self.emit('completed')
             return False
         return True
@@ -40,6 +40,12 @@ from constant import (WIDGET_POS_TOP_LEFT, WIDGET_POS_TOP_RIGHT,
                       WIDGET_POS_CENTER, DEFAULT_FONT, COLOR_NAME_DICT, 
                       BLACK_COLOR_MAPPED, WHITE_COLOR_MAPPED, SIMILAR_COLOR_SEQUENCE,
                       DEFAULT_FONT_SIZE)
+from layout_cache import LayoutCache
+
+# Text size cache is share by all threads, text layout cache just use in main thread.
+text_size_cache = LayoutCache(4096)
+text_layout_cache = LayoutCache(512)
+text_measure_context = None
 
 def get_entry_text(entry):
     '''
@@ -375,24 +381,87 @@ def get_content_size(text, text_size=DEFAULT_FONT_SIZE, text_font=DEFAULT_FONT,
     @param text_font: Text font.
     @param wrap_width: The width of wrap rule, default don't wrap.
     @return: Return text size as (text_width, text_height), return (0, 0) if occur error.
+    
+    Text size is cached, measure same string again won't create new pango layout.
     '''
     if text:
+        return text_size_cache.get(
+            (text, text_size, text_font, wrap_width),
+            lambda : measure_content_size(text, text_size, text_font, wrap_width))
+    else:
+        return (0, 0)
+    
+def measure_content_size(text, text_size, text_font, wrap_width):
+    '''
+    Internal function to measure text size for L{ I{get_content_size} <get_content_size>}.
+    
+    Create new context every time, because it maybe call in loading thread.
+    '''
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0, 0) # don't need give size
+    cr = cairo.Context(surface)
+    context = pangocairo.CairoContext(cr)
+    layout = context.create_layout()
+    layout.set_font_description(pango.FontDescription("%s %s" % (text_font, text_size)))
+    layout_set_markup(layout, text)
+    if wrap_width == None:
+        layout.set_single_paragraph_mode(True)
+    else:
+        layout.set_width(wrap_width * pango.SCALE)
+        layout.set_single_paragraph_mode(False) 
+        layout.set_wrap(pango.WRAP_WORD)
+    
+    return layout.get_pixel_size()
+
+def get_text_layout(text, text_size=DEFAULT_FONT_SIZE, text_font=DEFAULT_FONT, 
+                    alignment=pango.ALIGN_LEFT, ellipsize_width=None, wrap_width=None,
+                    use_markup=True):
+    '''
+    Get cached pango layout with given text and layout options.
+    
+    Layout is share by all widgets, so don't change it, and only use it in main thread.
+    Call pangocairo.CairoContext.update_layout before render layout to target cairo context.
+    
+    @param text: String or markup string.
+    @param text_size: Text size, in pixel.
+    @param text_font: Text font.
+    @param alignment: Layout alignment, default is pango.ALIGN_LEFT.
+    @param ellipsize_width: Width to ellipsize text at end, default is None to not ellipsize, only work when wrap_width is None.
+    @param wrap_width: The width of wrap rule, default don't wrap.
+    @param use_markup: Whether text is markup string, default is True.
+    @return: Return pango layout.
+    '''
+    return text_layout_cache.get(
+        (text, text_size, text_font, alignment, ellipsize_width, wrap_width, use_markup),
+        lambda : create_text_layout(text, text_size, text_font, alignment, ellipsize_width, wrap_width, use_markup))
+
+def create_text_layout(text, text_size, text_font, alignment, ellipsize_width, wrap_width, use_markup):
+    '''
+    Internal function to create pango layout for L{ I{get_text_layout} <get_text_layout>}.
+    '''
+    global text_measure_context
+    
+    # Share one measure context, layout will update with target context when render.
+    if text_measure_context == None:
         surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 0, 0) # don't need give size
-        cr = cairo.Context(surface)
-        context = pangocairo.CairoContext(cr)
-        layout = context.create_layout()
-        layout.set_font_description(pango.FontDescription("%s %s" % (text_font, text_size)))
+        text_measure_context = pangocairo.CairoContext(cairo.Context(surface))
+    
+    layout = text_measure_context.create_layout()
+    layout.set_font_description(pango.FontDescription("%s %s" % (text_font, text_size)))
+    if use_markup:
         layout_set_markup(layout, text)
-        if wrap_width == None:
-            layout.set_single_paragraph_mode(True)
-        else:
-            layout.set_width(wrap_width * pango.SCALE)
-            layout.set_single_paragraph_mode(False) 
-            layout.set_wrap(pango.WRAP_WORD)
-        
-        return layout.get_pixel_size()
     else:
-        return (0, 0)
+        layout.set_text(text)
+    layout.set_alignment(alignment)
+    if wrap_width == None:
+        layout.set_single_paragraph_mode(True)
+        if ellipsize_width != None:
+            layout.set_width(ellipsize_width * pango.SCALE)
+            layout.set_ellipsize(pango.ELLIPSIZE_END)
+    else:
+        layout.set_width(wrap_width * pango.SCALE)
+        layout.set_wrap(pango.WRAP_WORD)
+        
+    return layout
     
 def create_directory(directory, remove_first=False):
     '''
@@ -1041,6 +1110,22 @@ def rgb2hsb(r_value, g_value, b_value):
     
     return (h, s, b)
 
+similar_color_palette = None
+
+def get_similar_color_palette():
+    '''
+    Get HSB palette of SIMILAR_COLOR_SEQUENCE, palette is built when first use.
+    
+    @return: Return list of (color_name, (h, s, b)).
+    '''
+    global similar_color_palette
+    
+    if similar_color_palette == None:
+        similar_color_palette = map(lambda name: (name, rgb2hsb(*color_hex_to_cairo(COLOR_NAME_DICT[name]))), 
+                                    SIMILAR_COLOR_SEQUENCE)
+        
+    return similar_color_palette
+
 def find_similar_color(search_color):
     '''
     Find simliar color match search_color.
@@ -1049,10 +1134,6 @@ def find_similar_color(search_color):
     @return: Return similar color name and value, (color_name, color_value).
     '''
     (search_h, search_s, search_b) = rgb2hsb(*color_hex_to_cairo(search_color))
-    hsb_colors = map(lambda name: (name, rgb2hsb(*color_hex_to_cairo(COLOR_NAME_DICT[name]))), SIMILAR_COLOR_SEQUENCE)
-    
-    # Debug.
-    # print (search_h, search_s, search_b)
     
     similar_color_name = None
     similar_color_value = None
@@ -1065,7 +1146,7 @@ def find_similar_color(search_color):
     # Otherwise find nearest color in hsb color space.
     else:
         min_color_distance = None
-        for (color_name, (h, s, b)) in hsb_colors:
+        for (color_name, (h, s, b)) in get_similar_color_palette():
             color_distance = abs(h - search_h)
             if min_color_distance == None or color_distance < min_color_distance:
                 min_color_distance = color_distance
@@ -1241,18 +1322,17 @@ def layout_set_markup(layout, markup):
     else:
         layout.set_markup(markup)
 
-def get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_middle_area=True):
+def get_optimum_pixbuf_geometry(pixbuf_width, pixbuf_height, expect_width, expect_height, cut_middle_area=True):
     '''
-    Get optimum size pixbuf from file.
+    Internal function to get scale size and cut area of optimum pixbuf.
     
-    @param filepath: Filepath to contain image.
+    @param pixbuf_width: Width of source image.
+    @param pixbuf_height: Height of source image.
     @param expect_width: Expect width.
     @param expect_height: Expect height.
     @param cut_middle_area: Default cut image with middle area.
-    @return: Return optimum size pixbuf with expect size.
+    @return: Return (scale_width, scale_height, subpixbuf_x, subpixbuf_y, subpixbuf_width, subpixbuf_height), or return None if image is smaller than expect size.
     '''
-    pixbuf = gtk.gdk.pixbuf_new_from_file(filepath)
-    pixbuf_width, pixbuf_height = pixbuf.get_width(), pixbuf.get_height()
     if pixbuf_width >= expect_width and pixbuf_height >= expect_height:
         if float(pixbuf_width) / pixbuf_height == float(expect_width) / expect_height:
             scale_width, scale_height = expect_width, expect_height
@@ -1270,13 +1350,8 @@ def get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_midd
             subpixbuf_x = 0
             subpixbuf_y = 0
             
-        return pixbuf.scale_simple(
-            scale_width, 
-            scale_height, 
-            gtk.gdk.INTERP_BILINEAR).subpixbuf(subpixbuf_x,
-                                               subpixbuf_y,
-                                               expect_width, 
-                                               expect_height)
+        return (scale_width, scale_height, 
+                subpixbuf_x, subpixbuf_y, expect_width, expect_height)
     elif pixbuf_width >= expect_width:
         scale_width = expect_width
         scale_height = int(float(expect_width) * pixbuf_height / pixbuf_width)
@@ -1288,13 +1363,8 @@ def get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_midd
             subpixbuf_x = 0
             subpixbuf_y = 0
             
-        return pixbuf.scale_simple(
-            scale_width,
-            scale_height,
-            gtk.gdk.INTERP_BILINEAR).subpixbuf(subpixbuf_x,
-                                               subpixbuf_y,
-                                               expect_width, 
-                                               min(expect_height, scale_height))
+        return (scale_width, scale_height, 
+                subpixbuf_x, subpixbuf_y, expect_width, min(expect_height, scale_height))
     elif pixbuf_height >= expect_height:
         scale_width = int(float(expect_height) * pixbuf_width / pixbuf_height)
         scale_height = expect_height
@@ -1306,15 +1376,52 @@ def get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_midd
             subpixbuf_x = 0
             subpixbuf_y = 0
         
-        return pixbuf.scale_simple(
-            scale_width,
-            scale_height,
-            gtk.gdk.INTERP_BILINEAR).subpixbuf(subpixbuf_x,
-                                               subpixbuf_y,
-                                               min(expect_width, scale_width), 
-                                               expect_height)
+        return (scale_width, scale_height, 
+                subpixbuf_x, subpixbuf_y, min(expect_width, scale_width), expect_height)
+    else:
+        return None
+
+def get_optimum_pixbuf_from_file(filepath, expect_width, expect_height, cut_middle_area=True):
+    '''
+    Get optimum size pixbuf from file.
+    
+    Image is decoded at scale size directly, so loader (such as JPEG) don't need decode full resolution image.
+    
+    Use L{ get_thumbnail <thumbnail.get_thumbnail>} if you want cache result in memory and disk.
+    
+    @param filepath: Filepath to contain image.
+    @param expect_width: Expect width.
+    @param expect_height: Expect height.
+    @param cut_middle_area: Default cut image with middle area.
+    @return: Return optimum size pixbuf with expect size.
+    '''
+    # Read image size from header, don't decode image.
+    file_info = gtk.gdk.pixbuf_get_file_info(filepath)
+    if file_info == None:
+        pixbuf = gtk.gdk.pixbuf_new_from_file(filepath)
+        pixbuf_width, pixbuf_height = pixbuf.get_width(), pixbuf.get_height()
     else:
+        pixbuf = None
+        (_, pixbuf_width, pixbuf_height) = file_info
+        
+    geometry = get_optimum_pixbuf_geometry(
+        pixbuf_width, pixbuf_height, expect_width, expect_height, cut_middle_area)
+    if geometry == None:
+        if pixbuf == None:
+            pixbuf = gtk.gdk.pixbuf_new_from_file(filepath)
+            
         return pixbuf
+    else:
+        (scale_width, scale_height, 
+         subpixbuf_x, subpixbuf_y, subpixbuf_width, subpixbuf_height) = geometry
+        if pixbuf == None:
+            pixbuf = gtk.gdk.pixbuf_new_from_file_at_scale(filepath, scale_width, scale_height, False)
+            
+        # Loader maybe ignore size hint, scale again if necessary.
+        if pixbuf.get_width() != scale_width or pixbuf.get_height() != scale_height:
+            pixbuf = pixbuf.scale_simple(scale_width, scale_height, gtk.gdk.INTERP_BILINEAR)
+        
+        return pixbuf.subpixbuf(subpixbuf_x, subpixbuf_y, subpixbuf_width, subpixbuf_height)
 
 def unique_print(text):
     '''